@@ -8,21 +8,49 @@ import redis
 import sys
 import time as _time
 import functools
+import weakref
+import collections
+import itertools
+import struct
+
+def _module_available(name):
+    try:
+        from importlib.util import find_spec
+    except ImportError:
+        # python 2 and python 3 < 3.4
+        import imp
+        try:
+            imp.find_module(name)
+        except ImportError:
+            return False
+        return True
+    return find_spec(name) is not None
+
+# optional modules are located at import time but only imported when
+# first used, so that runs which do not need them do not pay for them
+ijson_mod = jsaone_mod = None
+
+def _import_ijson():
+    global ijson_mod
+    if ijson_mod is None:
+        import ijson as ijson_mod
+    return ijson_mod
+
+def _import_jsaone():
+    global jsaone_mod
+    if jsaone_mod is None:
+        import jsaone as jsaone_mod
+    return jsaone_mod
 
 have_streaming_load = have_ijson = have_jsaone = False
-try:
-    import ijson as ijson_mod
+if _module_available('ijson'):
     have_streaming_load = True
     have_ijson = True
     default_streaming_backend = 'ijson'
-except ImportError:
-    try:
-        import jsaone as jsaone_mod
-        have_streaming_load = True
-        have_jsaone = True
-        default_streaming_backend = 'jsaone'
-    except ImportError:
-        pass
+elif _module_available('jsaone'):
+    have_streaming_load = True
+    have_jsaone = True
+    default_streaming_backend = 'jsaone'
 
 py3 = sys.version_info[0] == 3
 
@@ -45,12 +73,78 @@ class KeyDeletedError(base_exception_class):
 class KeyTypeChangedError(base_exception_class):
     pass
 
+class ServerCapabilities(object):
+    def __init__(self, version):
+        self.version = version
+        self.have_variadic = version >= [2, 4]
+        self.have_pttl = version >= [2, 6]
+        self.have_scan = version >= [2, 8]
+        self.have_dump_restore = version >= [2, 6]
+        self.have_restore_replace = version >= [3, 0]
+        self.have_unlink = version >= [4, 0]
+        self.have_memory_usage = version >= [4, 0]
+        self.have_streams = version >= [5, 0]
+        self.have_create_consumer = version >= [6, 2]
+        self.have_scan_type = version >= [6, 0]
+        # DEBUG may be disabled, as redis 7 does by default; probed when
+        # needed by RedisWrapper.have_digest_value
+        self.have_digest_value = None
+
+    @classmethod
+    def detect(cls, r):
+        try:
+            # the server section is a small fraction of full INFO output.
+            # the section is given as bytes so that it is not encoded
+            # using the client's encoding, which might be e.g. utf-16
+            info = r.info(b'server')
+        except redis.ResponseError:
+            # redis < 2.6 does not accept a section argument
+            info = r.info()
+        version = [int(part) for part in info['redis_version'].split('.')]
+        return cls(version)
+
+# capabilities are detected once per connection pool
+_capabilities_cache = weakref.WeakKeyDictionary()
+
+# maximum number of elements sent in a single variadic command
+variadic_chunk_size = 1000
+
 class RedisWrapper(redis.Redis):
-    def __init__(self, *args, **kwargs):
-        super(RedisWrapper, self).__init__(*args, **kwargs)
+    @property
+    def capabilities(self):
+        pool = self.connection_pool
+        capabilities = _capabilities_cache.get(pool)
+        if capabilities is None:
+            capabilities = ServerCapabilities.detect(self)
+            _capabilities_cache[pool] = capabilities
+        return capabilities
 
-        version = [int(part) for part in self.info()['redis_version'].split('.')]
-        self.have_pttl = version >= [2, 6]
+    @property
+    def have_digest_value(self):
+        capabilities = self.capabilities
+        if capabilities.have_digest_value is None:
+            if capabilities.version < [4, 0]:
+                capabilities.have_digest_value = False
+            else:
+                try:
+                    # digests no keys
+                    self.execute_command('DEBUG', 'DIGEST-VALUE')
+                    capabilities.have_digest_value = True
+                except redis.ResponseError:
+                    capabilities.have_digest_value = False
+        return capabilities.have_digest_value
+
+    @property
+    def have_pttl(self):
+        return self.capabilities.have_pttl
+
+    @property
+    def have_variadic(self):
+        return self.capabilities.have_variadic
+
+    @property
+    def have_unlink(self):
+        return self.capabilities.have_unlink
 
     def pttl_or_ttl(self, key):
         if self.have_pttl:
@@ -109,9 +203,25 @@ class RedisWrapper(redis.Redis):
             # rounds the expiration time down always
             return p.expireat(key, int(time))
 
+    # unlink frees the memory of large values in the background rather
+    # than blocking redis
+    def unlink_or_delete(self, *keys):
+        if self.have_unlink:
+            return self.execute_command('UNLINK', *keys)
+        else:
+            return self.delete(*keys)
+
+    def unlink_or_delete_pipeline(self, p, *keys):
+        if self.have_unlink:
+            return p.execute_command('UNLINK', *keys)
+        else:
+            return p.delete(*keys)
+
 def client(host='localhost', port=6379, password=None, db=0,
-                 unix_socket_path=None, encoding='utf-8'):
-    if unix_socket_path is not None:
+                 unix_socket_path=None, encoding='utf-8', connection_pool=None):
+    if connection_pool is not None:
+        r = RedisWrapper(connection_pool=connection_pool)
+    elif unix_socket_path is not None:
         r = RedisWrapper(unix_socket_path=unix_socket_path,
                         password=password,
                         db=db,
@@ -124,10 +234,47 @@ def client(host='localhost', port=6379, password=None, db=0,
                         charset=encoding)
     return r
 
+# returns a RedisWrapper for a client or connection pool given by the caller,
+# or a newly connected one
+def _resolve_client(r, connection_pool, host, port, password, db,
+                    unix_socket_path, encoding):
+    if r is not None:
+        if isinstance(r, RedisWrapper):
+            return r
+        connection_pool = r.connection_pool
+    return client(host=host, port=port, password=password, db=db,
+                  unix_socket_path=unix_socket_path, encoding=encoding,
+                  connection_pool=connection_pool)
+
+def _chunks(values, size=None):
+    if size is None:
+        size = variadic_chunk_size
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+# like _chunks, for iterators
+def _batches(values, size):
+    batch = []
+    for value in values:
+        batch.append(value)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
 def dumps(host='localhost', port=6379, password=None, db=0, pretty=False,
-          unix_socket_path=None, encoding='utf-8', keys='*'):
-    r = client(host=host, port=port, password=password, db=db,
-               unix_socket_path=unix_socket_path, encoding=encoding)
+          unix_socket_path=None, encoding='utf-8', keys='*',
+          client=None, connection_pool=None,
+          fingerprint_output=None, delta_from=None, fingerprint_method='value',
+          all_dbs=False, exclude_keys=None, types=None, throttle=None,
+          on_contention='fail', contention_stats=None, profile_output=None):
+    key_filter = _KeyFilter(keys, exclude_keys, types, encoding)
+    contention = _Contention(on_contention, contention_stats)
+    profile = _profile(profile_output)
+    r = _resolve_client(client, connection_pool, host=host, port=port,
+                        password=password, db=db,
+                        unix_socket_path=unix_socket_path, encoding=encoding)
     kwargs = {}
     if not pretty:
         kwargs['separators'] = (',', ':')
@@ -135,13 +282,74 @@ def dumps(host='localhost', port=6379, password=None, db=0, pretty=False,
         kwargs['indent'] = 2
         kwargs['sort_keys'] = True
     encoder = json.JSONEncoder(**kwargs)
+    if all_dbs:
+        _check_all_dbs(fingerprint_output, delta_from)
+        r = _single_connection_client(r)
+        databases = {}
+        for db in _databases(r):
+            _select_db(r, db)
+            records = _profiled(_reader(r, pretty, encoding, key_filter,
+                                        contention), r, profile, db, encoding)
+            databases[str(db)] = _dump_table(_throttled(records, r, throttle))
+        table = {'databases': databases}
+    else:
+        records = _dump_reader(r, pretty, encoding, key_filter, fingerprint_output,
+                               delta_from, fingerprint_method, contention)
+        records = _profiled(records, r, profile, None, encoding)
+        table = _dump_table(_throttled(records, r, throttle))
+    if profile is not None:
+        profile.close()
+    return encoder.encode(table)
+
+def _dump_table(records):
     table = {}
-    for key, type, ttl, value in _reader(r, pretty, encoding, keys):
+    for key, type, ttl, value in records:
+        if type == 'none':
+            # tombstone of a key deleted since the previous dump
+            table[key] = {'type': type}
+            continue
+        if isinstance(value, paged_values):
+            value = value.materialize()
         table[key] = subd = {'type': type, 'value': value}
         if ttl is not None:
             subd['ttl'] = ttl
             subd['expireat'] = _time.time() + ttl
-    return encoder.encode(table)
+    return table
+
+# records yielded by iter_dump; db is None unless all databases are dumped
+Record = collections.namedtuple('Record', ('key', 'type', 'ttl', 'value', 'db'))
+
+def iter_dump(host='localhost', port=6379, password=None, db=0,
+              unix_socket_path=None, encoding='utf-8', keys='*',
+              client=None, connection_pool=None,
+              fingerprint_output=None, delta_from=None, fingerprint_method='value',
+              all_dbs=False, exclude_keys=None, types=None, throttle=None,
+              on_contention='fail', contention_stats=None):
+    key_filter = _KeyFilter(keys, exclude_keys, types, encoding)
+    contention = _Contention(on_contention, contention_stats)
+    r = _resolve_client(client, connection_pool, host=host, port=port,
+                        password=password, db=db,
+                        unix_socket_path=unix_socket_path, encoding=encoding)
+    if all_dbs:
+        _check_all_dbs(fingerprint_output, delta_from)
+        return _database_records(r, encoding, key_filter, throttle, contention)
+    records = _dump_reader(r, False, encoding, key_filter, fingerprint_output,
+                           delta_from, fingerprint_method, contention)
+    return _records(_throttled(records, r, throttle), None)
+
+def _records(records, db):
+    for key, type, ttl, value in records:
+        if isinstance(value, paged_values):
+            value = value.materialize()
+        yield Record(key, type, ttl, value, db)
+
+def _database_records(r, encoding, key_filter, throttle, contention):
+    r = _single_connection_client(r)
+    for db in _databases(r):
+        _select_db(r, db)
+        for record in _records(_throttled(
+                _reader(r, False, encoding, key_filter, contention), r, throttle), db):
+            yield record
 
 class BytesWriteWrapper(object):
     def __init__(self, stream):
@@ -151,21 +359,62 @@ class BytesWriteWrapper(object):
         return self.stream.write(str.encode())
 
 def dump(fp, host='localhost', port=6379, password=None, db=0, pretty=False,
-         unix_socket_path=None, encoding='utf-8', keys='*'):
-    
+         unix_socket_path=None, encoding='utf-8', keys='*',
+         client=None, connection_pool=None,
+         fingerprint_output=None, delta_from=None, fingerprint_method='value',
+         all_dbs=False, exclude_keys=None, types=None, throttle=None,
+         index_output=None, index_mode='keys', index_block_size=1 << 20,
+         format='json', on_contention='fail', contention_stats=None,
+         profile_output=None, resp_target_version=None):
+
+    if format not in dump_formats:
+        raise TypeError('Invalid dump format: %s' % format)
+    if format != 'resp' and resp_target_version is not None:
+        raise TypeError('Target versions apply to RESP dumps only')
+    if format == 'resp':
+        if pretty or index_output is not None:
+            raise TypeError('RESP dumps cannot be pretty printed or indexed')
+        key_filter = _KeyFilter(keys, exclude_keys, types, encoding)
+        r = _resolve_client(client, connection_pool, host=host, port=port,
+                            password=password, db=db,
+                            unix_socket_path=unix_socket_path, encoding=encoding)
+        _dump_resp(fp, r, encoding, key_filter, fingerprint_output, delta_from,
+                   fingerprint_method, all_dbs, throttle,
+                   _Contention(on_contention, contention_stats),
+                   _profile(profile_output), resp_target_version)
+        return
+
     try:
         fp.write('')
     except TypeError:
         fp = BytesWriteWrapper(fp)
+
+    index = None
+    if index_output is not None:
+        if pretty:
+            raise TypeError('Pretty dumps cannot be indexed')
+        index = _IndexWriter(index_output, index_mode, index_block_size)
+        fp = _OffsetWriter(fp)
     
     if pretty:
         # hack to avoid implementing pretty printing
         fp.write(dumps(host=host, port=port, password=password, db=db,
-            pretty=pretty, encoding=encoding, keys=keys))
+            pretty=pretty, unix_socket_path=unix_socket_path,
+            encoding=encoding, keys=keys,
+            client=client, connection_pool=connection_pool,
+            fingerprint_output=fingerprint_output, delta_from=delta_from,
+            fingerprint_method=fingerprint_method, all_dbs=all_dbs,
+            exclude_keys=exclude_keys, types=types, throttle=throttle,
+            on_contention=on_contention, contention_stats=contention_stats,
+            profile_output=profile_output))
         return
 
-    r = client(host=host, port=port, password=password, db=db,
-               unix_socket_path=unix_socket_path, encoding=encoding)
+    key_filter = _KeyFilter(keys, exclude_keys, types, encoding)
+    contention = _Contention(on_contention, contention_stats)
+    profile = _profile(profile_output)
+    r = _resolve_client(client, connection_pool, host=host, port=port,
+                        password=password, db=db,
+                        unix_socket_path=unix_socket_path, encoding=encoding)
     kwargs = {}
     if not pretty:
         kwargs['separators'] = (',', ':')
@@ -173,30 +422,293 @@ def dump(fp, host='localhost', port=6379, password=None, db=0, pretty=False,
         kwargs['indent'] = 2
         kwargs['sort_keys'] = True
     encoder = json.JSONEncoder(**kwargs)
+    if all_dbs:
+        _check_all_dbs(fingerprint_output, delta_from)
+        r = _single_connection_client(r)
+        fp.write('{"databases":{')
+        first = True
+        for db in _databases(r):
+            _select_db(r, db)
+            if first:
+                first = False
+            else:
+                fp.write(',')
+            fp.write('"%d":' % db)
+            records = _profiled(_reader(r, pretty, encoding, key_filter,
+                                        contention), r, profile, db, encoding)
+            records = _throttled(records, r, throttle)
+            if index is not None:
+                index.select(db)
+                records = _indexed(records, fp, index)
+            _write_table(fp, encoder, records)
+        fp.write('}}')
+    else:
+        records = _dump_reader(r, pretty, encoding, key_filter, fingerprint_output,
+                               delta_from, fingerprint_method, contention)
+        records = _profiled(records, r, profile, None, encoding)
+        records = _throttled(records, r, throttle)
+        if index is not None:
+            records = _indexed(records, fp, index)
+        _write_table(fp, encoder, records)
+    if index is not None:
+        index.close()
+    if profile is not None:
+        profile.close()
+
+def _write_table(fp, encoder, records):
     fp.write('{')
     first = True
-    for key, type, ttl, value in _reader(r, pretty, encoding, keys):
+    for key, type, ttl, value in records:
         key = encoder.encode(key)
-        type = encoder.encode(type)
-        value = encoder.encode(value)
+        if first:
+            first = False
+        else:
+            fp.write(',')
+        if type == 'none':
+            # tombstone of a key deleted since the previous dump
+            fp.write('%s:{"type":"none"}' % key)
+            continue
         if ttl:
             expireat = encoder.encode(_time.time() + ttl)
             ttl = encoder.encode(ttl)
-            item = '%s:{"type":%s,"value":%s,"ttl":%s,"expireat":%s}' % (
-                key, type, value, ttl, expireat)
+            suffix = ',"ttl":%s,"expireat":%s}' % (ttl, expireat)
         else:
-            item = '%s:{"type":%s,"value":%s}' % (key, type, value)
-        if first:
-            first = False
+            suffix = '}'
+        if isinstance(value, paged_values):
+            # stream entries and long strings are read and written page
+            # by page
+            fp.write('%s:{"type":%s,"value":' % (key, encoder.encode(type)))
+            for chunk in value.iterencode(encoder):
+                fp.write(chunk)
+            fp.write(suffix)
         else:
-            fp.write(',')
-        fp.write(item)
+            fp.write('%s:{"type":%s,"value":%s%s' % (
+                key, encoder.encode(type), encoder.encode(value), suffix))
     fp.write('}')
 
+# multiple databases
+#
+# all_dbs dumps produce a document of the form
+# {"databases": {"0": {...}, "3": {...}}}, with one regular dump per
+# non-empty database. loading such a document restores every database.
+
+def _check_all_dbs(fingerprint_output, delta_from):
+    if fingerprint_output is not None or delta_from is not None:
+        raise TypeError('Incremental dumps of all databases are not supported')
+
+def _databases(r):
+    try:
+        info = r.info(b'keyspace')
+    except redis.ResponseError:
+        # redis < 2.6 does not accept a section argument
+        info = r.info()
+    return sorted(int(name[2:]) for name in info
+        if name.startswith('db') and name[2:].isdigit())
+
+# returns a client with its own connection pool, whose database can be
+# switched with _select_db. the client is used sequentially, therefore
+# the pool only ever holds one connection
+def _single_connection_client(r):
+    pool = r.connection_pool
+    own_pool = pool.__class__(connection_class=pool.connection_class,
+        **dict(pool.connection_kwargs))
+    capabilities = _capabilities_cache.get(pool)
+    if capabilities is not None:
+        _capabilities_cache[own_pool] = capabilities
+    r = RedisWrapper(connection_pool=own_pool)
+    # detect capabilities now; detecting them while a pipeline holds
+    # the connection would open a second connection
+    r.capabilities
+    return r
+
+def _select_db(r, db):
+    pool = r.connection_pool
+    # connections created later will select the database on connect
+    pool.connection_kwargs['db'] = db
+    connection = pool.get_connection('SELECT')
+    try:
+        connection.send_command('SELECT', db)
+        connection.read_response()
+        connection.db = db
+    finally:
+        pool.release(connection)
+
+def _is_multi_db(table):
+    if list(table.keys()) != ['databases']:
+        return False
+    databases = table['databases']
+    # a regular dump with a single key named databases has a record there
+    return isinstance(databases, dict) and 'type' not in databases
+
+def _table_records(table):
+    if _is_multi_db(table):
+        databases = table['databases']
+        for db in sorted(databases, key=int):
+            subtable = databases[db]
+            for key in subtable:
+                yield int(db), key, subtable[key]
+    else:
+        for key in table:
+            yield None, key, table[key]
+
+# key selection
+#
+# keys and exclude_keys accept a glob-style pattern or a list of them,
+# types accepts a type name or a list of them. include patterns and types
+# are passed to SCAN MATCH and TYPE where the server supports them;
+# exclude patterns are matched client-side before any value is read.
+
+# number of keys requested by each SCAN call
+scan_batch_size = 1000
+
+def _as_list(value):
+    if value is None:
+        return []
+    if isinstance(value, (bytes, str)) or (not py3 and isinstance(value, unicode)):
+        return [value]
+    return list(value)
+
+# redis matches patterns against bytes, hence patterns are encoded and
+# translated into bytes regular expressions
+def _encode_pattern(pattern, encoding):
+    if isinstance(pattern, bytes):
+        return pattern
+    return pattern.encode(encoding)
+
+def _glob_to_regex(pattern):
+    import re
+
+    # latin-1 maps every byte to one character and back
+    pattern = pattern.decode('latin-1')
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            out.append('.*')
+        elif c == '?':
+            out.append('.')
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            out.append(re.escape(pattern[i]))
+        elif c == '[':
+            i += 1
+            negate = i < n and pattern[i] == '^'
+            if negate:
+                i += 1
+            members = []
+            while i < n and pattern[i] != ']':
+                if pattern[i] == '\\' and i + 1 < n:
+                    i += 1
+                    members.append(re.escape(pattern[i]))
+                elif i + 2 < n and pattern[i + 1] == '-' and pattern[i + 2] != ']':
+                    start, end = sorted((pattern[i], pattern[i + 2]))
+                    members.append('%s-%s' % (re.escape(start), re.escape(end)))
+                    i += 2
+                else:
+                    members.append(re.escape(pattern[i]))
+                i += 1
+            if members:
+                out.append('[%s%s]' % ('^' if negate else '', ''.join(members)))
+            elif negate:
+                out.append('.')
+            else:
+                # empty class matches nothing
+                out.append('(?!)')
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return ''.join(out).encode('latin-1')
+
+def _compile_patterns(patterns):
+    import re
+
+    regex = b'|'.join(b'(?:' + _glob_to_regex(pattern) + b')' for pattern in patterns)
+    return re.compile(b'(?:' + regex + b')\\Z', re.DOTALL)
+
+class _KeyFilter(object):
+    def __init__(self, keys='*', exclude_keys=None, types=None, encoding='utf-8'):
+        self.patterns = [_encode_pattern(pattern, encoding)
+            for pattern in _as_list(keys)] or [b'*']
+        if b'*' in self.patterns:
+            self.include = None
+        else:
+            self.include = _compile_patterns(self.patterns)
+        exclude_keys = [_encode_pattern(pattern, encoding)
+            for pattern in _as_list(exclude_keys)]
+        if exclude_keys:
+            self.exclude = _compile_patterns(exclude_keys)
+        else:
+            self.exclude = None
+        types = _as_list(types)
+        for type in types:
+            if type not in readers:
+                raise TypeError('Invalid key type: %s' % type)
+        self.types = frozenset(types) or None
+
+    def excluded(self, key):
+        return self.exclude is not None and self.exclude.match(key) is not None
+
+    # whether the key, given as bytes, is selected by patterns
+    def matches(self, key):
+        if self.include is not None and self.include.match(key) is None:
+            return False
+        return not self.excluded(key)
+
+# note: returned keys are byte strings
+def _matching_keys(r, key_filter):
+    # a single pass over the keyspace; the server matches a single pattern
+    # and type, several are matched here
+    if len(key_filter.patterns) == 1:
+        pattern = key_filter.patterns[0]
+    else:
+        pattern = b'*'
+    if r.capabilities.have_scan:
+        type = None
+        if (key_filter.types is not None and len(key_filter.types) == 1 and
+                r.capabilities.have_scan_type):
+            # the server skips keys of other types
+            type, = key_filter.types
+        batches = _scan(r, pattern, type)
+    else:
+        batches = [r.keys(pattern)]
+    seen = set()
+    for batch in batches:
+        for key in batch:
+            # scan may return a key more than once
+            if key in seen:
+                continue
+            seen.add(key)
+            if key_filter.matches(key):
+                yield key
+
+# arguments are given as bytes so that they are not encoded using
+# the client's encoding
+def _scan(r, pattern, type=None):
+    args = [b'COUNT', str(scan_batch_size).encode('ascii')]
+    if pattern != b'*':
+        args += [b'MATCH', pattern]
+    if type is not None:
+        args += [b'TYPE', type.encode('ascii')]
+    cursor = 0
+    while True:
+        cursor, batch = r.execute_command('SCAN', str(cursor).encode('ascii'), *args)
+        yield batch
+        if cursor == 0:
+            break
+
+# strings longer than this many bytes are read and written in chunks of
+# this size, see StringValue
+string_chunk_size = 1 << 20
+
+# number of chunks of a long string read or written per round trip
+string_batch_chunks = 8
+
 class StringReader(object):
     @staticmethod
     def send_command(p, key):
-        p.get(key)
+        # one byte more than a chunk tells whether the string is long
+        p.getrange(key, 0, string_chunk_size)
 
     @staticmethod
     def handle_response(response, pretty, encoding):
@@ -246,30 +758,274 @@ class HashReader(object):
             value[k.decode(encoding)] = response[k].decode(encoding)
         return value
 
+# streams
+#
+# a stream is dumped as
+# {"last_id": "5-0", "entries": [["1-0", ["field", "value", ...]], ...],
+#  "groups": [{"name": "group", "last_delivered_id": "1-0",
+#              "consumers": ["consumer", ...],
+#              "pending": [["1-0", "consumer", idle_ms, deliveries], ...]}]}
+#
+# entries and pending entries are read in pages after the stream is
+# examined, so that long streams are never held in memory when dumping.
+# entries appended in the meantime are not dumped; entries deleted in
+# the meantime might not be dumped.
+
+# number of stream entries or pending entries read or written at a time
+stream_page_size = 1000
+
+def _stream_fields(reply):
+    # replies of XINFO are flat lists of field names and values
+    return dict((reply[i].decode('ascii'), reply[i + 1])
+        for i in range(0, len(reply), 2))
+
+def _next_stream_id(id):
+    ms, seq = id.split('-')
+    if int(seq) == 2 ** 64 - 1:
+        return '%d-0' % (int(ms) + 1)
+    return '%s-%d' % (ms, int(seq) + 1)
+
+class StreamValue(object):
+    def __init__(self, r, key, last_id, encoding):
+        self.r = r
+        self.key = key
+        self.last_id = last_id
+        self.encoding = encoding
+
+    def pages(self):
+        start = '-'
+        while True:
+            page = self.r.execute_command('XRANGE', self.key,
+                start.encode('ascii'), self.last_id.encode('ascii'),
+                b'COUNT', str(stream_page_size).encode('ascii'))
+            if not page:
+                break
+            yield [[id.decode('ascii'), [v.decode(self.encoding) for v in fields]]
+                for id, fields in page]
+            if len(page) < stream_page_size:
+                break
+            start = _next_stream_id(page[-1][0].decode('ascii'))
+
+    def entries(self):
+        for page in self.pages():
+            for entry in page:
+                yield entry
+
+    # pending entries of each group are read page by page as they are
+    # iterated, like entries
+    def groups(self):
+        groups = []
+        encoding = self.encoding
+        for reply in self.r.execute_command('XINFO GROUPS', self.key):
+            info = _stream_fields(reply)
+            name = info['name']
+            consumers = self.r.execute_command('XINFO CONSUMERS', self.key, name)
+            groups.append({
+                'name': name.decode(encoding),
+                'last_delivered_id': info['last-delivered-id'].decode('ascii'),
+                'consumers': [_stream_fields(consumer)['name'].decode(encoding)
+                    for consumer in consumers],
+                'pending': self.pending(name),
+            })
+        return groups
+
+    def pending_pages(self, group):
+        start = '-'
+        while True:
+            page = self.r.execute_command('XPENDING', self.key, group,
+                start.encode('ascii'), b'+', str(stream_page_size).encode('ascii'))
+            if not page:
+                break
+            yield [[id.decode('ascii'), consumer.decode(self.encoding),
+                idle, deliveries] for id, consumer, idle, deliveries in page]
+            if len(page) < stream_page_size:
+                break
+            start = _next_stream_id(page[-1][0].decode('ascii'))
+
+    def pending(self, group):
+        for page in self.pending_pages(group):
+            for entry in page:
+                yield entry
+
+    def iterencode(self, encoder):
+        yield '{"last_id":%s,"entries":[' % encoder.encode(self.last_id)
+        first = True
+        for page in self.pages():
+            if first:
+                first = False
+            else:
+                yield ','
+            yield ','.join(encoder.encode(entry) for entry in page)
+        yield '],"groups":['
+        for index, group in enumerate(self.groups()):
+            if index:
+                yield ','
+            yield '{"name":%s,"last_delivered_id":%s,"consumers":%s,"pending":[' % (
+                encoder.encode(group['name']),
+                encoder.encode(group['last_delivered_id']),
+                encoder.encode(group['consumers']))
+            first = True
+            for page in self.pending_pages(group['name'].encode(self.encoding)):
+                if first:
+                    first = False
+                else:
+                    yield ','
+                yield ','.join(encoder.encode(entry) for entry in page)
+            yield ']}'
+        yield ']}'
+
+    def materialize(self):
+        return {
+            'last_id': self.last_id,
+            'entries': list(self.entries()),
+            'groups': [dict(group, pending=list(group['pending']))
+                for group in self.groups()],
+        }
+
+# long strings
+#
+# a string longer than string_chunk_size is read with GETRANGE, a chunk at
+# a time, while the key is watched, into a temporary file which spills to
+# disk. the read is retried if the key is modified meanwhile. the chunks
+# are decoded and encoded as JSON one at a time when dumping, and written
+# with SET and APPEND when loading or copying, so that long strings are
+# never held in memory in full.
+
+class StringValue(object):
+    def __init__(self, spool, length, encoding):
+        self.spool = spool
+        self.length = length
+        self.encoding = encoding
+
+    def chunks(self):
+        self.spool.seek(0)
+        while True:
+            chunk = self.spool.read(string_chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def pieces(self):
+        import codecs
+
+        # characters may straddle chunks
+        decoder = codecs.getincrementaldecoder(self.encoding)()
+        for chunk in self.chunks():
+            yield decoder.decode(chunk)
+        yield decoder.decode(b'', True)
+
+    def iterencode(self, encoder):
+        yield '"'
+        for piece in self.pieces():
+            # the quotes of each piece are dropped
+            yield encoder.encode(piece)[1:-1]
+        yield '"'
+
+    def materialize(self):
+        return ''.join(self.pieces())
+
+def _read_long_string(r, key, encoding, watch=True):
+    import tempfile
+
+    p = r.pipeline()
+    try:
+        if watch:
+            p.watch(key)
+            # commands of a watching pipeline are executed right away
+            c = p
+        else:
+            c = r
+        if c.type(key) != b'string':
+            raise KeyTypeChangedError
+        length = c.strlen(key)
+        spool = tempfile.SpooledTemporaryFile(max_size=string_chunk_size)
+        try:
+            starts = list(range(0, length, string_chunk_size))
+            for i in range(0, len(starts), string_batch_chunks):
+                commands = [('GETRANGE', key, start,
+                             start + string_chunk_size - 1)
+                            for start in starts[i:i + string_batch_chunks]]
+                if watch:
+                    # commands of the watching pipeline would be sent one
+                    # at a time
+                    chunks = _execute_packed(p.connection, commands)
+                else:
+                    batch = r.pipeline(transaction=False)
+                    for command in commands:
+                        batch.execute_command(*command)
+                    chunks = batch.execute()
+                for chunk in chunks:
+                    spool.write(chunk)
+            p.multi()
+            r.pttl_or_ttl_pipeline(p, key)
+            # might raise redis.WatchError
+            results = p.execute()
+        except:
+            spool.close()
+            raise
+    finally:
+        p.reset()
+    ttl = r.decode_pttl_or_ttl_pipeline_value(results[0])
+    return ttl, StringValue(spool, length, encoding)
+
+# sends commands on a connection in one round trip and returns their
+# replies, to which the response callbacks of redis-py are not applied
+def _execute_packed(connection, commands):
+    try:
+        connection.send_packed_command(connection.pack_commands(commands))
+        return [connection.read_response() for command in commands]
+    except:
+        # replies might be left unread
+        connection.disconnect()
+        raise
+
+# values read after the transaction of their key, a page at a time
+paged_values = (StringValue, StreamValue)
+
+class StreamReader(object):
+    # the value is read after the transaction, see StreamValue
+    paged = True
+
+    @staticmethod
+    def send_command(p, key):
+        p.execute_command('XINFO STREAM', key)
+
+    @staticmethod
+    def handle_response(response, pretty, encoding, r, key):
+        info = _stream_fields(response)
+        return StreamValue(r, key, info['last-generated-id'].decode('ascii'),
+            encoding)
+
 readers = {
     'string': StringReader,
     'list': ListReader,
     'set': SetReader,
     'zset': ZsetReader,
     'hash': HashReader,
+    'stream': StreamReader,
 }
 
 # note: key is a byte string
-def _read_key(key, r, pretty, encoding):
+def _read_key(key, r, pretty, encoding, types=None, watch=True):
     type = r.type(key).decode('ascii')
     if type == 'none':
         # key was deleted by a concurrent operation on the data store
         raise KeyDeletedError
+    if types is not None and type not in types:
+        # the type filter could not be applied by the server
+        return None
     reader = readers.get(type)
     if reader is None:
         raise UnknownTypeError("Unknown key type: %s" % type)
     p = r.pipeline()
-    p.watch(key)
+    if watch:
+        p.watch(key)
     p.multi()
     p.type(key)
     r.pttl_or_ttl_pipeline(p, key)
     reader.send_command(p, key)
-    # might raise redis.WatchError
+    # might raise redis.WatchError, or a type error if the type changed
+    # while the key is not watched
     results = p.execute()
     actual_type = results[0].decode('ascii')
     if actual_type != type:
@@ -277,211 +1033,3310 @@ def _read_key(key, r, pretty, encoding):
         raise KeyTypeChangedError
 
     ttl = r.decode_pttl_or_ttl_pipeline_value(results[1])
-    value = reader.handle_response(results[2], pretty, encoding)
+    if type == 'string' and len(results[2]) > string_chunk_size:
+        # read the string again, in chunks
+        ttl, value = _read_long_string(r, key, encoding, watch)
+    elif getattr(reader, 'paged', False):
+        value = reader.handle_response(results[2], pretty, encoding, r, key)
+    else:
+        value = reader.handle_response(results[2], pretty, encoding)
     return (type, ttl, value)
 
-def _reader(r, pretty, encoding, keys='*'):
-    for encoded_key in r.keys(keys):
+def _reader(r, pretty, encoding, key_filter, contention=None):
+    return _read_keys(r, _matching_keys(r, key_filter), pretty, encoding,
+                      key_filter.types, contention)
+
+# contended keys
+#
+# a key modified while it is read is deferred rather than read again
+# right away: it is retried after a delay, which doubles with every
+# attempt, between the keys that follow it, and at the end. when a key
+# cannot be read in contention_attempts attempts, the contention policy
+# decides whether the dump fails, the key is skipped, or the key is read
+# once more without watching it, which gives a value the key had at
+# some point but possibly with the expiration time of another.
+
+contention_policies = ('fail', 'skip', 'best-effort')
+
+# attempts at reading a key being modified concurrently
+contention_attempts = 10
+
+# delay in seconds before the first retry of a contended key
+contention_backoff = 0.01
+
+# longest delay between retries of a contended key
+contention_max_backoff = 1.0
+
+class _Contention(object):
+    def __init__(self, policy='fail', stats=None):
+        if policy not in contention_policies:
+            raise TypeError('Invalid contention policy: %s' % policy)
+        self.policy = policy
+        if stats is None:
+            stats = {}
+        # keys deferred at least once, and attempts after the first ones
+        stats.setdefault('deferred', 0)
+        stats.setdefault('retries', 0)
+        # keys given up on under the skip and best-effort policies
+        stats.setdefault('skipped', [])
+        stats.setdefault('best_effort', [])
+        self.stats = stats
+        # keys skipped by this dump; stats might hold those of others
+        self.skipped = set()
+
+    def backoff(self, attempts):
+        return min(contention_max_backoff, contention_backoff * 2 ** (attempts - 1))
+
+    def give_up(self, encoded_key, r, pretty, encoding, types):
         key = encoded_key.decode(encoding)
-        handled = False
-        for i in range(10):
+        if self.policy == 'fail':
+            raise ConcurrentModificationError('Key %s is being concurrently modified' % key)
+        if self.policy == 'best-effort':
             try:
-                type, ttl, value = _read_key(encoded_key, r, pretty, encoding)
-                yield key, type, ttl, value
-                handled = True
-                break
+                result = _read_key(encoded_key, r, pretty, encoding, types,
+                                   watch=False)
             except KeyDeletedError:
-                # do not dump the key
-                handled = True
-                break
-            except redis.WatchError:
-                # same logic as key type changed
-                pass
-            except KeyTypeChangedError:
-                # retry reading type again
+                return None
+            except (KeyTypeChangedError, redis.ResponseError):
                 pass
-        if not handled:
-            # ran out of retries
-            raise ConcurrentModificationError('Key %s is being concurrently modified' % key)
+            else:
+                if result is not None:
+                    self.stats['best_effort'].append(key)
+                return result
+        self.stats['skipped'].append(key)
+        self.skipped.add(key)
+        return None
 
-def _empty(r):
-    for key in r.keys():
-        r.delete(key)
+# marks a key which was modified while it was read
+_contended = object()
 
-def loads(s, host='localhost', port=6379, password=None, db=0, empty=False,
-          unix_socket_path=None, encoding='utf-8', use_expireat=False):
-    r = client(host=host, port=port, password=password, db=db,
-               unix_socket_path=unix_socket_path, encoding=encoding)
-    if empty:
-        _empty(r)
-    table = json.loads(s)
-    counter = 0
-    for key in table:
-        # Create pipeline:
-        if not counter:
-            p = r.pipeline(transaction=False)
-        item = table[key]
-        type = item['type']
-        value = item['value']
-        ttl = item.get('ttl')
-        expireat = item.get('expireat')
-        _writer(r, p, key, type, value, ttl, expireat, use_expireat=use_expireat)
-        # Increase counter until 10 000...
-        counter = (counter + 1) % 10000
-        # ... then execute:
-        if not counter:
-            p.execute()
-    if counter:
-        # Finally, execute again:
-        p.execute()
+def _try_read_key(encoded_key, r, pretty, encoding, types):
+    try:
+        return _read_key(encoded_key, r, pretty, encoding, types)
+    except KeyDeletedError:
+        # do not dump the key
+        return None
+    except (redis.WatchError, KeyTypeChangedError):
+        return _contended
 
-def load_lump(fp, host='localhost', port=6379, password=None, db=0,
-    empty=False, unix_socket_path=None, encoding='utf-8', use_expireat=False,
-):
-    s = fp.read()
-    if py3:
-        # s can be a string or a bytes instance.
-        # if bytes, decode to a string because loads requires input to be a string.
-        if isinstance(s, bytes):
-            s = s.decode(encoding)
-    loads(s, host, port, password, db, empty, unix_socket_path, encoding, use_expireat=use_expireat)
+# note: keys are byte strings
+def _read_keys(r, encoded_keys, pretty, encoding, types=None, contention=None):
+    import heapq
 
-def get_ijson(local_streaming_backend):
-    if local_streaming_backend:
-        __import__('ijson.backends.%s' % local_streaming_backend)
-        ijson = getattr(ijson_mod.backends, local_streaming_backend)
-    else:
-        ijson = ijson_mod
-    return ijson
+    if contention is None:
+        contention = _Contention()
+    # (due time, order, attempts, key)
+    deferred = []
+    order = 0
+    encoded_keys = iter(encoded_keys)
+    while True:
+        if deferred and deferred[0][0] <= _time.time():
+            due, _, attempts, encoded_key = heapq.heappop(deferred)
+            contention.stats['retries'] += 1
+        else:
+            encoded_key = next(encoded_keys, None)
+            if encoded_key is None:
+                if not deferred:
+                    break
+                # only deferred keys are left
+                _time.sleep(max(0, deferred[0][0] - _time.time()))
+                continue
+            attempts = 0
+        attempts += 1
+        result = _try_read_key(encoded_key, r, pretty, encoding, types)
+        if result is _contended:
+            if attempts == 1:
+                contention.stats['deferred'] += 1
+            if attempts < contention_attempts:
+                order += 1
+                heapq.heappush(deferred, (_time.time() + contention.backoff(attempts),
+                    order, attempts, encoded_key))
+                continue
+            result = contention.give_up(encoded_key, r, pretty, encoding, types)
+        if result is not None:
+            type, ttl, value = result
+            yield encoded_key.decode(encoding), type, ttl, value
 
-def ijson_top_level_items(file, local_streaming_backend):
-    ijson = get_ijson(local_streaming_backend)
-    parser = ijson.parse(file)
-    prefixed_events = iter(parser)
-    wanted = None
-    try:
-        while True:
-            current, event, value = next(prefixed_events)
-            if current != '':
-                wanted = current
-                if event in ('start_map', 'start_array'):
-                    builder = ijson_mod.ObjectBuilder()
-                    end_event = event.replace('start', 'end')
-                    while (current, event) != (wanted, end_event):
-                        builder.event(event, value)
-                        current, event, value = next(prefixed_events)
-                    yield current, builder.value
-    except StopIteration:
-        pass
+# sorts items which might not fit in memory: runs of buffer_size items
+# are sorted and spilled to temporary files by write_item, which returns
+# an item as bytes, and merged as read_items reads them back
+class _ExternalSorter(object):
+    def __init__(self, buffer_size, write_item, read_items):
+        self.buffer_size = buffer_size
+        self.write_item = write_item
+        self.read_items = read_items
+        self.buffer = []
+        self.runs = []
 
-class TextReadWrapper(object):
-    def __init__(self, fp):
+    def add(self, item):
+        self.buffer.append(item)
+        if len(self.buffer) >= self.buffer_size:
+            self.spill()
+
+    def spill(self):
+        import tempfile
+
+        self.buffer.sort()
+        run = tempfile.TemporaryFile()
+        for item in self.buffer:
+            run.write(self.write_item(item))
+        run.seek(0)
+        self.runs.append(run)
+        self.buffer = []
+
+    def sorted(self):
+        import heapq
+
+        self.buffer.sort()
+        if not self.runs:
+            return iter(self.buffer)
+        return heapq.merge(iter(self.buffer),
+            *[self.read_items(run) for run in self.runs])
+
+    def close(self):
+        for run in self.runs:
+            run.close()
+        self.runs = []
+
+# incremental dumps
+#
+# a fingerprint index records a fingerprint and the expiration time of
+# every dumped key. a dump made with delta_from set to the index of
+# a previous dump contains only keys which were added or changed since
+# that dump, and tombstones ({"type": "none"}) for deleted keys.
+# loading the delta on top of the previous dump reproduces the data set.
+#
+# an index is a header line followed by binary entries sorted by key:
+# {"version":2,"method":"value"}
+# <key length: 4 bytes><key><fingerprint: 8 bytes><expireat: 8 bytes>
+# ...
+# keys are given as stored in redis, fingerprints are sha1 hashes
+# truncated to 64 bits, and expiration times are unix times in seconds,
+# 0 for keys which do not expire. integers are little endian.
+#
+# neither index is held in memory: a delta first takes the fingerprint of
+# every key and sorts them by key, spilling to temporary files, then
+# merges them with the previous index as it is read, and reads the keys
+# which changed again to dump them. entries are (key, fingerprint,
+# expireat) tuples.
+
+fingerprint_methods = ('value', 'digest')
+
+fingerprint_index_version = 2
+
+# number of keys whose server-side digests are requested in one pipeline,
+# and number of keys compared with the previous index at a time
+digest_batch_size = 1000
+
+# number of fingerprints sorted in memory; more are sorted in runs which
+# spill to disk
+fingerprint_sort_buffer_size = 100000
+
+_fingerprint_encoder = json.JSONEncoder(separators=(',', ':'), sort_keys=True)
+
+def _value_fingerprint(type, value):
+    import hashlib
+
+    if type == 'set':
+        # set members are returned in arbitrary order
+        value = sorted(value)
+    data = _fingerprint_encoder.encode([type, value])
+    return hashlib.sha1(data.encode('utf-8')).digest()[:8]
+
+# DEBUG DIGEST-VALUE gives sha1 hashes in hex
+def _digest_fingerprint(digest):
+    import binascii
+
+    return binascii.unhexlify(digest[:16])
+
+def _expireat(ttl):
+    if ttl is None:
+        return 0
+    return int(_time.time() + ttl)
+
+def _same_expireat(previous, current):
+    if not previous or not current:
+        return previous == current
+    # expiration times are computed using client time and may jitter
+    return abs(previous - current) <= 1
+
+def _pack_fingerprint(entry):
+    key, fingerprint, expireat = entry
+    return struct.pack('<I', len(key)) + key + fingerprint + \
+        struct.pack('<q', expireat)
+
+def _read_fingerprints(fp):
+    while True:
+        header = fp.read(4)
+        if not header:
+            break
+        if len(header) < 4:
+            raise ValueError('Truncated fingerprint index')
+        length, = struct.unpack('<I', header)
+        data = fp.read(length + 16)
+        if len(data) < length + 16:
+            raise ValueError('Truncated fingerprint index')
+        yield (data[:length], data[length:length + 8],
+            struct.unpack('<q', data[length + 8:])[0])
+
+class _FingerprintWriter(object):
+    def __init__(self, fp, method):
         self.fp = fp
-        
-    def read(self, *args, **kwargs):
-        return self.fp.read(*args, **kwargs).decode()
+        if fp is None:
+            return
+        try:
+            fp.write(b'')
+        except TypeError:
+            raise TypeError('Fingerprint indexes must be written to binary files')
+        self.method = method
+        # entries are added in the order keys are dumped
+        self.sorter = _ExternalSorter(fingerprint_sort_buffer_size,
+            _pack_fingerprint, _read_fingerprints)
 
-class BytesReadWrapper(object):
-    def __init__(self, fp):
+    def add(self, key, fingerprint, expireat):
+        if self.fp is None:
+            return
+        self.sorter.add((key, fingerprint, expireat))
+
+    def close(self):
+        if self.fp is None:
+            return
+        self.fp.write(('{"version":%d,"method":%s}\n' % (
+            fingerprint_index_version, json.dumps(self.method))).encode('ascii'))
+        for entry in self.sorter.sorted():
+            self.fp.write(_pack_fingerprint(entry))
+        self.sorter.close()
+
+class _FingerprintIndex(object):
+    def __init__(self, fp, method):
         self.fp = fp
-        
-    def read(self, *args, **kwargs):
-        return self.fp.read(*args, **kwargs).encode('utf-8')
+        self.method = method
 
-def create_loader(fp, streaming_backend=None):
-    if not have_streaming_load:
-        raise TypeError('Cannot create a streaming loader - neither ijson nor jsaone are present')
+    # entries are read as they are iterated
+    def __iter__(self):
+        return _read_fingerprints(self.fp)
 
-    if streaming_backend is None:
-        streaming_backend = default_streaming_backend
-    if '-' in streaming_backend:
-        lib, option = streaming_backend.split('-')
-        if lib not in ('ijson', 'jsaone'):
-            raise TypeError('Invalid streaming backend requested: %s' % streaming_backend)
-    elif streaming_backend == 'ijson':
-        lib = 'ijson'
-        option = None
-    elif streaming_backend == 'jsaone':
-        lib = 'jsaone'
-        option = None
-    else:
-        lib = 'ijson'
-        option = streaming_backend
+def load_fingerprints(fp):
+    header = fp.readline()
+    if isinstance(header, bytes):
+        header = header.decode('utf-8')
+    index = json.loads(header)
+    if not isinstance(index, dict) or index.get('method') not in fingerprint_methods:
+        raise ValueError('Not a fingerprint index')
+    if index.get('version') != fingerprint_index_version:
+        raise ValueError('Unsupported fingerprint index version: %s' %
+            index.get('version'))
+    return _FingerprintIndex(fp, index['method'])
 
-    if lib == 'ijson':
-        if not have_ijson:
-            raise TypeError('%s backend requested but ijson is not present' % streaming_backend)
-        if py3 and isinstance(fp.read(0), str):
-            fp = BytesReadWrapper(fp)
-        def loader():
-            return ijson_top_level_items(fp, option)
+def _dump_reader(r, pretty, encoding, key_filter, fingerprint_output,
+                 delta_from, fingerprint_method, contention=None):
+    if fingerprint_output is None and delta_from is None:
+        return _reader(r, pretty, encoding, key_filter, contention)
+    if fingerprint_method not in fingerprint_methods:
+        raise TypeError('Invalid fingerprint method: %s' % fingerprint_method)
+    if fingerprint_method == 'digest' and not r.have_digest_value:
+        raise TypeError('The digest fingerprint method requires '
+            'DEBUG DIGEST-VALUE, which needs redis 4.0 or newer '
+            'with DEBUG enabled')
+    if contention is None:
+        contention = _Contention()
+    previous = None
+    if delta_from is not None:
+        previous = load_fingerprints(delta_from)
+        if previous.method != fingerprint_method:
+            raise ValueError('Fingerprint index was made using %s method, %s requested' % (
+                previous.method, fingerprint_method))
+    output = _FingerprintWriter(fingerprint_output, fingerprint_method)
+    if previous is None and fingerprint_method == 'value':
+        # values are fingerprinted as they are dumped
+        records = _fingerprinted_reader(r, pretty, encoding, key_filter,
+                                        output, contention)
     else:
-        if not have_jsaone:
-            raise TypeError('jsaone backend requested but jsaone is not present')
-        if py3 and isinstance(fp.read(0), bytes):
-            # jsaone can only process text string data (str), not bytes
-            fp = TextReadWrapper(fp)
-        def loader():
-            return jsaone_mod.load(fp)
+        records = _delta_reader(r, pretty, encoding, key_filter,
+            fingerprint_method, previous or [], output, contention)
+    return _closing_fingerprints(records, output)
 
-    return loader
+def _closing_fingerprints(records, output):
+    for record in records:
+        yield record
+    output.close()
 
-def load_streaming(fp, host='localhost', port=6379, password=None, db=0,
-    empty=False, unix_socket_path=None, encoding='utf-8', use_expireat=False,
-    streaming_backend=None,
-):
-    loader = create_loader(fp, streaming_backend)
+def _value_fingerprints(records, encoding):
+    for key, type, ttl, value in records:
+        if isinstance(value, paged_values):
+            # the value is needed twice
+            value = value.materialize()
+        yield key, type, ttl, value, (key.encode(encoding),
+            _value_fingerprint(type, value), _expireat(ttl))
 
-    r = client(host=host, port=port, password=password, db=db,
-               unix_socket_path=unix_socket_path, encoding=encoding)
+def _fingerprinted_reader(r, pretty, encoding, key_filter, output, contention):
+    for key, type, ttl, value, entry in _value_fingerprints(_reader(r, pretty,
+            encoding, key_filter, contention), encoding):
+        output.add(*entry)
+        yield key, type, ttl, value
 
-    counter = 0
-    for key, item in loader():
-        # Create pipeline:
-        if not counter:
-            p = r.pipeline(transaction=False)
-        type = item['type']
-        value = item['value']
-        ttl = item.get('ttl')
+# yields entries of the keys in redis, unsorted
+def _fingerprints(r, encoding, key_filter, method, contention):
+    if method == 'value':
+        for record in _value_fingerprints(_reader(r, False, encoding,
+                key_filter, contention), encoding):
+            yield record[4]
+        return
+    # DEBUG DIGEST-VALUE (redis 4.0+) gives digests without transferring
+    # values
+    types = key_filter.types
+    for batch in _batches(_matching_keys(r, key_filter), digest_batch_size):
+        p = r.pipeline(transaction=False)
+        for key in batch:
+            p.execute_command('DEBUG', 'DIGEST-VALUE', key)
+            r.pttl_or_ttl_pipeline(p, key)
+            if types is not None:
+                p.type(key)
+        results = p.execute()
+        if types is None:
+            results = [(digest, ttl, None)
+                for digest, ttl in zip(results[::2], results[1::2])]
+        else:
+            results = list(zip(results[::3], results[1::3], results[2::3]))
+        for key, (digest, ttl, type) in zip(batch, results):
+            if digest[0] == b'0' * 40:
+                # deleted by a concurrent operation
+                continue
+            if type is not None and type.decode('ascii') not in types:
+                continue
+            yield (key, _digest_fingerprint(digest[0]),
+                _expireat(r.decode_pttl_or_ttl_pipeline_value(ttl)))
+
+# yields (key, current entry, previous entry) tuples of sorted entries,
+# either entry being None for keys of one side only
+def _merged_fingerprints(current, previous):
+    current = iter(current)
+    previous = iter(previous)
+    entry = next(current, None)
+    previous_entry = next(previous, None)
+    while entry is not None or previous_entry is not None:
+        if previous_entry is None or (entry is not None and
+                entry[0] < previous_entry[0]):
+            yield entry[0], entry, None
+            entry = next(current, None)
+        elif entry is None or previous_entry[0] < entry[0]:
+            yield previous_entry[0], None, previous_entry
+            previous_entry = next(previous, None)
+        else:
+            yield entry[0], entry, previous_entry
+            entry = next(current, None)
+            previous_entry = next(previous, None)
+
+def _unchanged(previous_entry, entry):
+    if previous_entry is None:
+        return False
+    return previous_entry[1] == entry[1] and \
+        _same_expireat(previous_entry[2], entry[2])
+
+# a key skipped under the skip contention policy is neither dumped nor
+# deleted. its entry of the previous index is kept, or it is left out of
+# the index if it is new, so that the next delta compares it with the data
+# the previous dumps hold
+def _keep_entry(output, previous_entry):
+    if previous_entry is not None:
+        output.add(*previous_entry)
+
+def _delta_reader(r, pretty, encoding, key_filter, method, previous, output,
+                  contention):
+    current = _ExternalSorter(fingerprint_sort_buffer_size,
+        _pack_fingerprint, _read_fingerprints)
+    try:
+        for entry in _fingerprints(r, encoding, key_filter, method, contention):
+            current.add(entry)
+        merged = _merged_fingerprints(current.sorted(), previous)
+        for batch in _batches(merged, digest_batch_size):
+            changed = {}
+            for key, entry, previous_entry in batch:
+                if entry is None:
+                    if key.decode(encoding) in contention.skipped:
+                        _keep_entry(output, previous_entry)
+                    else:
+                        # not seen in this dump, hence deleted
+                        yield key.decode(encoding), 'none', None, None
+                elif _unchanged(previous_entry, entry):
+                    output.add(*entry)
+                else:
+                    changed[key] = (entry, previous_entry)
+            # a value modified after its fingerprint was taken is dumped
+            # with the old fingerprint, and therefore dumped again by the
+            # next delta
+            records = _read_keys(r, sorted(changed), pretty, encoding,
+                                 key_filter.types, contention)
+            if method == 'value':
+                # the dumped value is fingerprinted
+                records = _value_fingerprints(records, encoding)
+            else:
+                records = ((key, type, ttl, value, (key.encode(encoding),
+                    changed[key.encode(encoding)][0][1], _expireat(ttl)))
+                    for key, type, ttl, value in records)
+            for key, type, ttl, value, entry in records:
+                del changed[entry[0]]
+                output.add(*entry)
+                yield key, type, ttl, value
+            for key in sorted(changed):
+                entry, previous_entry = changed[key]
+                if key.decode(encoding) in contention.skipped:
+                    _keep_entry(output, previous_entry)
+                elif previous_entry is not None:
+                    # deleted after its fingerprint was taken
+                    yield key.decode(encoding), 'none', None, None
+    finally:
+        current.close()
+
+def copy(host='localhost', port=6379, password=None, db=0,
+         unix_socket_path=None, encoding='utf-8', keys='*',
+         target_host=None, target_port=None, target_password=None,
+         target_db=None, target_unix_socket_path=None, empty=False,
+         client=None, connection_pool=None,
+         target_client=None, target_connection_pool=None,
+         use_dump_restore=None, batch_size=1000, queue_size=16,
+         exclude_keys=None, types=None, throttle=None,
+         on_contention='fail', contention_stats=None):
+    key_filter = _KeyFilter(keys, exclude_keys, types, encoding)
+    contention = _Contention(on_contention, contention_stats)
+    r = _resolve_client(client, connection_pool, host=host, port=port,
+                        password=password, db=db,
+                        unix_socket_path=unix_socket_path, encoding=encoding)
+    # target connection parameters default to the source ones
+    if target_host is None:
+        target_host = host
+    if target_port is None:
+        target_port = port
+    if target_password is None:
+        target_password = password
+    if target_db is None:
+        target_db = db
+    if target_unix_socket_path is None and target_host == host:
+        target_unix_socket_path = unix_socket_path
+    target = _resolve_client(target_client, target_connection_pool,
+                             host=target_host, port=target_port,
+                             password=target_password, db=target_db,
+                             unix_socket_path=target_unix_socket_path,
+                             encoding=encoding)
+    if _same_database(r, target):
+        # emptying the target would wipe the source
+        raise TypeError('Cannot copy a database onto itself')
+
+    if use_dump_restore is None:
+        # DUMP payloads can only be restored by the same or a newer redis
+        source_capabilities = r.capabilities
+        target_capabilities = target.capabilities
+        use_dump_restore = (source_capabilities.have_dump_restore and
+            target_capabilities.version[:2] >= source_capabilities.version[:2])
+
+    if empty:
+        _empty(target)
+
+    if use_dump_restore:
+        batches = _dump_payload_batches(r, key_filter, batch_size)
+        consume = functools.partial(_restore_batch, target)
+    else:
+        batches = _record_batches(r, encoding, key_filter, batch_size,
+                                  contention)
+        consume = functools.partial(_write_batch, target)
+    if throttle is not None:
+        # paces writes, and through the queue reads as well
+        consume = functools.partial(_throttled_consume, target, throttle, consume)
+    _run_stages(batches, consume, queue_size)
+
+def _server_id(r):
+    try:
+        info = r.info(b'server')
+    except redis.ResponseError:
+        # redis < 2.6 does not accept a section argument
+        info = r.info()
+    # run_id identifies the server process whatever address it is reached
+    # by; redis < 2.4 does not report it
+    if 'run_id' in info:
+        return info['run_id']
+    kwargs = r.connection_pool.connection_kwargs
+    return (kwargs.get('host'), kwargs.get('port'), kwargs.get('path'))
+
+def _same_database(r, target):
+    db = r.connection_pool.connection_kwargs.get('db', 0)
+    target_db = target.connection_pool.connection_kwargs.get('db', 0)
+    return int(db) == int(target_db) and _server_id(r) == _server_id(target)
+
+# note: keys are byte strings and are never decoded, so that copying
+# does not depend on the encoding
+def _dump_payload_batches(r, key_filter, batch_size):
+    types = key_filter.types
+    pool = r.connection_pool
+    for batch in _batches(_matching_keys(r, key_filter), batch_size):
+        # the payload and the ttl of each key are read in a transaction of
+        # their own, so that they agree
+        commands = []
+        for key in batch:
+            commands.append(('MULTI',))
+            commands.append(('DUMP', key))
+            commands.append(('PTTL', key))
+            if types is not None:
+                commands.append(('TYPE', key))
+            commands.append(('EXEC',))
+        connection = pool.get_connection('MULTI')
+        try:
+            replies = _execute_packed(connection, commands)
+        finally:
+            pool.release(connection)
+        step = len(commands) // len(batch)
+        payloads = []
+        for key, results in zip(batch, replies[step - 1::step]):
+            for result in results:
+                if isinstance(result, redis.ResponseError):
+                    raise result
+            payload, pttl = results[:2]
+            if pttl == -2:
+                # key was deleted by a concurrent operation
+                continue
+            if types is not None and results[2].decode('ascii') not in types:
+                continue
+            if pttl == -1:
+                # no ttl
+                pttl = 0
+            payloads.append((key, pttl, payload))
+        yield payloads
+
+def _restore_batch(r, payloads):
+    p = r.pipeline(transaction=False)
+    replace = r.capabilities.have_restore_replace
+    for key, pttl, payload in payloads:
+        if replace:
+            p.execute_command('RESTORE', key, pttl, payload, 'REPLACE')
+        else:
+            p.delete(key)
+            p.execute_command('RESTORE', key, pttl, payload)
+    p.execute()
+
+def _record_batches(r, encoding, key_filter, batch_size, contention=None):
+    batch = []
+    for record in _reader(r, False, encoding, key_filter, contention):
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _throttled_consume(r, throttle, consume, batch):
+    consume(batch)
+    size = 0
+    for item in batch:
+        if isinstance(item[2], bytes):
+            # DUMP payload
+            size += len(item[2])
+        else:
+            size += throttle.value_size(item[3])
+    throttle.record(r, len(batch), size)
+
+def _write_batch(r, records):
+    p = r.pipeline(transaction=False)
+    for key, type, ttl, value in records:
+        _writer(r, p, key, type, value, ttl, None, use_expireat=False)
+    p.execute()
+
+# runs the producer of batches in a separate thread, so that reading from
+# one server overlaps with writing to the other. at most queue_size batches
+# are held in memory
+def _run_stages(batches, consume, queue_size):
+    import threading
+    try:
+        import queue
+    except ImportError:
+        # python 2
+        import Queue as queue
+
+    q = queue.Queue(queue_size)
+    stop = threading.Event()
+    failure = []
+    end = object()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for batch in batches:
+                if not put(batch):
+                    return
+        except Exception:
+            failure.append(sys.exc_info()[1])
+        put(end)
+
+    thread = threading.Thread(target=produce)
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            batch = q.get()
+            if batch is end:
+                break
+            consume(batch)
+    finally:
+        stop.set()
+        thread.join()
+    if failure:
+        raise failure[0]
+
+# pre-flight estimation
+#
+# estimate samples the keyspace with RANDOMKEY and extrapolates the number
+# of keys of each type, their memory usage, the size of the dump and the
+# time it would take to produce it.
+
+# commands returning the number of elements of a key of each type;
+# the length in bytes for strings
+cardinality_commands = {
+    'string': 'STRLEN',
+    'list': 'LLEN',
+    'set': 'SCARD',
+    'zset': 'ZCARD',
+    'hash': 'HLEN',
+    'stream': 'XLEN',
+}
+
+def estimate(host='localhost', port=6379, password=None, db=0,
+             unix_socket_path=None, encoding='utf-8', keys='*',
+             exclude_keys=None, types=None, client=None, connection_pool=None,
+             sample_size=1000, read_sample_size=100):
+    key_filter = _KeyFilter(keys, exclude_keys, types, encoding)
+    r = _resolve_client(client, connection_pool, host=host, port=port,
+                        password=password, db=db,
+                        unix_socket_path=unix_socket_path, encoding=encoding)
+    round_trip = _round_trip(r)
+    total = r.dbsize()
+    if total <= sample_size:
+        # small data sets are examined completely
+        sample = list(_matching_keys(r, key_filter))
+        scale = 1.0
+    else:
+        p = r.pipeline(transaction=False)
+        for i in range(sample_size):
+            p.randomkey()
+        sample = [key for key in p.execute() if key is not None]
+        # every sampled key stands for this many keys
+        scale = float(total) / max(len(sample), 1)
+        sample = [key for key in sample if key_filter.matches(key)]
+
+    sample = _sample_stats(r, sample, key_filter.types)
+    result = {
+        'keys': int(round(len(sample) * scale)),
+        'sampled_keys': len(sample),
+        'round_trip': round_trip,
+        'types': {},
+    }
+    memory_usage = r.capabilities.have_memory_usage
+    for type in sorted(set(stat[1] for stat in sample)):
+        stats = [stat for stat in sample if stat[1] == type]
+        result['types'][type] = {
+            'keys': int(round(len(stats) * scale)),
+            'cardinality': float(sum(stat[2] for stat in stats)) / len(stats),
+            'memory': int(sum(stat[3] for stat in stats) * scale) if memory_usage else None,
+        }
+    if memory_usage:
+        result['memory'] = int(sum(stat[3] for stat in sample) * scale)
+    else:
+        result['memory'] = None
+
+    # a part of the sample is dumped, in the same way dump does it, to
+    # measure output size and reader throughput
+    read_sample = sample[:read_sample_size]
+    counter = _CountingWriter()
+    encoder = json.JSONEncoder(separators=(',', ':'))
+    reader = _single_connection_client(r)
+    round_trips = _count_round_trips(reader)
+    start = _time.time()
+    _write_table(counter, encoder, _read_keys(reader,
+        [stat[0] for stat in read_sample], False, encoding, key_filter.types))
+    elapsed = _time.time() - start
+    result['read_keys'] = len(read_sample)
+    result['read_round_trips'] = round_trips[0]
+    if not read_sample:
+        result['size'] = 2
+        result['duration'] = 0.0
+        return result
+    if memory_usage and sum(stat[3] for stat in read_sample):
+        # keys vary in size a lot; memory usage of the whole sample
+        # represents the data set better than the few keys read
+        fraction = float(sum(stat[3] for stat in read_sample)) / \
+            sum(stat[3] for stat in sample)
+    else:
+        fraction = float(len(read_sample)) / len(sample)
+    # the round trips of the keys read are counted, and the rest of the
+    # time is proportional to the amount of data
+    per_key = float(round_trips[0]) / len(read_sample)
+    transfer = max(elapsed - round_trip * round_trips[0], 0)
+    result['size'] = int(counter.count / fraction * scale)
+    result['duration'] = per_key * round_trip * result['keys'] + \
+        transfer / fraction * scale
+    return result
+
+# counts the requests sent over the connection of a client returned by
+# _single_connection_client; each is answered before the next is sent,
+# so every request is a round trip
+def _count_round_trips(r):
+    pool = r.connection_pool
+    connection = pool.get_connection('PING')
+    pool.release(connection)
+    count = [0]
+    send_packed_command = connection.send_packed_command
+    def counted_send_packed_command(*args, **kwargs):
+        count[0] += 1
+        return send_packed_command(*args, **kwargs)
+    connection.send_packed_command = counted_send_packed_command
+    return count
+
+def _round_trip(r, count=5):
+    times = []
+    for i in range(count):
+        start = _time.time()
+        r.ping()
+        times.append(_time.time() - start)
+    return min(times)
+
+# returns (key, type, cardinality, memory usage) tuples for keys which
+# still exist and have one of the requested types
+def _sample_stats(r, sample, types):
+    memory_usage = r.capabilities.have_memory_usage
+    p = r.pipeline(transaction=False)
+    for key in sample:
+        p.type(key)
+        if memory_usage:
+            p.execute_command('MEMORY USAGE', key)
+    results = p.execute()
+    if memory_usage:
+        results = list(zip(results[::2], results[1::2]))
+    else:
+        results = [(type, 0) for type in results]
+    typed = []
+    for key, (type, memory) in zip(sample, results):
+        type = type.decode('ascii')
+        if type == 'none' or memory is None:
+            # deleted by a concurrent operation
+            continue
+        if types is not None and type not in types:
+            continue
+        typed.append((key, type, memory))
+
+    p = r.pipeline(transaction=False)
+    for key, type, memory in typed:
+        command = cardinality_commands.get(type)
+        if command is None:
+            raise UnknownTypeError("Unknown key type: %s" % type)
+        p.execute_command(command, key)
+    cardinalities = p.execute()
+    return [(key, type, cardinality or 0, memory)
+        for (key, type, memory), cardinality in zip(typed, cardinalities)]
+
+class _CountingWriter(object):
+    def __init__(self):
+        self.count = 0
+
+    def write(self, s):
+        # dumps are ascii, hence characters are bytes
+        self.count += len(s)
+
+# keyspace profiles
+#
+# a dump given profile_output profiles the keys it dumps in the same pass:
+# keys are counted by type and by prefix, and the memory usage reported
+# by MEMORY USAGE (redis 4.0+), cardinality and expiration time of each key
+# are summarized. memory usage, and the lengths of strings and streams,
+# are requested in pipelines of profile_batch_size keys after the keys
+# are read. the profile is written as a JSON document when the dump
+# completes:
+# {"keys": N, "memory": bytes,
+#  "types": {"hash": {"keys": N, "memory": bytes, "elements": N,
+#                     "cardinality": {"1": N, "2": N, "4": N, ...}}, ...},
+#  "prefixes": {"user": {"keys": N, "memory": bytes}, ...},
+#  "ttl": {"none": N, "1m": N, "1h": N, "1d": N, "1w": N, "longer": N},
+#  "biggest": [{"db": db, "key": key, "type": type, "memory": bytes,
+#               "cardinality": N}, ...]}
+# cardinality histograms count keys by the power of two their number of
+# elements (their length in bytes, for strings) is at most. the prefix
+# of a key is the key up to its profile_prefix_depth-th separator, or ""
+# for keys without a separator. biggest lists the profile_top_keys keys
+# using the most memory, or having the most elements if redis does not
+# report memory usage, in which case memory fields are null.
+
+profile_separator = ':'
+profile_prefix_depth = 1
+profile_top_keys = 20
+
+# number of keys whose memory usage is requested in one pipeline
+profile_batch_size = 1000
+
+# ttl buckets of profiles, by their upper bounds in seconds
+profile_ttl_buckets = ((60, '1m'), (3600, '1h'), (86400, '1d'), (604800, '1w'))
+
+class _Profile(object):
+    def __init__(self, fp):
+        try:
+            fp.write('')
+        except TypeError:
+            fp = BytesWriteWrapper(fp)
+        self.fp = fp
+        self.keys = 0
+        self.memory = 0
+        self.types = {}
+        self.prefixes = {}
+        self.ttls = {'none': 0, 'longer': 0}
+        for bound, name in profile_ttl_buckets:
+            self.ttls[name] = 0
+        self.biggest = []
+        self.memory_usage = True
+
+    # profiles records of database db as they are dumped
+    def records(self, records, r, db, encoding):
+        self.memory_usage = r.capabilities.have_memory_usage
+        pending = []
+        for record in records:
+            key, type, ttl, value = record
+            if type != 'none':
+                # values are not held until their keys are profiled
+                pending.append((key, type, ttl, _profile_cardinality(type, value)))
+                if len(pending) >= profile_batch_size:
+                    self.flush(r, db, encoding, pending)
+                    pending = []
+            yield record
+        self.flush(r, db, encoding, pending)
+
+    def flush(self, r, db, encoding, pending):
+        if not pending:
+            return
+        p = r.pipeline(transaction=False)
+        for key, type, ttl, cardinality in pending:
+            encoded_key = key.encode(encoding)
+            if self.memory_usage:
+                p.execute_command('MEMORY USAGE', encoded_key)
+            if cardinality is None:
+                p.execute_command(cardinality_commands[type], encoded_key)
+        # keys modified meanwhile might have another type
+        results = iter(p.execute(raise_on_error=False))
+        for key, type, ttl, cardinality in pending:
+            memory = None
+            if self.memory_usage:
+                memory = next(results)
+                if memory is None or isinstance(memory, Exception):
+                    memory = 0
+            if cardinality is None:
+                cardinality = next(results)
+                if cardinality is None or isinstance(cardinality, Exception):
+                    cardinality = 0
+            self.add(db, key, type, ttl, cardinality, memory)
+
+    def add(self, db, key, type, ttl, cardinality, memory):
+        import heapq
+
+        self.keys += 1
+        self.memory += memory or 0
+        stats = self.types.get(type)
+        if stats is None:
+            stats = self.types[type] = {'keys': 0, 'memory': 0, 'elements': 0,
+                                        'cardinality': {}}
+        stats['keys'] += 1
+        stats['memory'] += memory or 0
+        stats['elements'] += cardinality
+        if cardinality:
+            bucket = str(1 << (cardinality - 1).bit_length())
+        else:
+            bucket = '0'
+        stats['cardinality'][bucket] = stats['cardinality'].get(bucket, 0) + 1
+        parts = key.split(profile_separator, profile_prefix_depth)
+        prefix = profile_separator.join(parts[:-1])
+        stats = self.prefixes.get(prefix)
+        if stats is None:
+            stats = self.prefixes[prefix] = {'keys': 0, 'memory': 0}
+        stats['keys'] += 1
+        stats['memory'] += memory or 0
+        self.ttls[_ttl_bucket(ttl)] += 1
+        if self.memory_usage:
+            size = memory
+        else:
+            size = cardinality
+        entry = (size, self.keys, {'db': db, 'key': key, 'type': type,
+                                   'memory': memory, 'cardinality': cardinality})
+        if len(self.biggest) < profile_top_keys:
+            heapq.heappush(self.biggest, entry)
+        elif entry > self.biggest[0]:
+            heapq.heapreplace(self.biggest, entry)
+
+    def close(self):
+        profile = {
+            'keys': self.keys,
+            'types': self.types,
+            'prefixes': self.prefixes,
+            'ttl': self.ttls,
+            'biggest': [entry[2] for entry in sorted(self.biggest, reverse=True)],
+        }
+        if self.memory_usage:
+            profile['memory'] = self.memory
+        else:
+            profile['memory'] = None
+            for stats in list(self.types.values()) + list(self.prefixes.values()):
+                stats['memory'] = None
+        self.fp.write(json.dumps(profile, indent=2, sort_keys=True))
+
+# cardinality of a value, or None if it is requested from redis
+def _profile_cardinality(type, value):
+    if isinstance(value, StringValue):
+        return value.length
+    if type in ('string', 'stream'):
+        return None
+    return len(value)
+
+def _ttl_bucket(ttl):
+    if ttl is None:
+        return 'none'
+    for bound, name in profile_ttl_buckets:
+        if ttl <= bound:
+            return name
+    return 'longer'
+
+def _profile(fp):
+    if fp is None:
+        return None
+    return _Profile(fp)
+
+def _profiled(records, r, profile, db, encoding):
+    if profile is None:
+        return records
+    return profile.records(records, r, db, encoding)
+
+# verification
+#
+# verify compares a dump with the data in redis without transferring
+# values: a script computes a digest of each value in redis, which is
+# compared with the same digest computed from the dump. strings are
+# hashed with sha1; list and stream digests chain sha1 over the elements in
+# order; set, sorted set and hash digests add up sha1 hashes of their members
+# as five 32-bit words each, which does not depend on member order.
+# collections with more than verify_digest_limit elements, and strings
+# longer than that many bytes, are read and hashed on the client instead,
+# so that the script does not block redis for long. long strings are read
+# and hashed a chunk at a time.
+
+# number of keys verified in one pipeline
+verify_batch_size = 1000
+
+verify_digest_limit = 10000
+
+_verify_script = b'''
+local function add(sum, hex)
+    for i = 1, 5 do
+        sum[i] = (sum[i] + tonumber(string.sub(hex, i * 8 - 7, i * 8), 16)) % 4294967296
+    end
+end
+local key = KEYS[1]
+local type = redis.call('TYPE', key).ok
+local pttl = redis.call('PTTL', key)
+local size, digest
+if type == 'string' then
+    size = redis.call('STRLEN', key)
+elseif type == 'list' then
+    size = redis.call('LLEN', key)
+elseif type == 'set' then
+    size = redis.call('SCARD', key)
+elseif type == 'zset' then
+    size = redis.call('ZCARD', key)
+elseif type == 'hash' then
+    size = redis.call('HLEN', key)
+elseif type == 'stream' then
+    size = redis.call('XLEN', key)
+else
+    return {type, pttl, 0, ''}
+end
+if size > tonumber(ARGV[1]) then
+    return {type, pttl, size, ''}
+end
+if type == 'string' then
+    return {type, pttl, size, redis.sha1hex(redis.call('GET', key))}
+end
+local sum = {0, 0, 0, 0, 0}
+if type == 'list' then
+    digest = ''
+    for i, element in ipairs(redis.call('LRANGE', key, 0, -1)) do
+        digest = redis.sha1hex(digest .. element)
+    end
+elseif type == 'set' then
+    for i, member in ipairs(redis.call('SMEMBERS', key)) do
+        add(sum, redis.sha1hex(member))
+    end
+elseif type == 'zset' then
+    local items = redis.call('ZRANGE', key, 0, -1, 'WITHSCORES')
+    for i = 1, #items, 2 do
+        local score = string.format('%.17g', tonumber(items[i + 1]))
+        add(sum, redis.sha1hex(#items[i] .. ':' .. items[i] .. score))
+    end
+elseif type == 'hash' then
+    local items = redis.call('HGETALL', key)
+    for i = 1, #items, 2 do
+        add(sum, redis.sha1hex(#items[i] .. ':' .. items[i] .. items[i + 1]))
+    end
+else
+    digest = ''
+    for i, entry in ipairs(redis.call('XRANGE', key, '-', '+')) do
+        local data = digest .. #entry[1] .. ':' .. entry[1]
+        for j, field in ipairs(entry[2]) do
+            data = data .. #field .. ':' .. field
+        end
+        digest = redis.sha1hex(data)
+    end
+end
+if not digest then
+    digest = string.format('%08x%08x%08x%08x%08x', sum[1], sum[2], sum[3], sum[4], sum[5])
+end
+return {type, pttl, size, digest}
+'''
+
+def _verify_digest(type, value, encoding):
+    import hashlib
+
+    def sha1(data):
+        return hashlib.sha1(data).hexdigest()
+
+    def add(sum, hex):
+        for i in range(5):
+            sum[i] = (sum[i] + int(hex[i * 8:i * 8 + 8], 16)) % 4294967296
+
+    def prefixed(s):
+        s = s.encode(encoding)
+        return ('%d:' % len(s)).encode('ascii') + s
+
+    if type == 'string':
+        return sha1(value.encode(encoding))
+    elif type == 'list':
+        digest = ''
+        for element in value:
+            digest = sha1(digest.encode('ascii') + element.encode(encoding))
+        return digest
+    elif type == 'stream':
+        digest = ''
+        for id, fields in value['entries']:
+            data = digest.encode('ascii') + prefixed(id)
+            for field in fields:
+                data += prefixed(field)
+            digest = sha1(data)
+        return digest
+    sum = [0] * 5
+    if type == 'set':
+        for member in value:
+            add(sum, sha1(member.encode(encoding)))
+    elif type == 'zset':
+        for member, score in value:
+            # scores are formatted the same way by C and Python
+            score = '%.17g' % float(score)
+            add(sum, sha1(prefixed(member) + score.encode('ascii')))
+    else:
+        for field in value:
+            add(sum, sha1(prefixed(field) + value[field].encode(encoding)))
+    return '%08x%08x%08x%08x%08x' % tuple(sum)
+
+# the digest of a string of the given length in redis, read
+# string_chunk_size bytes at a time
+def _string_digest(r, key, length):
+    import hashlib
+
+    digest = hashlib.sha1()
+    for start in range(0, length, string_chunk_size):
+        digest.update(r.getrange(key, start, start + string_chunk_size - 1))
+    return digest.hexdigest()
+
+# returns records of a dump read from fp, using a streaming backend if
+# one is available
+def _dump_records(fp, streaming_backend, key_filter, encoding):
+    if have_streaming_load:
+        return create_loader(fp, streaming_backend, key_filter, encoding)()
+    s = fp.read()
+    if py3 and isinstance(s, bytes):
+        s = s.decode('utf-8')
+    return _selected_records(_table_records(json.loads(s)), key_filter, encoding)
+
+def _ttl_drifted(item, ttl, use_expireat, tolerance):
+    expireat = item.get('expireat')
+    if use_expireat and expireat is not None:
+        expected = float(expireat) - _time.time()
+    else:
+        expected = item.get('ttl')
+    if expected is None or ttl is None:
+        return (expected is None) != (ttl is None)
+    # streaming backends may give numbers as decimals
+    return abs(float(expected) - ttl) > tolerance
+
+class _Verifier(object):
+    def __init__(self, r, encoding, use_expireat, ttl_tolerance):
+        self.r = r
+        self.encoding = encoding
+        self.use_expireat = use_expireat
+        self.ttl_tolerance = ttl_tolerance
+        self.db = None
+        self.report = {
+            'keys': 0,
+            'matched': 0,
+            'missing': [],
+            'extra': [],
+            'type_mismatch': [],
+            'value_mismatch': [],
+            'ttl_mismatch': [],
+        }
+        self.sha = r.execute_command('SCRIPT LOAD', _verify_script)
+        self.limit = str(verify_digest_limit).encode('ascii')
+
+    # keys are reported as names, or [db, name] pairs for multiple
+    # database dumps
+    def add(self, kind, key):
+        if self.db is not None:
+            key = [self.db, key]
+        self.report[kind].append(key)
+
+    def verify(self, batch):
+        self.report['keys'] += len(batch)
+        for key, item, kind in self.check(batch):
+            if kind is None:
+                self.report['matched'] += 1
+            else:
+                self.add(kind, key)
+
+    # yields (key, item, kind) tuples, kind being the kind of difference
+    # or None for matching keys
+    def check(self, batch):
+        p = self.r.pipeline(transaction=False)
+        for key, item in batch:
+            p.execute_command('EVALSHA', self.sha, b'1', key.encode(self.encoding),
+                self.limit)
+        unhashed = {}
+        for (key, item), reply in zip(batch, p.execute()):
+            type, pttl, size, digest = reply
+            type = type.decode('ascii')
+            if item['type'] == 'none':
+                # a tombstone of a delta
+                yield key, item, None if type == 'none' else 'extra'
+            elif type == 'none':
+                yield key, item, 'missing'
+            elif type != item['type']:
+                yield key, item, 'type_mismatch'
+            else:
+                ttl = None if pttl < 0 else float(pttl) / 1000
+                if digest:
+                    yield key, item, self.compare(item, digest.decode('ascii'), ttl)
+                elif type == 'string':
+                    digest = _string_digest(self.r, key.encode(self.encoding), size)
+                    yield key, item, self.compare(item, digest, ttl)
+                else:
+                    unhashed[key] = (item, ttl)
+        if unhashed:
+            encoded_keys = [key.encode(self.encoding) for key in unhashed]
+            for key, type, ttl, value in _read_keys(self.r, encoded_keys,
+                                                     False, self.encoding):
+                item, ttl = unhashed.pop(key)
+                if type != item['type']:
+                    yield key, item, 'type_mismatch'
+                    continue
+                if isinstance(value, paged_values):
+                    value = value.materialize()
+                yield key, item, self.compare(item,
+                    _verify_digest(type, value, self.encoding), ttl)
+            # deleted since their digests were requested
+            for key in unhashed:
+                yield key, unhashed[key][0], 'missing'
+
+    def compare(self, item, digest, ttl):
+        if digest != _verify_digest(item['type'], item['value'], self.encoding):
+            return 'value_mismatch'
+        elif _ttl_drifted(item, ttl, self.use_expireat, self.ttl_tolerance):
+            return 'ttl_mismatch'
+        return None
+
+    # returns keys in redis, as bytes, which are not in the dump
+    def extra_keys(self, key_filter, dumped):
+        candidates = [key for key in _matching_keys(self.r, key_filter)
+            if not key_filter.excluded(key) and key not in dumped]
+        if key_filter.types is not None:
+            # keys of other types are listed unless SCAN filters by type
+            p = self.r.pipeline(transaction=False)
+            for key in candidates:
+                p.type(key)
+            candidates = [key for key, type in zip(candidates, p.execute())
+                if type.decode('ascii') in key_filter.types]
+        return sorted(candidates)
+
+    def check_extra(self, key_filter, dumped):
+        for key in self.extra_keys(key_filter, dumped):
+            self.add('extra', key.decode(self.encoding))
+
+def verify(fp, host='localhost', port=6379, password=None, db=0,
+    unix_socket_path=None, encoding='utf-8', use_expireat=False,
+    streaming_backend=None, client=None, connection_pool=None,
+    keys='*', exclude_keys=None, types=None, check_extra=True,
+    ttl_tolerance=60,
+):
+    key_filter = _KeyFilter(keys, exclude_keys, types, encoding)
+    r = _resolve_client(client, connection_pool, host=host, port=port,
+                        password=password, db=db,
+                        unix_socket_path=unix_socket_path, encoding=encoding)
+    records = _dump_records(fp, streaming_backend,
+        _load_filter(keys, exclude_keys, types, encoding), encoding)
+    verifier = _Verifier(r, encoding, use_expireat, ttl_tolerance)
+    # names of dumped keys, by database
+    dumped = {}
+    batch = []
+    for record_db, key, item in records:
+        if record_db is not None and record_db != verifier.db:
+            if batch:
+                verifier.verify(batch)
+                batch = []
+            if verifier.db is None:
+                verifier.r = _single_connection_client(verifier.r)
+            _select_db(verifier.r, record_db)
+            verifier.db = record_db
+        if check_extra:
+            dumped.setdefault(record_db, set()).add(key.encode(encoding))
+        batch.append((key, item))
+        if len(batch) == verify_batch_size:
+            verifier.verify(batch)
+            batch = []
+    if batch:
+        verifier.verify(batch)
+    if check_extra:
+        if verifier.db is None:
+            verifier.check_extra(key_filter, dumped.get(None, set()))
+        else:
+            # databases which are not in the dump are not checked
+            for record_db in sorted(dumped):
+                _select_db(verifier.r, record_db)
+                verifier.db = record_db
+                verifier.check_extra(key_filter, dumped[record_db])
+    return verifier.report
+
+# sync loads
+#
+# a sync load compares every record with redis the way verify does and
+# writes only the keys which are missing or differ, which makes loading
+# a dump into a data set that mostly holds the same data a mostly read-only
+# operation. with delete_extra, keys which are not in the dump are deleted.
+
+# TTLs of synced keys may differ from the dump by this many seconds
+sync_ttl_tolerance = 60
+
+class _Sync(object):
+    def __init__(self, encoding, use_expireat, key_filter, delete_extra):
+        self.encoding = encoding
+        self.use_expireat = use_expireat
+        self.key_filter = key_filter
+        self.delete_extra = delete_extra
+        # names of dumped keys, by database
+        self.dumped = {}
+
+    def records(self, r, records, transform):
+        verifier = self.verifier = _Verifier(r, self.encoding,
+            self.use_expireat, sync_ttl_tolerance)
+        batch = []
+        for db, key, item in records:
+            if transform is not None:
+                db, key = transform.transform(db, key)
+            if db is not None and db != verifier.db:
+                for record in self.changed(batch):
+                    yield record
+                batch = []
+                if verifier.db is None:
+                    verifier.r = _single_connection_client(verifier.r)
+                _select_db(verifier.r, db)
+                verifier.db = db
+            if self.delete_extra:
+                self.dumped.setdefault(db, set()).add(key.encode(self.encoding))
+            batch.append((key, item))
+            if len(batch) == verify_batch_size:
+                for record in self.changed(batch):
+                    yield record
+                batch = []
+        for record in self.changed(batch):
+            yield record
+
+    def changed(self, batch):
+        if not batch:
+            return
+        for key, item, kind in self.verifier.check(batch):
+            if kind is not None:
+                yield self.verifier.db, key, item
+
+    def prune(self):
+        if not self.delete_extra:
+            return
+        verifier = self.verifier
+        if not self.dumped:
+            # an empty dump of a single database
+            self.dumped[None] = set()
+        for db in sorted(self.dumped, key=lambda db: -1 if db is None else db):
+            if db is not None:
+                _select_db(verifier.r, db)
+            extra = verifier.extra_keys(self.key_filter, self.dumped[db])
+            for batch in _batches(extra, verify_batch_size):
+                p = verifier.r.pipeline(transaction=False)
+                for key in batch:
+                    verifier.r.unlink_or_delete_pipeline(p, key)
+                p.execute()
+
+def _load_sync(sync, delete_extra, key_filter, encoding, use_expireat, empty,
+               transform):
+    if not sync:
+        if delete_extra:
+            raise TypeError('delete_extra requires sync')
+        return None
+    if empty:
+        raise TypeError('Sync loads cannot empty the database')
+    if delete_extra and transform is not None and (transform.key_prefix or
+            transform.strip_prefix or transform.rename is not None):
+        raise TypeError('Extra keys cannot be deleted when keys are renamed')
+    return _Sync(encoding, use_expireat, key_filter or _KeyFilter(),
+        delete_extra)
+
+# throttling
+#
+# a throttle paces dumps, loads and copies. operations are keys read or
+# written, bytes are bytes of dumped data. max_ops and max_bytes are hard
+# limits per second. with max_latency given, the round trip time of PING
+# is sampled every sample_interval seconds; while it exceeds max_latency,
+# the pause after every key and the pipeline size of loads are adjusted
+# (multiplicative decrease, additive increase).
+
+class Throttle(object):
+    def __init__(self, max_latency=None, max_ops=None, max_bytes=None,
+                 sample_interval=1.0, batch_size=10000, max_pause=1.0):
+        self.max_latency = max_latency
+        self.max_ops = max_ops
+        self.max_bytes = max_bytes
+        self.sample_interval = sample_interval
+        self.max_batch_size = self.current_batch_size = batch_size
+        self.max_pause = max_pause
+        self.pause = 0
+        # most recently measured round trip time
+        self.latency = None
+        self.window_start = self.last_sample = None
+        self.ops = self.bytes = 0
+
+    @property
+    def batch_size(self):
+        size = self.current_batch_size
+        if self.max_ops:
+            # a pipeline is sent all at once, keep bursts short
+            size = min(size, max(1, int(self.max_ops / 10)))
+        return size
+
+    def record(self, r, ops=1, size=0):
+        now = _time.time()
+        if self.window_start is None:
+            self.window_start = self.last_sample = now
+        self.ops += ops
+        self.bytes += size
+        if self.max_latency is not None and now - self.last_sample >= self.sample_interval:
+            self.sample(r)
+            self.last_sample = _time.time()
+        elapsed = now - self.window_start
+        delay = self.pause
+        if self.max_ops:
+            delay = max(delay, float(self.ops) / self.max_ops - elapsed)
+        if self.max_bytes:
+            delay = max(delay, float(self.bytes) / self.max_bytes - elapsed)
+        if delay > 0:
+            _time.sleep(delay)
+        if elapsed >= self.sample_interval:
+            self.window_start = _time.time()
+            self.ops = self.bytes = 0
+
+    def sample(self, r):
+        self.latency = _round_trip(r, 3)
+        if self.latency > self.max_latency:
+            self.pause = min(max(self.pause * 2, 0.001), self.max_pause)
+            self.current_batch_size = max(1, self.current_batch_size // 2)
+        else:
+            if self.pause > 0.001:
+                self.pause /= 2
+            else:
+                self.pause = 0
+            self.current_batch_size = min(self.max_batch_size,
+                self.current_batch_size + max(1, self.max_batch_size // 10))
+
+    # the size of a value is only computed when bytes are limited
+    def value_size(self, value):
+        if isinstance(value, StringValue) and self.max_bytes:
+            return value.length
+        if not self.max_bytes or isinstance(value, paged_values):
+            return 0
+        return len(_size_encoder.encode(value))
+
+_size_encoder = json.JSONEncoder(separators=(',', ':'))
+
+def _throttled(records, r, throttle):
+    if throttle is None:
+        return records
+    return _throttled_records(records, r, throttle)
+
+def _throttled_records(records, r, throttle):
+    for record in records:
+        yield record
+        throttle.record(r, 1, throttle.value_size(record[3]))
+
+def _empty(r):
+    # r might be a plain client; capabilities are cached per pool
+    r = RedisWrapper(connection_pool=r.connection_pool)
+    for key in r.keys():
+        r.unlink_or_delete(key)
+
+def loads(s, host='localhost', port=6379, password=None, db=0, empty=False,
+          unix_socket_path=None, encoding='utf-8', use_expireat=False,
+          client=None, connection_pool=None, throttle=None,
+          keys='*', exclude_keys=None, types=None,
+          key_prefix=None, strip_prefix=None, rename=None, db_map=None,
+          sync=False, delete_extra=False, writer_backend='pipeline'):
+    key_filter = _load_filter(keys, exclude_keys, types, encoding)
+    transform = _load_transform(key_prefix, strip_prefix, rename, db_map)
+    sync = _load_sync(sync, delete_extra, key_filter, encoding, use_expireat,
+        empty, transform)
+    r = _resolve_client(client, connection_pool, host=host, port=port,
+                        password=password, db=db,
+                        unix_socket_path=unix_socket_path, encoding=encoding)
+    table = json.loads(s)
+    records = _selected_records(_table_records(table), key_filter, encoding)
+    _load_records(r, records, empty, use_expireat, throttle, transform,
+        sync, writer_backend)
+
+def load_records(records, host='localhost', port=6379, password=None, db=0,
+    empty=False, unix_socket_path=None, encoding='utf-8', use_expireat=False,
+    client=None, connection_pool=None, throttle=None,
+    keys='*', exclude_keys=None, types=None,
+    key_prefix=None, strip_prefix=None, rename=None, db_map=None,
+    sync=False, delete_extra=False, writer_backend='pipeline',
+):
+    key_filter = _load_filter(keys, exclude_keys, types, encoding)
+    transform = _load_transform(key_prefix, strip_prefix, rename, db_map)
+    sync = _load_sync(sync, delete_extra, key_filter, encoding, use_expireat,
+        empty, transform)
+    r = _resolve_client(client, connection_pool, host=host, port=port,
+                        password=password, db=db,
+                        unix_socket_path=unix_socket_path, encoding=encoding)
+    records = _selected_records(_record_items(records), key_filter, encoding)
+    _load_records(r, records, empty, use_expireat, throttle, transform, sync,
+        writer_backend)
+
+# converts records, or (key, type, ttl, value) tuples, to the
+# (db, key, item) tuples of loaded dumps
+def _record_items(records):
+    for record in records:
+        if len(record) == 5:
+            key, type, ttl, value, db = record
+        else:
+            key, type, ttl, value = record
+            db = None
+        if isinstance(value, (set, frozenset)):
+            value = list(value)
+        item = {'type': type, 'value': value}
+        if ttl is not None:
+            item['ttl'] = ttl
+        yield db, key, item
+
+# filter of the keys to load, None when all keys are loaded
+def _load_filter(keys, exclude_keys, types, encoding):
+    key_filter = _KeyFilter(keys, exclude_keys, types, encoding)
+    if key_filter.include is None and key_filter.exclude is None and \
+            key_filter.types is None:
+        return None
+    return key_filter
+
+def _selected_records(records, key_filter, encoding):
+    if key_filter is None:
+        return records
+    return ((db, key, item) for db, key, item in records
+        if key_filter.matches(key.encode(encoding)) and
+            (key_filter.types is None or item['type'] in key_filter.types))
+
+# renames keys and databases of records as they are loaded; keys are
+# stripped of strip_prefix, renamed, then given key_prefix
+class _KeyTransform(object):
+    def __init__(self, key_prefix=None, strip_prefix=None, rename=None,
+                 db_map=None):
+        import re
+
+        self.key_prefix = key_prefix or ''
+        self.strip_prefix = strip_prefix or ''
+        if rename is None or callable(rename):
+            self.rename = rename
+        elif isinstance(rename, dict):
+            # keys missing from a lookup table keep their names
+            self.rename = lambda key: rename.get(key, key)
+        elif isinstance(rename, (list, tuple)) and len(rename) == 2:
+            regex = re.compile(rename[0])
+            replacement = rename[1]
+            self.rename = lambda key: regex.sub(replacement, key)
+        else:
+            raise TypeError('rename must be a dict, a callable or a (pattern, replacement) pair')
+        if db_map:
+            self.db_map = dict((int(source), int(target))
+                for source, target in db_map.items())
+        else:
+            self.db_map = None
+
+    def transform(self, db, key):
+        if self.strip_prefix and key.startswith(self.strip_prefix):
+            key = key[len(self.strip_prefix):]
+        if self.rename is not None:
+            key = self.rename(key)
+        key = self.key_prefix + key
+        if self.db_map is not None and db is not None:
+            db = self.db_map.get(db, db)
+        return db, key
+
+# transform of loaded records, None when nothing is renamed
+def _load_transform(key_prefix, strip_prefix, rename, db_map):
+    if not key_prefix and not strip_prefix and rename is None and not db_map:
+        return None
+    return _KeyTransform(key_prefix, strip_prefix, rename, db_map)
+
+# records are (db, key, item) tuples; db is None for records of single
+# database dumps, which are loaded into the database r is connected to
+def _load_records(r, records, empty, use_expireat, throttle=None,
+                  transform=None, sync=None, writer_backend='pipeline'):
+    if writer_backend not in writer_backends:
+        raise TypeError('Invalid writer backend: %s' % writer_backend)
+    current_db = None
+    emptied = False
+    # databases may be revisited when several are mapped to one
+    emptied_dbs = set()
+    counter = 0
+    size = 0
+    if throttle is None:
+        batch_size = 10000
+    else:
+        batch_size = throttle.batch_size
+    if sync is not None:
+        # only records differing from redis are written; keys are compared
+        # under their new names
+        records = sync.records(r, records, transform)
+        transform = None
+    for db, key, item in records:
+        if transform is not None:
+            db, key = transform.transform(db, key)
+        if db is not None and db != current_db:
+            if counter:
+                p.execute()
+                if throttle is not None:
+                    throttle.record(r, counter, size)
+                    size = 0
+                counter = 0
+            if current_db is None:
+                r = _single_connection_client(r)
+            _select_db(r, db)
+            current_db = db
+            if empty and db not in emptied_dbs:
+                _empty(r)
+                emptied_dbs.add(db)
+                emptied = True
+        elif empty and not emptied:
+            _empty(r)
+            emptied = True
+        # Create pipeline:
+        if not counter:
+            p = _pipeline(r, writer_backend)
+        type = item['type']
+        value = item.get('value')
+        ttl = item.get('ttl')
         expireat = item.get('expireat')
         _writer(r, p, key, type, value, ttl, expireat, use_expireat=use_expireat)
-        # Increase counter until 10 000...
-        counter = (counter + 1) % 10000
+        if throttle is not None:
+            size += throttle.value_size(value)
+        # Increase counter until batch_size...
+        counter = (counter + 1) % batch_size
         # ... then execute:
         if not counter:
             p.execute()
+            if throttle is not None:
+                throttle.record(r, batch_size, size)
+                size = 0
+                batch_size = throttle.batch_size
     if counter:
         # Finally, execute again:
         p.execute()
+        if throttle is not None:
+            throttle.record(r, counter, size)
+    if empty and not emptied:
+        # the dump was empty
+        _empty(r)
+    if sync is not None:
+        sync.prune()
+
+def load_lump(fp, host='localhost', port=6379, password=None, db=0,
+    empty=False, unix_socket_path=None, encoding='utf-8', use_expireat=False,
+    client=None, connection_pool=None, throttle=None,
+    keys='*', exclude_keys=None, types=None,
+    key_prefix=None, strip_prefix=None, rename=None, db_map=None,
+    sync=False, delete_extra=False, writer_backend='pipeline',
+):
+    if _mappable(fp) and _mappable_encoding(encoding):
+        load_mmap(fp, host, port, password, db, empty, unix_socket_path,
+            encoding, use_expireat=use_expireat, client=client,
+            connection_pool=connection_pool, throttle=throttle,
+            keys=keys, exclude_keys=exclude_keys, types=types,
+            key_prefix=key_prefix, strip_prefix=strip_prefix, rename=rename,
+            db_map=db_map, sync=sync, delete_extra=delete_extra,
+            writer_backend=writer_backend)
+        return
+    s = fp.read()
+    if py3:
+        # s can be a string or a bytes instance.
+        # if bytes, decode to a string because loads requires input to be a string.
+        if isinstance(s, bytes):
+            s = s.decode(encoding)
+    loads(s, host, port, password, db, empty, unix_socket_path, encoding,
+        use_expireat=use_expireat, client=client,
+        connection_pool=connection_pool, throttle=throttle,
+        keys=keys, exclude_keys=exclude_keys, types=types,
+        key_prefix=key_prefix, strip_prefix=strip_prefix, rename=rename,
+        db_map=db_map, sync=sync, delete_extra=delete_extra,
+            writer_backend=writer_backend)
+
+# memory-mapped loads
+#
+# a dump file is memory-mapped and decoded one key at a time by the standard
+# json decoder, which works on a window of the file that is slid forward as
+# keys are consumed. keys are written to redis as they are decoded, hence
+# memory use is bounded by the size of the largest key rather than the size
+# of the file.
+
+# initial size of the window in bytes; grows to fit the largest key
+mmap_window_size = 1 << 20
+
+# whether dumps in an encoding can be memory-mapped: the window is moved
+# by byte offsets found by encoding what was consumed, and json syntax is
+# matched as ascii. this excludes e.g. utf-16, whose dumps are loaded as
+# a whole
+def _mappable_encoding(encoding):
+    return u'{"":[0,-1.5e2]}\n'.encode(encoding) == b'{"":[0,-1.5e2]}\n'
+
+class _MappedScanner(object):
+    def __init__(self, buffer, encoding='utf-8'):
+        import re
+
+        if not _mappable_encoding(encoding):
+            raise TypeError('Dumps in %s cannot be memory-mapped' % encoding)
+        self.buffer = buffer
+        self.encoding = encoding
+        self.decoder = json.JSONDecoder()
+        self.whitespace = re.compile(r'[ \t\n\r]*')
+        self.size = mmap_window_size
+        # byte offset of the window in the buffer
+        self.offset = 0
+        self.window = u''
+        self.pos = 0
+        self.eof = False
+        self.fill()
+
+    # moves the window to start at the current position, growing it when
+    # it holds an incomplete value from its start
+    def fill(self):
+        import codecs
+
+        if self.pos == 0 and self.window:
+            self.size *= 2
+        self.offset += len(self.window[:self.pos].encode(self.encoding))
+        end = min(self.offset + self.size, len(self.buffer))
+        self.eof = end == len(self.buffer)
+        # a character split at the end of the window is decoded next time
+        decoder = codecs.getincrementaldecoder(self.encoding)()
+        self.window = decoder.decode(self.buffer[self.offset:end], self.eof)
+        self.pos = 0
+
+    def skip_whitespace(self):
+        while True:
+            self.pos = self.whitespace.match(self.window, self.pos).end()
+            if self.pos < len(self.window) or self.eof:
+                return
+            self.fill()
+
+    def peek(self):
+        self.skip_whitespace()
+        return self.window[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError('Expecting %r at byte %d' % (char,
+                self.offset + len(self.window[:self.pos].encode(self.encoding))))
+        self.pos += 1
+
+    def value(self):
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.window, self.pos)
+            except ValueError:
+                if self.eof:
+                    raise
+                # the value continues past the window
+                self.fill()
+                continue
+            if end == len(self.window) and not self.eof:
+                # a number might continue past the window
+                self.fill()
+                continue
+            self.pos = end
+            return value
+
+    # yields keys of an object; the caller consumes each value
+    def members(self):
+        self.expect('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self.pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise ValueError('Expecting , or } at byte %d' % (
+                    self.offset + len(self.window[:self.pos].encode(self.encoding))))
+
+def _mapped_records(scanner):
+    if _is_multi_db_prefix(scanner.buffer[:256].decode(scanner.encoding,
+                                                       'ignore')):
+        for name in scanner.members():
+            for db in scanner.members():
+                for key in scanner.members():
+                    yield int(db), key, scanner.value()
+    else:
+        for key in scanner.members():
+            yield None, key, scanner.value()
+
+def _mappable(fp):
+    import os
+    import stat
+
+    try:
+        fileno = fp.fileno()
+        # the whole file is mapped
+        if fp.tell() != 0:
+            return False
+    except Exception:
+        return False
+    st = os.fstat(fileno)
+    # empty files cannot be mapped
+    return stat.S_ISREG(st.st_mode) and st.st_size > 0
+
+def load_mmap(fp, host='localhost', port=6379, password=None, db=0,
+    empty=False, unix_socket_path=None, encoding='utf-8', use_expireat=False,
+    client=None, connection_pool=None, throttle=None,
+    keys='*', exclude_keys=None, types=None,
+    key_prefix=None, strip_prefix=None, rename=None, db_map=None,
+    sync=False, delete_extra=False, writer_backend='pipeline',
+):
+    import mmap
+
+    key_filter = _load_filter(keys, exclude_keys, types, encoding)
+    transform = _load_transform(key_prefix, strip_prefix, rename, db_map)
+    sync = _load_sync(sync, delete_extra, key_filter, encoding, use_expireat,
+        empty, transform)
+    r = _resolve_client(client, connection_pool, host=host, port=port,
+                        password=password, db=db,
+                        unix_socket_path=unix_socket_path, encoding=encoding)
+    buffer = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        # the C decoder decodes unwanted values faster than they could be
+        # scanned over in Python, they are decoded and dropped
+        records = _selected_records(
+            _mapped_records(_MappedScanner(buffer, encoding)),
+            key_filter, encoding)
+        _load_records(r, records, empty, use_expireat, throttle, transform,
+            sync, writer_backend)
+    finally:
+        buffer.close()
+
+# offset indexes
+#
+# dumps may be accompanied by a sidecar index giving the position of each
+# key in the dump, which lets selected keys be restored without parsing
+# the rest of the dump. offsets and lengths are in bytes from the start of
+# the dump and cover the "key":{...} members of the dump object; since
+# dumps are ascii, characters written and bytes written are the same.
+#
+# an index is a header line followed by entry lines sorted by their first
+# element, so that an entry is looked up by reading the header and about
+# one page of entries. pages are runs of entry lines of about
+# index_page_size bytes; the header gives the first element, offset and
+# length of each, offsets being in bytes from the end of the header line.
+#
+# keys indexes list every key:
+# {"version":2,"mode":"keys","pages":[[key,offset,length],...]}
+# [key,db,offset,length]
+# ...
+# hashes indexes group consecutive members into blocks of about
+# block_size bytes and list a truncated sha1 hash of each key with its
+# block, which keeps indexes of large dumps small:
+# {"version":2,"mode":"hashes","pages":[[hash,offset,length],...],
+#  "block_size":N,"blocks":[[db,offset,length],...]}
+# [hash,block]
+# ...
+# db is null in indexes of single database dumps.
+
+index_modes = ('keys', 'hashes')
+
+index_version = 2
+
+# approximate size in bytes of the pages of index entries
+index_page_size = 1 << 16
+
+# number of index entries sorted in memory; larger indexes are sorted in
+# runs of this many entries which spill to disk
+index_sort_buffer_size = 100000
+
+class _OffsetWriter(object):
+    def __init__(self, fp):
+        self.fp = fp
+        self.offset = 0
+
+    def write(self, s):
+        self.offset += len(s)
+        return self.fp.write(s)
+
+def _indexed(records, fp, index):
+    first = True
+    for record in records:
+        # members after the first are preceded by a comma
+        start = fp.offset + (not first)
+        first = False
+        yield record
+        # the member has been written when the next record is requested
+        index.add(record[0], start, fp.offset - start)
+
+def _key_hash(key):
+    import hashlib
+
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+class _IndexWriter(object):
+    def __init__(self, fp, mode, block_size):
+        if mode not in index_modes:
+            raise TypeError('Invalid index mode: %s' % mode)
+        try:
+            fp.write('')
+        except TypeError:
+            fp = BytesWriteWrapper(fp)
+        self.fp = fp
+        self.mode = mode
+        self.block_size = block_size
+        self.encoder = json.JSONEncoder(separators=(',', ':'))
+        self.db = None
+        self.block = None
+        self.blocks = []
+        # (sort key, entry line) pairs
+        self.sorter = _ExternalSorter(index_sort_buffer_size,
+            _index_run_line, _index_run)
+
+    def select(self, db):
+        self.flush()
+        self.db = db
+
+    def add(self, key, offset, length):
+        if self.mode == 'keys':
+            self.append(key, [key, self.db, offset, length])
+            return
+        block = self.block
+        if block is not None and offset + length - block[1] > self.block_size:
+            self.flush()
+            block = None
+        if block is None:
+            block = self.block = [self.db, offset, 0]
+            self.blocks.append(block)
+        block[2] = offset + length - block[1]
+        hash = _key_hash(key)
+        self.append(hash, [hash, len(self.blocks) - 1])
+
+    def flush(self):
+        self.block = None
+
+    def append(self, sort_key, entry):
+        self.sorter.add((sort_key, self.encoder.encode(entry)))
+
+    def close(self):
+        import tempfile
+
+        # the header lists the pages, which are known once the entries
+        # are written
+        entries = tempfile.TemporaryFile()
+        pages = []
+        page = None
+        offset = 0
+        for sort_key, line in self.sorter.sorted():
+            if page is None or page[2] >= index_page_size:
+                page = [sort_key, offset, 0]
+                pages.append(page)
+            line = line.encode('ascii') + b'\n'
+            entries.write(line)
+            page[2] += len(line)
+            offset += len(line)
+        self.sorter.close()
+        header = '{"version":%d,"mode":%s,"pages":%s' % (index_version,
+            self.encoder.encode(self.mode), self.encoder.encode(pages))
+        if self.mode == 'hashes':
+            header += ',"block_size":%d,"blocks":%s' % (self.block_size,
+                self.encoder.encode(self.blocks))
+        self.fp.write(header + '}\n')
+        entries.seek(0)
+        while True:
+            chunk = entries.read(index_page_size)
+            if not chunk:
+                break
+            self.fp.write(chunk.decode('ascii'))
+        entries.close()
+
+def _index_run_line(entry):
+    return entry[1].encode('ascii') + b'\n'
+
+def _index_run(run):
+    for line in run:
+        line = line.decode('ascii').rstrip('\n')
+        yield json.loads(line)[0], line
+
+class _IndexReader(object):
+    def __init__(self, fp, header):
+        self.fp = fp
+        # offset of the first page
+        self.start = fp.tell()
+        self.mode = header['mode']
+        self.pages = header['pages']
+        self.blocks = header.get('blocks')
+        self.first_keys = [page[0] for page in self.pages]
+
+    def page_entries(self, page):
+        self.fp.seek(self.start + page[1])
+        data = self.fp.read(page[2])
+        if isinstance(data, bytes):
+            data = data.decode('ascii')
+        for line in data.splitlines():
+            yield json.loads(line)
+
+    # index of the first page which might hold entries starting at key
+    def first_page(self, key):
+        import bisect
+
+        # entries equal to the first one of a page might end the previous page
+        return max(bisect.bisect_left(self.first_keys, key) - 1, 0)
+
+    # yields entries whose first element is key
+    def lookup(self, key):
+        for page in self.pages[self.first_page(key):]:
+            if page[0] > key:
+                return
+            for entry in self.page_entries(page):
+                if entry[0] == key:
+                    yield entry
+                elif entry[0] > key:
+                    return
+
+    # yields entries whose first element starts with prefix, which are
+    # consecutive, or every entry for an empty prefix
+    def scan(self, prefix=''):
+        for page in self.pages[self.first_page(prefix):]:
+            if page[0] > prefix and not page[0].startswith(prefix):
+                return
+            for entry in self.page_entries(page):
+                if entry[0].startswith(prefix):
+                    yield entry
+                elif entry[0] > prefix:
+                    return
+
+def load_index(fp):
+    header = fp.readline()
+    if isinstance(header, bytes):
+        header = header.decode('utf-8')
+    header = json.loads(header)
+    if not isinstance(header, dict) or header.get('mode') not in index_modes:
+        raise ValueError('Not a dump index')
+    if header.get('version') != index_version:
+        raise ValueError('Unsupported dump index version: %s' % header.get('version'))
+    return _IndexReader(fp, header)
+
+# returns the literal prefix of a glob pattern, and whether the whole
+# pattern is literal
+def _glob_prefix(pattern):
+    out = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c in '*?[':
+            return ''.join(out), False
+        if c == '\\' and i + 1 < n:
+            i += 1
+            c = pattern[i]
+        out.append(c)
+        i += 1
+    return ''.join(out), True
+
+# literal patterns are looked up in the index, other patterns read the
+# entries starting with their literal prefix, or for hashes indexes every
+# block of the dump
+def _index_spans(index, key_filter, encoding):
+    literals = []
+    prefixes = []
+    for pattern in key_filter.patterns:
+        prefix, literal = _glob_prefix(pattern.decode(encoding))
+        if literal:
+            literals.append(prefix)
+        else:
+            prefixes.append(prefix)
+    if index.mode == 'keys':
+        if '' in prefixes:
+            prefixes = ['']
+        entries = itertools.chain(
+            *[index.lookup(key) for key in literals] +
+            [index.scan(prefix) for prefix in prefixes])
+        # a key may match several patterns
+        seen = set()
+        for key, db, offset, length in entries:
+            if (db, offset) in seen or not key_filter.matches(key.encode(encoding)):
+                continue
+            seen.add((db, offset))
+            yield db, offset, length
+        return
+    if prefixes:
+        # hashes cannot be matched against wildcards, every block is read
+        # and its keys are filtered once parsed
+        selected = range(len(index.blocks))
+    else:
+        selected = sorted(set(block for key in literals
+            for hash, block in index.lookup(_key_hash(key))))
+    for block in selected:
+        db, offset, length = index.blocks[block]
+        yield db, offset, length
+
+def _indexed_records(fp, spans, key_filter, encoding):
+    base = fp.tell()
+    # reading in file order keeps seeks short
+    for db, offset, length in sorted(spans, key=lambda span: span[1]):
+        fp.seek(base + offset)
+        data = fp.read(length)
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        # spans are members, or runs of members, of the dump object
+        for key, item in json.loads('{' + data + '}').items():
+            if not key_filter.matches(key.encode(encoding)):
+                continue
+            if key_filter.types is None or item['type'] in key_filter.types:
+                yield db, key, item
+
+def load_indexed(fp, index_fp, keys='*', exclude_keys=None, types=None,
+    host='localhost', port=6379, password=None, db=0,
+    empty=False, unix_socket_path=None, encoding='utf-8', use_expireat=False,
+    client=None, connection_pool=None, throttle=None,
+    key_prefix=None, strip_prefix=None, rename=None, db_map=None,
+    sync=False, delete_extra=False, writer_backend='pipeline',
+):
+    index = load_index(index_fp)
+    key_filter = _KeyFilter(keys, exclude_keys, types, encoding)
+    transform = _load_transform(key_prefix, strip_prefix, rename, db_map)
+    sync = _load_sync(sync, delete_extra, key_filter, encoding, use_expireat,
+        empty, transform)
+    r = _resolve_client(client, connection_pool, host=host, port=port,
+                        password=password, db=db,
+                        unix_socket_path=unix_socket_path, encoding=encoding)
+    spans = _index_spans(index, key_filter, encoding)
+    _load_records(r, _indexed_records(fp, spans, key_filter, encoding),
+        empty, use_expireat, throttle, transform, sync, writer_backend)
+
+# RESP dumps
+#
+# a RESP dump is the sequence of commands that loading the dump would
+# send to redis, in the redis protocol, which redis-cli --pipe or
+# load_resp can replay. keys are deleted before they are written and
+# all_dbs dumps SELECT each database before its keys.
+
+dump_formats = ('json', 'resp')
+
+# queues the commands issued by _writer like a pipeline, and writes them
+# to fp when executed
+class _RespWriter(object):
+    def __init__(self, r, fp):
+        try:
+            fp.write(b'')
+        except TypeError:
+            raise TypeError('RESP dumps must be written to binary files')
+        self.fp = fp
+        self.pipeline = r.pipeline(transaction=False)
+        # commands are packed the way the client would send them; the
+        # connection is never connected
+        pool = r.connection_pool
+        self.connection = pool.connection_class(**pool.connection_kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.pipeline, name)
+
+    def __len__(self):
+        return len(self.pipeline)
+
+    def execute(self):
+        commands = [args for args, options in self.pipeline.command_stack]
+        for chunk in self.connection.pack_commands(commands):
+            self.fp.write(chunk)
+        self.pipeline.reset()
+
+# RESP dumps are written for servers of this version or newer unless a
+# target version is given: keys are deleted with DEL rather than UNLINK,
+# whatever the source server supports
+resp_target_version = '2.6'
+
+class _RespTarget(RedisWrapper):
+    # decides which commands are written, for a server of the target version
+    def __init__(self, version):
+        try:
+            version = [int(part) for part in version.split('.')]
+        except (AttributeError, ValueError):
+            raise TypeError('Invalid target version: %s' % version)
+        # never connected
+        RedisWrapper.__init__(self)
+        self.target_capabilities = ServerCapabilities(version)
+
+    @property
+    def capabilities(self):
+        return self.target_capabilities
+
+def _dump_resp(fp, r, encoding, key_filter, fingerprint_output, delta_from,
+               fingerprint_method, all_dbs, throttle, contention, profile=None,
+               target_version=None):
+    target = _RespTarget(target_version or resp_target_version)
+    if all_dbs:
+        _check_all_dbs(fingerprint_output, delta_from)
+        r = _single_connection_client(r)
+        writer = _RespWriter(r, fp)
+        for db in _databases(r):
+            _select_db(r, db)
+            writer.execute_command('SELECT', db)
+            records = _profiled(_reader(r, False, encoding, key_filter,
+                                        contention), r, profile, db, encoding)
+            _write_resp(writer, target, _throttled(records, r, throttle))
+    else:
+        writer = _RespWriter(r, fp)
+        records = _dump_reader(r, False, encoding, key_filter, fingerprint_output,
+                               delta_from, fingerprint_method, contention)
+        records = _profiled(records, r, profile, None, encoding)
+        _write_resp(writer, target, _throttled(records, r, throttle))
+    writer.execute()
+    if profile is not None:
+        profile.close()
+
+def _write_resp(writer, target, records):
+    for key, type, ttl, value in records:
+        # ttls are relative to the time the dump is replayed
+        _writer(target, writer, key, type, value, ttl, None, use_expireat=False)
+        writer.execute()
+
+# maximum number of commands replayed in a pipeline
+resp_pipeline_size = 10000
+
+def load_resp(fp, host='localhost', port=6379, password=None, db=0,
+              empty=False, unix_socket_path=None, encoding='utf-8',
+              client=None, connection_pool=None, throttle=None,
+              writer_backend='pipeline'):
+    if writer_backend not in writer_backends:
+        raise TypeError('Invalid writer backend: %s' % writer_backend)
+    r = _resolve_client(client, connection_pool, host=host, port=port,
+                        password=password, db=db,
+                        unix_socket_path=unix_socket_path, encoding=encoding)
+    r = _single_connection_client(r)
+    if throttle is None:
+        batch_size = resp_pipeline_size
+    else:
+        batch_size = throttle.batch_size
+    emptied_dbs = set()
+    first = True
+    p = _pipeline(r, writer_backend)
+    size = 0
+    for args in _resp_commands(fp):
+        # command names are not encoded by the client
+        command = args[0].decode('ascii').upper()
+        if command == 'SELECT':
+            if len(p):
+                p.execute()
+            db = int(args[1])
+            _select_db(r, db)
+            if empty and db not in emptied_dbs:
+                _empty(r)
+                emptied_dbs.add(db)
+            first = False
+            continue
+        if empty and first:
+            # a single database dump, replayed into db
+            _empty(r)
+        first = False
+        p.execute_command(command, *args[1:])
+        size += sum(len(arg) for arg in args)
+        if len(p) >= batch_size:
+            count = len(p)
+            p.execute()
+            if throttle is not None:
+                throttle.record(r, count, size)
+            size = 0
+    if len(p):
+        count = len(p)
+        p.execute()
+        if throttle is not None:
+            throttle.record(r, count, size)
+    elif empty and first:
+        _empty(r)
+
+def _resp_commands(fp):
+    while True:
+        line = fp.readline()
+        if not line:
+            return
+        if not line.startswith(b'*') or not line.endswith(b'\r\n'):
+            raise ValueError('Not a RESP command: %r' % line[:100])
+        args = []
+        for i in range(int(line[1:-2])):
+            line = fp.readline()
+            if not line.startswith(b'$') or not line.endswith(b'\r\n'):
+                raise ValueError('Not a RESP bulk string: %r' % line[:100])
+            length = int(line[1:-2])
+            arg = fp.read(length + 2)
+            if len(arg) != length + 2 or not arg.endswith(b'\r\n'):
+                raise ValueError('Truncated RESP bulk string')
+            args.append(arg[:-2])
+        if not args:
+            raise ValueError('Empty RESP command')
+        yield args
+
+# RDB files
+#
+# iter_rdb reads the keys of an RDB file, as written by SAVE or BGSAVE,
+# without a server, so that a snapshot can be converted to a dump offline.
+# the file is parsed as it is read, a key at a time. besides the regular
+# encodings of values, the compact encodings of small values are decoded:
+# ziplists, listpacks, intsets and zipmaps, and the quicklists of lists.
+# streams, modules and functions are not supported. keys which have
+# expired by the time they are read are skipped, as redis skips them when
+# loading the file.
+
+# newest RDB version understood (redis 7.2)
+rdb_max_version = 11
+
+class _RdbReader(object):
+    def __init__(self, fp):
+        self.fp = fp
+
+    def read(self, length):
+        data = self.fp.read(length)
+        if len(data) != length:
+            raise ValueError('Truncated RDB file')
+        return data
+
+    def byte(self):
+        return ord(self.read(1))
+
+    # returns (length, special), where special tells that the length is
+    # the special encoding of a string
+    def length(self):
+        first = self.byte()
+        kind = first >> 6
+        if kind == 0:
+            return first & 0x3f, False
+        if kind == 1:
+            return ((first & 0x3f) << 8) | self.byte(), False
+        if kind == 3:
+            return first & 0x3f, True
+        if first == 0x80:
+            return struct.unpack('>I', self.read(4))[0], False
+        if first == 0x81:
+            return struct.unpack('>Q', self.read(8))[0], False
+        raise ValueError('Invalid length encoding in RDB file: %d' % first)
+
+    def count(self):
+        return self.length()[0]
+
+    def string(self):
+        length, special = self.length()
+        if not special:
+            return self.read(length)
+        if length == 0:
+            return _rdb_int(struct.unpack('<b', self.read(1))[0])
+        if length == 1:
+            return _rdb_int(struct.unpack('<h', self.read(2))[0])
+        if length == 2:
+            return _rdb_int(struct.unpack('<i', self.read(4))[0])
+        if length == 3:
+            compressed_length = self.count()
+            length = self.count()
+            return _lzf_decompress(self.read(compressed_length), length)
+        raise ValueError('Invalid string encoding in RDB file: %d' % length)
+
+    # scores of sorted sets of RDB version 1 and 2, as strings
+    def double(self):
+        length = self.byte()
+        if length == 253:
+            return float('nan')
+        if length == 254:
+            return float('inf')
+        if length == 255:
+            return float('-inf')
+        return float(self.read(length))
+
+    def binary_double(self):
+        return struct.unpack('<d', self.read(8))[0]
+
+def _rdb_int(value):
+    return str(value).encode('ascii')
+
+def _lzf_decompress(data, length):
+    data = bytearray(data)
+    out = bytearray()
+    pos = 0
+    while pos < len(data):
+        control = data[pos]
+        pos += 1
+        if control < 32:
+            # a literal run of control + 1 bytes
+            out += data[pos:pos + control + 1]
+            pos += control + 1
+            continue
+        # a back reference to length bytes of the output
+        count = control >> 5
+        if count == 7:
+            count += data[pos]
+            pos += 1
+        count += 2
+        start = len(out) - ((control & 0x1f) << 8) - data[pos] - 1
+        pos += 1
+        if start < 0:
+            raise ValueError('Invalid LZF data in RDB file')
+        if start + count <= len(out):
+            out += out[start:start + count]
+        else:
+            # the reference overlaps the bytes it produces
+            for i in range(start, start + count):
+                out.append(out[i])
+    if len(out) != length:
+        raise ValueError('Invalid LZF data in RDB file')
+    return bytes(out)
+
+def _ziplist_entries(blob):
+    data = bytearray(blob)
+    # skips zlbytes, zltail and zllen
+    pos = 10
+    entries = []
+    while data[pos] != 0xff:
+        # skips the length of the previous entry
+        if data[pos] == 0xfe:
+            pos += 5
+        else:
+            pos += 1
+        flag = data[pos]
+        kind = flag >> 6
+        if kind == 0:
+            length = flag & 0x3f
+            pos += 1
+        elif kind == 1:
+            length = ((flag & 0x3f) << 8) | data[pos + 1]
+            pos += 2
+        elif kind == 2:
+            length = struct.unpack_from('>I', blob, pos + 1)[0]
+            pos += 5
+        else:
+            pos += 1
+            if flag == 0xc0:
+                value = struct.unpack_from('<h', blob, pos)[0]
+                pos += 2
+            elif flag == 0xd0:
+                value = struct.unpack_from('<i', blob, pos)[0]
+                pos += 4
+            elif flag == 0xe0:
+                value = struct.unpack_from('<q', blob, pos)[0]
+                pos += 8
+            elif flag == 0xf0:
+                value = _int24(blob, pos)
+                pos += 3
+            elif flag == 0xfe:
+                value = struct.unpack_from('<b', blob, pos)[0]
+                pos += 1
+            elif 0xf1 <= flag <= 0xfd:
+                value = (flag & 0x0f) - 1
+            else:
+                raise ValueError('Invalid ziplist entry in RDB file: %d' % flag)
+            entries.append(_rdb_int(value))
+            continue
+        entries.append(bytes(data[pos:pos + length]))
+        pos += length
+    return entries
+
+def _int24(blob, pos):
+    return struct.unpack('<i', b'\0' + blob[pos:pos + 3])[0] >> 8
+
+def _listpack_entries(blob):
+    data = bytearray(blob)
+    # skips the total size and the number of elements
+    pos = 6
+    entries = []
+    while data[pos] != 0xff:
+        start = pos
+        flag = data[pos]
+        length = value = None
+        if flag < 0x80:
+            value = flag
+            pos += 1
+        elif flag < 0xc0:
+            length = flag & 0x3f
+            pos += 1
+        elif flag < 0xe0:
+            value = ((flag & 0x1f) << 8) | data[pos + 1]
+            if value >= 1 << 12:
+                value -= 1 << 13
+            pos += 2
+        elif flag < 0xf0:
+            length = ((flag & 0x0f) << 8) | data[pos + 1]
+            pos += 2
+        elif flag == 0xf0:
+            length = struct.unpack_from('<I', blob, pos + 1)[0]
+            pos += 5
+        elif flag == 0xf1:
+            value = struct.unpack_from('<h', blob, pos + 1)[0]
+            pos += 3
+        elif flag == 0xf2:
+            value = _int24(blob, pos + 1)
+            pos += 4
+        elif flag == 0xf3:
+            value = struct.unpack_from('<i', blob, pos + 1)[0]
+            pos += 5
+        elif flag == 0xf4:
+            value = struct.unpack_from('<q', blob, pos + 1)[0]
+            pos += 9
+        else:
+            raise ValueError('Invalid listpack entry in RDB file: %d' % flag)
+        if length is None:
+            entries.append(_rdb_int(value))
+        else:
+            entries.append(bytes(data[pos:pos + length]))
+            pos += length
+        # skips the backwards length of the entry
+        size = pos - start
+        pos += 1
+        while size >= 128:
+            size >>= 7
+            pos += 1
+    return entries
+
+def _intset_entries(blob):
+    width, length = struct.unpack_from('<II', blob)
+    formats = {2: 'h', 4: 'i', 8: 'q'}
+    if width not in formats:
+        raise ValueError('Invalid intset encoding in RDB file: %d' % width)
+    values = struct.unpack_from('<%d%s' % (length, formats[width]), blob, 8)
+    return [_rdb_int(value) for value in values]
+
+def _zipmap_entries(blob):
+    data = bytearray(blob)
+    # skips zmlen
+    pos = 1
+    entries = []
+    while data[pos] != 0xff:
+        length, pos = _zipmap_length(blob, data, pos)
+        entries.append(bytes(data[pos:pos + length]))
+        pos += length
+        length, pos = _zipmap_length(blob, data, pos)
+        # skips the free bytes following the value
+        free = data[pos]
+        pos += 1
+        entries.append(bytes(data[pos:pos + length]))
+        pos += length + free
+    return entries
+
+def _zipmap_length(blob, data, pos):
+    if data[pos] < 254:
+        return data[pos], pos + 1
+    return struct.unpack_from('<I', blob, pos + 1)[0], pos + 5
+
+# members of sorted sets which are not ziplists or listpacks are not
+# written in order; they are put in the order of ZRANGE
+def _zset_order(members):
+    members.sort(key=lambda member: (member[1], member[0]))
+    return members
+
+def _pairs(entries):
+    return zip(entries[::2], entries[1::2])
+
+# returns (type, value) of a value of an RDB type; strings are bytes and
+# scores are floats
+def _rdb_value(rdb, rdb_type):
+    if rdb_type == 0:
+        return 'string', rdb.string()
+    if rdb_type == 1:
+        return 'list', [rdb.string() for i in range(rdb.count())]
+    if rdb_type == 2:
+        return 'set', [rdb.string() for i in range(rdb.count())]
+    if rdb_type == 3:
+        return 'zset', _zset_order([(rdb.string(), rdb.double())
+            for i in range(rdb.count())])
+    if rdb_type == 4:
+        return 'hash', [(rdb.string(), rdb.string()) for i in range(rdb.count())]
+    if rdb_type == 5:
+        return 'zset', _zset_order([(rdb.string(), rdb.binary_double())
+            for i in range(rdb.count())])
+    if rdb_type == 9:
+        return 'hash', _pairs(_zipmap_entries(rdb.string()))
+    if rdb_type == 10:
+        return 'list', _ziplist_entries(rdb.string())
+    if rdb_type == 11:
+        return 'set', _intset_entries(rdb.string())
+    if rdb_type == 12:
+        return 'zset', [(member, float(score))
+            for member, score in _pairs(_ziplist_entries(rdb.string()))]
+    if rdb_type == 13:
+        return 'hash', _pairs(_ziplist_entries(rdb.string()))
+    if rdb_type == 14:
+        value = []
+        for i in range(rdb.count()):
+            value.extend(_ziplist_entries(rdb.string()))
+        return 'list', value
+    if rdb_type == 16:
+        return 'hash', _pairs(_listpack_entries(rdb.string()))
+    if rdb_type == 17:
+        return 'zset', [(member, float(score))
+            for member, score in _pairs(_listpack_entries(rdb.string()))]
+    if rdb_type == 18:
+        value = []
+        for i in range(rdb.count()):
+            container = rdb.count()
+            if container == 1:
+                # a plain node holding a single large element
+                value.append(rdb.string())
+            else:
+                value.extend(_listpack_entries(rdb.string()))
+        return 'list', value
+    if rdb_type == 20:
+        return 'set', _listpack_entries(rdb.string())
+    if rdb_type in (15, 19, 21):
+        raise UnknownTypeError('Streams in RDB files are not supported')
+    if rdb_type in (6, 7):
+        raise UnknownTypeError('Module values in RDB files are not supported')
+    raise UnknownTypeError('Unknown value type in RDB file: %d' % rdb_type)
+
+def _decode_rdb_value(type, value, encoding, pretty):
+    if type == 'string':
+        return value.decode(encoding)
+    if type == 'zset':
+        return [(member.decode(encoding), score) for member, score in value]
+    if type == 'hash':
+        decoded = {}
+        for field, field_value in value:
+            decoded[field.decode(encoding)] = field_value.decode(encoding)
+        return decoded
+    value = [element.decode(encoding) for element in value]
+    if type == 'set' and pretty:
+        value.sort()
+    return value
+
+# yields (db, key, type, expireat, value) tuples of the keys of an RDB
+# file, where keys and values are undecoded and expireat is in
+# milliseconds or None
+def _rdb_keys(fp, key_filter):
+    rdb = _RdbReader(fp)
+    header = rdb.read(9)
+    if header[:5] != b'REDIS' or not header[5:].isdigit():
+        raise ValueError('Not an RDB file')
+    version = int(header[5:])
+    if version > rdb_max_version:
+        raise ValueError('Unsupported RDB version: %d' % version)
+    db = 0
+    expireat = None
+    while True:
+        opcode = rdb.byte()
+        if opcode == 0xff:
+            # end of file, followed by a checksum
+            return
+        if opcode == 0xfe:
+            db = rdb.count()
+        elif opcode == 0xfd:
+            expireat = struct.unpack('<I', rdb.read(4))[0] * 1000
+        elif opcode == 0xfc:
+            expireat = struct.unpack('<q', rdb.read(8))[0]
+        elif opcode == 0xfb:
+            # sizes of the hash tables of the database
+            rdb.count()
+            rdb.count()
+        elif opcode == 0xfa:
+            # auxiliary field
+            rdb.string()
+            rdb.string()
+        elif opcode == 0xf9:
+            # lfu frequency of the next key
+            rdb.read(1)
+        elif opcode == 0xf8:
+            # lru idle time of the next key
+            rdb.count()
+        elif opcode == 0xf5:
+            # function library
+            rdb.string()
+        elif opcode in (0xf6, 0xf7):
+            raise UnknownTypeError('Module data in RDB files is not supported')
+        else:
+            key = rdb.string()
+            type, value = _rdb_value(rdb, opcode)
+            if key_filter.matches(key) and \
+                    (key_filter.types is None or type in key_filter.types):
+                yield db, key, type, expireat, value
+            expireat = None
+
+def iter_rdb(fp, encoding='utf-8', keys='*', exclude_keys=None, types=None):
+    key_filter = _KeyFilter(keys, exclude_keys, types, encoding)
+    return _rdb_records(fp, key_filter, encoding, False)
+
+def _rdb_records(fp, key_filter, encoding, pretty):
+    for db, key, type, expireat, value in _rdb_keys(fp, key_filter):
+        if expireat is None:
+            ttl = None
+        else:
+            ttl = expireat / 1000.0 - _time.time()
+            if ttl <= 0:
+                continue
+        value = _decode_rdb_value(type, value, encoding, pretty)
+        yield Record(key.decode(encoding), type, ttl, value, db)
+
+def dump_rdb(rdb_fp, fp, db=0, pretty=False, encoding='utf-8', keys='*',
+             all_dbs=False, exclude_keys=None, types=None):
+    try:
+        fp.write('')
+    except TypeError:
+        fp = BytesWriteWrapper(fp)
+    key_filter = _KeyFilter(keys, exclude_keys, types, encoding)
+    records = _rdb_records(rdb_fp, key_filter, encoding, pretty)
+    selected = db
+    if not all_dbs:
+        records = (record for record in records if record.db == selected)
+    # keys of a database are contiguous in RDB files
+    databases = itertools.groupby(records, lambda record: record.db)
+    kwargs = {}
+    if not pretty:
+        kwargs['separators'] = (',', ':')
+    else:
+        kwargs['indent'] = 2
+        kwargs['sort_keys'] = True
+    encoder = json.JSONEncoder(**kwargs)
+    if pretty:
+        tables = {}
+        for db, records in databases:
+            tables[str(db)] = _dump_table(record[:4] for record in records)
+        if all_dbs:
+            table = {'databases': tables}
+        else:
+            table = tables.get(str(selected), {})
+        fp.write(encoder.encode(table))
+    elif all_dbs:
+        fp.write('{"databases":{')
+        first = True
+        for db, records in databases:
+            if first:
+                first = False
+            else:
+                fp.write(',')
+            fp.write('"%d":' % db)
+            _write_table(fp, encoder, (record[:4] for record in records))
+        fp.write('}}')
+    else:
+        _write_table(fp, encoder, (record[:4] for record in records))
+
+# writing RDB files
+#
+# write_rdb converts a dump into an RDB file, which redis loads as it
+# starts when the file is placed at the path given by its dir and
+# dbfilename settings. loading a file is much faster than sending the
+# commands that write the same keys. values are written in the regular
+# encodings of their types; redis converts small values to the compact
+# encodings its configuration calls for as it loads them. the file ends
+# with a CRC-64 checksum, or with zeros, which redis accepts without
+# checking, when checksum is False.
+
+# version of the RDB files written (redis 5.0 and newer)
+rdb_version = 9
+
+_crc64_table = None
+
+def _crc64(crc, data):
+    global _crc64_table
+    if _crc64_table is None:
+        # reflected jones polynomial, as used by redis
+        table = []
+        for i in range(256):
+            value = i
+            for bit in range(8):
+                if value & 1:
+                    value = (value >> 1) ^ 0x95ac9329ac4bc9b5
+                else:
+                    value >>= 1
+            table.append(value)
+        _crc64_table = table
+    table = _crc64_table
+    for byte in bytearray(data):
+        crc = table[(crc ^ byte) & 0xff] ^ (crc >> 8)
+    return crc
+
+class _RdbWriter(object):
+    def __init__(self, fp, checksum):
+        self.fp = fp
+        self.checksum = checksum
+        self.crc = 0
+
+    def write(self, data):
+        self.fp.write(data)
+        if self.checksum:
+            self.crc = _crc64(self.crc, data)
+
+    def length(self, length):
+        if length < 1 << 6:
+            self.write(struct.pack('B', length))
+        elif length < 1 << 14:
+            self.write(struct.pack('>H', 0x4000 | length))
+        elif length < 1 << 32:
+            self.write(b'\x80' + struct.pack('>I', length))
+        else:
+            self.write(b'\x81' + struct.pack('>Q', length))
+
+    def string(self, value):
+        self.length(len(value))
+        self.write(value)
+
+    def close(self):
+        self.write(b'\xff')
+        self.fp.write(struct.pack('<Q', self.crc))
+
+def _write_rdb_value(writer, key, type, value, encoding):
+    if type == 'string':
+        writer.write(b'\x00')
+        writer.string(key)
+        writer.string(value.encode(encoding))
+    elif type in ('list', 'set'):
+        if type == 'list':
+            writer.write(b'\x01')
+        else:
+            writer.write(b'\x02')
+        writer.string(key)
+        writer.length(len(value))
+        for element in value:
+            writer.string(element.encode(encoding))
+    elif type == 'zset':
+        writer.write(b'\x05')
+        writer.string(key)
+        writer.length(len(value))
+        for member, score in value:
+            writer.string(member.encode(encoding))
+            writer.write(struct.pack('<d', float(score)))
+    elif type == 'hash':
+        writer.write(b'\x04')
+        writer.string(key)
+        writer.length(len(value))
+        for field in value:
+            writer.string(field.encode(encoding))
+            writer.string(value[field].encode(encoding))
+    elif type == 'stream':
+        raise UnknownTypeError('Streams cannot be written to RDB files')
+    else:
+        raise UnknownTypeError("Unknown key type: %s" % type)
+
+# expiration time of an item in seconds, or None
+def _item_expireat(item, use_expireat, now):
+    ttl = item.get('ttl')
+    expireat = item.get('expireat')
+    # streaming backends give numbers as decimals
+    if use_expireat and expireat is not None or ttl is None:
+        return expireat and float(expireat)
+    return now + float(ttl)
+
+def write_rdb(fp, rdb_fp, db=0, encoding='utf-8', use_expireat=False,
+              streaming_backend=None, keys='*', exclude_keys=None, types=None,
+              key_prefix=None, strip_prefix=None, rename=None, db_map=None,
+              checksum=True):
+    key_filter = _load_filter(keys, exclude_keys, types, encoding)
+    transform = _load_transform(key_prefix, strip_prefix, rename, db_map)
+    records = _dump_records(fp, streaming_backend, key_filter, encoding)
+    writer = _RdbWriter(rdb_fp, checksum)
+    writer.write(('REDIS%04d' % rdb_version).encode('ascii'))
+    now = _time.time()
+    current_db = None
+    # source database of each written database. redis refuses to load a
+    # file holding a key twice, which keys of merged databases might be
+    sources = {}
+    for record_db, key, item in records:
+        source_db = record_db
+        if transform is not None:
+            record_db, key = transform.transform(record_db, key)
+        if record_db is None:
+            # a single database dump
+            record_db = db
+        if sources.setdefault(record_db, source_db) != source_db:
+            raise TypeError('Databases cannot be merged into an RDB file')
+        type = item['type']
+        if type == 'none':
+            # tombstones delete keys of an existing data set
+            continue
+        expireat = _item_expireat(item, use_expireat, now)
+        if expireat is not None and expireat <= now:
+            continue
+        if record_db != current_db:
+            writer.write(b'\xfe')
+            writer.length(int(record_db))
+            current_db = record_db
+        if expireat is not None:
+            writer.write(b'\xfc' + struct.pack('<q', int(expireat * 1000)))
+        _write_rdb_value(writer, key.encode(encoding), type, item['value'],
+                         encoding)
+    writer.close()
+
+def get_ijson(local_streaming_backend):
+    ijson_mod = _import_ijson()
+    if local_streaming_backend:
+        __import__('ijson.backends.%s' % local_streaming_backend)
+        ijson = getattr(ijson_mod.backends, local_streaming_backend)
+    else:
+        ijson = _fastest_ijson_backend()
+    return ijson
+
+# ijson backends in order of preference
+ijson_backends = ('yajl2_c', 'yajl2_cffi', 'yajl2')
+
+_fastest_ijson = None
+
+# ijson 3 uses its fastest available backend by default, ijson 2 always
+# uses the pure Python one
+def _fastest_ijson_backend():
+    global _fastest_ijson
+    if _fastest_ijson is None:
+        ijson_mod = _import_ijson()
+        _fastest_ijson = ijson_mod
+        if getattr(ijson_mod, 'backend', None) not in ijson_backends:
+            for name in ijson_backends:
+                try:
+                    __import__('ijson.backends.%s' % name)
+                except Exception:
+                    # not installed, or the yajl library is missing
+                    continue
+                _fastest_ijson = getattr(ijson_mod.backends, name)
+                break
+    return _fastest_ijson
+
+def ijson_top_level_items(file, local_streaming_backend, key_filter=None,
+                          encoding='utf-8'):
+    ijson = get_ijson(local_streaming_backend)
+    if hasattr(ijson, 'kvitems') and getattr(ijson, 'backend', None) != 'python':
+        # ijson 3.1+ builds the values in the backend, which for the C
+        # backend is several times faster than building them here.
+        # the pure Python backend is no faster either way.
+        # building values in C is also faster than skipping the events of
+        # unwanted values in Python, hence filtered loads use kvitems too
+        items = ijson.kvitems(file, '')
+        if key_filter is None:
+            return items
+        return ((key, item) for db, key, item in _selected_records(
+            ((None, key, item) for key, item in items), key_filter, encoding))
+    return _ijson_event_items(ijson, file, key_filter, encoding)
+
+def _ijson_event_items(ijson, file, key_filter=None, encoding='utf-8'):
+    for db, key, item in _ijson_records(ijson, file, 1, key_filter, encoding):
+        yield key, item
+
+# yields (db, key, item) tuples from a multiple database document
+def ijson_database_items(file, local_streaming_backend, key_filter=None,
+                         encoding='utf-8'):
+    ijson = get_ijson(local_streaming_backend)
+    return _ijson_records(ijson, file, 3, key_filter, encoding)
+
+_ijson_starts = ('start_map', 'start_array')
+_ijson_ends = ('end_map', 'end_array')
+
+# yields (db, key, item) tuples of the keys at key_depth of a document:
+# depth 1 is the document, and in multiple database documents 2 is the
+# databases object and 3 a database. values of keys not selected by
+# key_filter are skipped without being built
+def _ijson_records(ijson, file, key_depth, key_filter, encoding):
+    events = iter(ijson.basic_parse(file))
+    depth = 0
+    db = None
+    for event, value in events:
+        if event == 'map_key':
+            if depth == key_depth:
+                key = value
+                event, value = next(events)
+                if key_filter is None:
+                    yield db, key, _ijson_value(events, event, value)
+                elif key_filter.matches(key.encode(encoding)):
+                    item = _ijson_value(events, event, value, key_filter.types)
+                    if item is not None:
+                        yield db, key, item
+                elif event in _ijson_starts:
+                    _ijson_skip(events, 1)
+            elif depth == 2 and key_depth == 3:
+                db = int(value)
+        elif event in _ijson_starts:
+            depth += 1
+        elif event in _ijson_ends:
+            depth -= 1
+
+# builds a value from its events, the first of which has been read.
+# returns None for records whose type is not in types
+def _ijson_value(events, event, value, types=None):
+    builder = _import_ijson().ObjectBuilder()
+    depth = 0
+    member = None
+    while True:
+        if member == 'type' and depth == 1:
+            member = None
+            if types is not None and value not in types:
+                # dumps give the type of a key first, the rest of the
+                # record is skipped
+                _ijson_skip(events, depth)
+                return None
+        builder.event(event, value)
+        if event in _ijson_starts:
+            depth += 1
+        elif event in _ijson_ends:
+            depth -= 1
+        elif event == 'map_key' and depth == 1:
+            member = value
+        if depth == 0:
+            return builder.value
+        event, value = next(events)
+
+def _ijson_skip(events, depth):
+    for event, value in events:
+        if event in _ijson_starts:
+            depth += 1
+        elif event in _ijson_ends:
+            depth -= 1
+            if depth == 0:
+                return
+
+def _sniff_multi_db(fp):
+    prefix = fp.read(256)
+    text = prefix
+    if isinstance(text, bytes):
+        text = text.decode('utf-8', 'ignore')
+    return _is_multi_db_prefix(text), PrefixedReadWrapper(fp, prefix)
+
+def _is_multi_db_prefix(text):
+    import re
+
+    return re.match(r'\s*\{\s*"databases"\s*:\s*\{\s*(?:"\d+"|\})', text) is not None
+
+class PrefixedReadWrapper(object):
+    def __init__(self, fp, prefix):
+        self.fp = fp
+        self.prefix = prefix
+
+    def read(self, size=-1):
+        if not self.prefix:
+            return self.fp.read(size)
+        if size is None or size < 0:
+            data = self.prefix + self.fp.read()
+            self.prefix = self.prefix[:0]
+            return data
+        data = self.prefix[:size]
+        self.prefix = self.prefix[size:]
+        if len(data) < size:
+            data += self.fp.read(size - len(data))
+        return data
+
+class TextReadWrapper(object):
+    def __init__(self, fp):
+        self.fp = fp
+        
+    def read(self, *args, **kwargs):
+        return self.fp.read(*args, **kwargs).decode()
+
+class BytesReadWrapper(object):
+    def __init__(self, fp):
+        self.fp = fp
+        
+    def read(self, *args, **kwargs):
+        return self.fp.read(*args, **kwargs).encode('utf-8')
+
+def create_loader(fp, streaming_backend=None, key_filter=None, encoding='utf-8'):
+    if not have_streaming_load:
+        raise TypeError('Cannot create a streaming loader - neither ijson nor jsaone are present')
+
+    if streaming_backend is None:
+        streaming_backend = default_streaming_backend
+    if '-' in streaming_backend:
+        lib, option = streaming_backend.split('-')
+        if lib not in ('ijson', 'jsaone'):
+            raise TypeError('Invalid streaming backend requested: %s' % streaming_backend)
+    elif streaming_backend == 'ijson':
+        lib = 'ijson'
+        option = None
+    elif streaming_backend == 'jsaone':
+        lib = 'jsaone'
+        option = None
+    else:
+        lib = 'ijson'
+        option = streaming_backend
+
+    if lib == 'ijson':
+        if not have_ijson:
+            raise TypeError('%s backend requested but ijson is not present' % streaming_backend)
+        if py3 and isinstance(fp.read(0), str):
+            fp = BytesReadWrapper(fp)
+        multi_db, fp = _sniff_multi_db(fp)
+        def loader():
+            if multi_db:
+                return ijson_database_items(fp, option, key_filter, encoding)
+            return ((None, key, item) for key, item in
+                ijson_top_level_items(fp, option, key_filter, encoding))
+    else:
+        if not have_jsaone:
+            raise TypeError('jsaone backend requested but jsaone is not present')
+        if py3 and isinstance(fp.read(0), bytes):
+            # jsaone can only process text string data (str), not bytes
+            fp = TextReadWrapper(fp)
+        multi_db, fp = _sniff_multi_db(fp)
+        def loader():
+            items = _import_jsaone().load(fp)
+            if multi_db:
+                # jsaone materializes each top level value, here all
+                # databases at once
+                records = _table_records(dict(items))
+            else:
+                records = ((None, key, item) for key, item in items)
+            return _selected_records(records, key_filter, encoding)
+
+    return loader
+
+def load_streaming(fp, host='localhost', port=6379, password=None, db=0,
+    empty=False, unix_socket_path=None, encoding='utf-8', use_expireat=False,
+    streaming_backend=None, client=None, connection_pool=None, throttle=None,
+    keys='*', exclude_keys=None, types=None,
+    key_prefix=None, strip_prefix=None, rename=None, db_map=None,
+    sync=False, delete_extra=False, writer_backend='pipeline',
+):
+    key_filter = _load_filter(keys, exclude_keys, types, encoding)
+    transform = _load_transform(key_prefix, strip_prefix, rename, db_map)
+    sync = _load_sync(sync, delete_extra, key_filter, encoding, use_expireat,
+        empty, transform)
+    loader = create_loader(fp, streaming_backend, key_filter, encoding)
+
+    r = _resolve_client(client, connection_pool, host=host, port=port,
+                        password=password, db=db,
+                        unix_socket_path=unix_socket_path, encoding=encoding)
+
+    _load_records(r, loader(), empty, use_expireat, throttle, transform, sync,
+        writer_backend)
 
 def load(fp, host='localhost', port=6379, password=None, db=0,
     empty=False, unix_socket_path=None, encoding='utf-8', use_expireat=False,
-    streaming_backend=None,
+    streaming_backend=None, client=None, connection_pool=None, throttle=None,
+    keys='*', exclude_keys=None, types=None,
+    key_prefix=None, strip_prefix=None, rename=None, db_map=None,
+    sync=False, delete_extra=False, writer_backend='pipeline',
 ):
     if have_streaming_load:
         load_streaming(fp, host=host, port=port, password=password, db=db,
             empty=empty, unix_socket_path=unix_socket_path, encoding=encoding,
-            use_expireat=use_expireat, streaming_backend=streaming_backend)
+            use_expireat=use_expireat, streaming_backend=streaming_backend,
+            client=client, connection_pool=connection_pool, throttle=throttle,
+            keys=keys, exclude_keys=exclude_keys, types=types,
+            key_prefix=key_prefix, strip_prefix=strip_prefix, rename=rename,
+            db_map=db_map, sync=sync, delete_extra=delete_extra,
+            writer_backend=writer_backend)
     else:
         load_lump(fp, host=host, port=port, password=password, db=db,
             empty=empty, unix_socket_path=unix_socket_path, encoding=encoding,
-            use_expireat=use_expireat)
+            use_expireat=use_expireat, client=client,
+            connection_pool=connection_pool, throttle=throttle,
+            keys=keys, exclude_keys=exclude_keys, types=types,
+            key_prefix=key_prefix, strip_prefix=strip_prefix, rename=rename,
+            db_map=db_map, sync=sync, delete_extra=delete_extra,
+            writer_backend=writer_backend)
+
+# writer backends
+#
+# loads queue the commands of a batch in a redis-py pipeline by default.
+# the raw backend serializes the commands into a buffer itself, sends
+# the buffer in one write and scans the replies without decoding them,
+# raising the first error reply. it implements the pipeline methods
+# _writer uses.
+
+writer_backends = ('pipeline', 'raw')
+
+def _pipeline(r, writer_backend):
+    if writer_backend == 'raw':
+        return _RawPipeline(r)
+    return r.pipeline(transaction=False)
+
+class _RawPipeline(object):
+    def __init__(self, r):
+        self.r = r
+        self.encoding = r.connection_pool.connection_kwargs.get('encoding', 'utf-8')
+        self.buffer = bytearray()
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def encode(self, value):
+        if isinstance(value, float):
+            value = repr(value)
+        elif not (isinstance(value, (bytes, str)) or (not py3 and isinstance(value, unicode))):
+            # integers, and decimals of ijson
+            value = str(value)
+        if not isinstance(value, bytes):
+            value = value.encode(self.encoding)
+        return value
+
+    def execute_command(self, *args):
+        # command names may include subcommands, e.g. XGROUP CREATE
+        args = tuple(args[0].split()) + args[1:]
+        buffer = self.buffer
+        # bytes do not support % formatting before python 3.5
+        buffer += ('*%d\r\n' % len(args)).encode('ascii')
+        for arg in args:
+            arg = self.encode(arg)
+            buffer += ('$%d\r\n' % len(arg)).encode('ascii')
+            buffer += arg
+            buffer += b'\r\n'
+        self.count += 1
+
+    def delete(self, *keys):
+        self.execute_command('DEL', *keys)
+
+    def set(self, key, value):
+        self.execute_command('SET', key, value)
+
+    def append(self, key, value):
+        self.execute_command('APPEND', key, value)
+
+    def rpush(self, key, *values):
+        self.execute_command('RPUSH', key, *values)
+
+    def sadd(self, key, *values):
+        self.execute_command('SADD', key, *values)
+
+    def zadd(self, key, *args):
+        # member, score pairs like redis.Redis.zadd
+        pieces = []
+        for i in range(0, len(args), 2):
+            pieces.append(args[i + 1])
+            pieces.append(args[i])
+        self.execute_command('ZADD', key, *pieces)
+
+    def hmset(self, key, mapping):
+        pieces = []
+        for field, value in mapping.items():
+            pieces.append(field)
+            pieces.append(value)
+        self.execute_command('HMSET', key, *pieces)
+
+    def expire(self, key, time):
+        self.execute_command('EXPIRE', key, time)
+
+    def pexpire(self, key, time):
+        self.execute_command('PEXPIRE', key, time)
+
+    def expireat(self, key, when):
+        self.execute_command('EXPIREAT', key, when)
+
+    def pexpireat(self, key, when):
+        self.execute_command('PEXPIREAT', key, when)
+
+    def execute(self):
+        if not self.count:
+            return
+        pool = self.r.connection_pool
+        connection = pool.get_connection('PIPELINE')
+        try:
+            # a list of chunks, which the buffer is sent as without copying
+            connection.send_packed_command([self.buffer])
+            error = _read_raw_replies(connection, self.count)
+        except:
+            connection.disconnect()
+            raise
+        finally:
+            pool.release(connection)
+            del self.buffer[:]
+            self.count = 0
+        if error is not None:
+            raise error
+
+# reads count replies, returning the first error reply or None
+def _read_raw_replies(connection, count):
+    error = None
+    while count:
+        try:
+            connection.read_response()
+        except redis.ResponseError:
+            # the remaining replies must still be read
+            if error is None:
+                error = sys.exc_info()[1]
+        count -= 1
+    return error
+
+# writes a long string with SET and APPEND, one chunk at a time
+def _string_writer(p, key, value):
+    if isinstance(value, StringValue):
+        chunks = value.chunks()
+    else:
+        chunks = (value[start:start + string_chunk_size]
+            for start in range(0, len(value), string_chunk_size))
+    for i, chunk in enumerate(chunks):
+        if i == 0:
+            p.set(key, chunk)
+        else:
+            p.append(key, chunk)
+        if i % string_batch_chunks == string_batch_chunks - 1:
+            p.execute()
+    # the chunks left are not held until the pipeline is executed next
+    p.execute()
 
 def _writer(r, p, key, type, value, ttl, expireat, use_expireat):
-    p.delete(key)
-    if type == 'string':
-        p.set(key, value)
+    r.unlink_or_delete_pipeline(p, key)
+    if type == 'none':
+        # tombstone in an incremental dump
+        return
+    elif type == 'string':
+        if isinstance(value, StringValue) or len(value) > string_chunk_size:
+            _string_writer(p, key, value)
+        else:
+            p.set(key, value)
     elif type == 'list':
-        for element in value:
-            p.rpush(key, element)
+        if r.have_variadic:
+            for chunk in _chunks(value):
+                p.rpush(key, *chunk)
+        else:
+            for element in value:
+                p.rpush(key, element)
     elif type == 'set':
-        for element in value:
-            p.sadd(key, element)
+        if r.have_variadic:
+            for chunk in _chunks(value):
+                p.sadd(key, *chunk)
+        else:
+            for element in value:
+                p.sadd(key, element)
     elif type == 'zset':
-        for element, score in value:
-            p.zadd(key, element, score)
+        if r.have_variadic:
+            for chunk in _chunks(value):
+                args = []
+                for element, score in chunk:
+                    args.append(element)
+                    args.append(score)
+                p.zadd(key, *args)
+        else:
+            for element, score in value:
+                p.zadd(key, element, score)
     elif type == 'hash':
         p.hmset(key, value)
+    elif type == 'stream':
+        _stream_writer(r, p, key, value)
     else:
         raise UnknownTypeError("Unknown key type: %s" % type)
 
@@ -496,6 +4351,53 @@ def _writer(r, p, key, type, value, ttl, expireat, use_expireat):
         elif expireat is not None:
             r.pexpireat_or_expireat_pipeline(p, key, expireat)
 
+# maximum number of commands queued in a pipeline while writing a stream
+stream_pipeline_size = 10000
+
+# note: stream ids and keywords are given as bytes so that they are not
+# encoded using the client's encoding
+def _stream_writer(r, p, key, value):
+    if isinstance(value, StreamValue):
+        entries = value.entries()
+        last_id = value.last_id
+        groups = value.groups()
+    else:
+        entries = value['entries']
+        last_id = value['last_id']
+        groups = value['groups']
+    created = False
+    for id, fields in entries:
+        p.execute_command('XADD', key, id.encode('ascii'), *fields)
+        created = True
+        if len(p) >= stream_pipeline_size:
+            # streams may have millions of entries
+            p.execute()
+    if not created and not groups:
+        # an empty stream; an entry is added and trimmed right away
+        p.execute_command('XADD', key, b'MAXLEN', b'0',
+            (last_id == '0-0' and '0-1' or last_id).encode('ascii'), b'-', b'-')
+    for group in groups:
+        p.execute_command('XGROUP CREATE', key, group['name'],
+            group['last_delivered_id'].encode('ascii'), b'MKSTREAM')
+    # entries after the last one might have been deleted
+    p.execute_command('XSETID', key, last_id.encode('ascii'))
+    for group in groups:
+        with_pending = set()
+        for id, consumer, idle, deliveries in group['pending']:
+            # FORCE creates the pending entry, and the consumer
+            p.execute_command('XCLAIM', key, group['name'], consumer, b'0',
+                id.encode('ascii'), b'IDLE', str(int(idle)).encode('ascii'),
+                b'RETRYCOUNT', str(int(deliveries)).encode('ascii'),
+                b'FORCE', b'JUSTID')
+            with_pending.add(consumer)
+            if len(p) >= stream_pipeline_size:
+                p.execute()
+        if r.capabilities.have_create_consumer:
+            for consumer in group['consumers']:
+                if consumer not in with_pending:
+                    p.execute_command('XGROUP CREATECONSUMER', key,
+                        group['name'], consumer)
+
 def main():
     import optparse
     import os.path
@@ -504,6 +4406,9 @@ def main():
 
     DUMP = 1
     LOAD = 2
+    COPY = 3
+    ESTIMATE = 4
+    VERIFY = 5
 
     def options_to_kwargs(options):
         args = {}
@@ -524,26 +4429,174 @@ def main():
             args['pretty'] = True
         if hasattr(options, 'keys') and options.keys:
             args['keys'] = options.keys
+        if hasattr(options, 'exclude_keys') and options.exclude_keys:
+            args['exclude_keys'] = options.exclude_keys
+        if hasattr(options, 'types') and options.types:
+            args['types'] = [type for option in options.types
+                for type in option.split(',')]
+        if hasattr(options, 'fingerprint_method') and options.fingerprint_method:
+            args['fingerprint_method'] = options.fingerprint_method
+        if hasattr(options, 'all_dbs') and options.all_dbs:
+            args['all_dbs'] = True
+        if hasattr(options, 'on_contention') and options.on_contention:
+            args['on_contention'] = options.on_contention
         # load only
         if hasattr(options, 'use_expireat') and options.use_expireat:
             args['use_expireat'] = True
         if hasattr(options, 'empty') and options.empty:
             args['empty'] = True
+        if hasattr(options, 'sync') and options.sync:
+            args['sync'] = True
+        if hasattr(options, 'delete_extra') and options.delete_extra:
+            args['delete_extra'] = True
         if hasattr(options, 'backend') and options.backend:
             args['streaming_backend'] = options.backend
+        if hasattr(options, 'writer_backend') and options.writer_backend:
+            args['writer_backend'] = options.writer_backend
+        if hasattr(options, 'key_prefix') and options.key_prefix:
+            args['key_prefix'] = options.key_prefix
+        if hasattr(options, 'strip_prefix') and options.strip_prefix:
+            args['strip_prefix'] = options.strip_prefix
+        if hasattr(options, 'rename_regex') and options.rename_regex:
+            args['rename'] = tuple(options.rename_regex)
+        if hasattr(options, 'db_map') and options.db_map:
+            args['db_map'] = dict(mapping.split(':', 1)
+                for option in options.db_map for mapping in option.split(','))
+        if options.max_latency or options.max_ops or options.max_bandwidth:
+            args['throttle'] = Throttle(
+                max_latency=options.max_latency and float(options.max_latency) / 1000,
+                max_ops=options.max_ops and float(options.max_ops),
+                max_bytes=options.max_bandwidth and float(options.max_bandwidth) * 1024 * 1024)
         return args
 
     def do_dump(options):
-        if options.output:
+        if options.rdb:
+            do_dump_rdb(options)
+            return
+        if options.format == 'resp':
+            if options.output:
+                output = open(options.output, 'wb')
+            else:
+                output = getattr(sys.stdout, 'buffer', sys.stdout)
+        elif options.output:
             output = open(options.output, 'w')
         else:
             output = sys.stdout
 
         kwargs = options_to_kwargs(options)
+        if options.format:
+            kwargs['format'] = options.format
+        if options.resp_target_version:
+            if options.format != 'resp':
+                parser.error('--resp-target-version applies to RESP dumps only')
+            kwargs['resp_target_version'] = options.resp_target_version
+        if options.fingerprints:
+            kwargs['fingerprint_output'] = open(options.fingerprints, 'wb')
+        if options.delta_from:
+            kwargs['delta_from'] = open(options.delta_from, 'rb')
+        if options.index:
+            # offsets of the index are in bytes
+            kwargs['index_output'] = open(options.index, 'wb')
+            if options.index_mode:
+                kwargs['index_mode'] = options.index_mode
+        if options.profile:
+            kwargs['profile_output'] = open(options.profile, 'w')
+        kwargs['contention_stats'] = stats = {}
         dump(output, **kwargs)
+        report_contention(stats)
 
         if options.output:
             output.close()
+        for key in ('fingerprint_output', 'delta_from', 'index_output',
+                    'profile_output'):
+            if key in kwargs:
+                kwargs[key].close()
+
+    def do_dump_rdb(options):
+        kwargs = options_to_kwargs(options)
+        # options which do not apply to RDB files
+        for key in ('host', 'port', 'unix_socket_path', 'password', 'throttle',
+                    'fingerprint_method', 'on_contention'):
+            kwargs.pop(key, None)
+        if options.fingerprints or options.delta_from or options.index or \
+                options.profile or options.format not in (None, 'json'):
+            parser.error('RDB files are converted to plain JSON dumps')
+        if options.output:
+            output = open(options.output, 'w')
+        else:
+            output = sys.stdout
+        input = open(options.rdb, 'rb')
+        dump_rdb(input, output, **kwargs)
+        input.close()
+        if options.output:
+            output.close()
+
+    def do_copy(options):
+        kwargs = options_to_kwargs(options)
+        # options which do not affect copying
+        for key in ('pretty', 'fingerprint_method', 'all_dbs', 'use_expireat',
+                    'sync', 'delete_extra', 'streaming_backend', 'writer_backend'):
+            kwargs.pop(key, None)
+        for key in ('key_prefix', 'strip_prefix', 'rename', 'db_map'):
+            if key in kwargs:
+                parser.error('Keys cannot be renamed when copying')
+        if options.target_host:
+            kwargs['target_host'] = options.target_host
+        if options.target_port:
+            kwargs['target_port'] = int(options.target_port)
+        if options.target_socket:
+            kwargs['target_unix_socket_path'] = options.target_socket
+        if options.target_password:
+            kwargs['target_password'] = options.target_password
+        if options.target_db:
+            kwargs['target_db'] = int(options.target_db)
+        kwargs['contention_stats'] = stats = {}
+        copy(**kwargs)
+        report_contention(stats)
+
+    def report_contention(stats):
+        for kind, description in (('skipped', 'skipped'),
+                                  ('best_effort', 'read without watching')):
+            if stats[kind]:
+                sys.stderr.write('%d keys being modified were %s: %s\n' % (
+                    len(stats[kind]), description, ', '.join(stats[kind])))
+
+    def do_estimate(options):
+        kwargs = options_to_kwargs(options)
+        # options which do not affect the estimate
+        for key in ('pretty', 'fingerprint_method', 'all_dbs', 'throttle',
+                    'on_contention', 'use_expireat', 'empty', 'sync',
+                    'delete_extra', 'streaming_backend', 'writer_backend',
+                    'key_prefix', 'strip_prefix', 'rename', 'db_map'):
+            kwargs.pop(key, None)
+        if options.sample_size:
+            kwargs['sample_size'] = int(options.sample_size)
+        result = estimate(**kwargs)
+        print(json.dumps(result, indent=2, sort_keys=True))
+
+    def do_verify(options, args):
+        if len(args) > 0:
+            input = open(args[0], 'rb')
+        else:
+            input = sys.stdin
+
+        kwargs = options_to_kwargs(options)
+        # options which do not affect verification
+        for key in ('pretty', 'fingerprint_method', 'all_dbs', 'throttle', 'empty',
+                    'sync', 'delete_extra', 'writer_backend', 'on_contention'):
+            kwargs.pop(key, None)
+        for key in ('key_prefix', 'strip_prefix', 'rename', 'db_map'):
+            if key in kwargs:
+                parser.error('Keys cannot be renamed when verifying')
+        if options.ttl_tolerance:
+            kwargs['ttl_tolerance'] = float(options.ttl_tolerance)
+        report = verify(input, **kwargs)
+
+        if len(args) > 0:
+            input.close()
+        print(json.dumps(report, indent=2, sort_keys=True))
+        if report['keys'] != report['matched'] or report['extra']:
+            exit(1)
 
     def do_load(options, args):
         if len(args) > 0:
@@ -552,7 +4605,51 @@ def main():
             input = sys.stdin
 
         kwargs = options_to_kwargs(options)
-        load(input, **kwargs)
+        if options.rename_map:
+            if 'rename' in kwargs:
+                parser.error('--rename-regex and --rename-map are mutually exclusive')
+            rename_input = open(options.rename_map)
+            kwargs['rename'] = json.load(rename_input)
+            rename_input.close()
+        if options.rdb:
+            # options which do not apply to RDB files
+            for key in ('host', 'port', 'unix_socket_path', 'password',
+                        'throttle', 'empty', 'writer_backend'):
+                kwargs.pop(key, None)
+            if 'sync' in kwargs or 'delete_extra' in kwargs or options.index or \
+                    options.mmap or options.format not in (None, 'json'):
+                parser.error('JSON dumps are converted to RDB files as a whole')
+            output = open(options.rdb, 'wb')
+            write_rdb(input, output, **kwargs)
+            output.close()
+        elif options.format == 'resp':
+            kwargs.pop('streaming_backend', None)
+            for key in ('keys', 'exclude_keys', 'types', 'use_expireat', 'sync',
+                        'delete_extra', 'key_prefix', 'strip_prefix', 'rename',
+                        'db_map'):
+                if key in kwargs:
+                    parser.error('RESP dumps are replayed as a whole')
+            if options.index or options.mmap:
+                parser.error('RESP dumps are replayed as a whole')
+            if input is sys.stdin:
+                input = getattr(sys.stdin, 'buffer', sys.stdin)
+            load_resp(input, **kwargs)
+        elif options.format and options.format != 'json':
+            parser.error('Invalid dump format: %s' % options.format)
+        elif options.index:
+            if len(args) == 0:
+                parser.error('--index requires FILE')
+            kwargs.pop('streaming_backend', None)
+            index_input = open(options.index, 'rb')
+            load_indexed(input, index_input, **kwargs)
+            index_input.close()
+        elif options.mmap:
+            if len(args) == 0:
+                parser.error('--mmap requires FILE')
+            kwargs.pop('streaming_backend', None)
+            load_mmap(input, **kwargs)
+        else:
+            load(input, **kwargs)
 
         if len(args) > 0:
             input.close()
@@ -580,7 +4677,12 @@ def main():
     else:
         usage = "Usage: %prog [options]"
         usage += "\n       %prog -l [options] [FILE]"
-        usage += "\n\nDump data from redis or load data into redis."
+        usage += "\n       %prog -c [options]"
+        usage += "\n       %prog --estimate [options]"
+        usage += "\n       %prog --verify [options] [FILE]"
+        usage += "\n\nDump data from redis, load data into redis, copy data between redis"
+        usage += "\ndatabases, estimate size and duration of a dump or verify that redis"
+        usage += "\nholds the data of a dump."
         usage += "\n\nIf input or output file is specified, dump to standard output and load"
         usage += "\nfrom standard input."
     parser = optparse.OptionParser(usage=usage)
@@ -588,38 +4690,126 @@ def main():
     parser.add_option('-p', '--port', help='connect to PORT (default 6379)')
     parser.add_option('-s', '--socket', help='connect to SOCKET')
     parser.add_option('-w', '--password', help='connect with PASSWORD')
+    parser.add_option('--max-latency', help='slow down while PING round trip time exceeds MAX_LATENCY milliseconds')
+    parser.add_option('--max-ops', help='read or write at most MAX_OPS keys per second')
+    parser.add_option('--max-bandwidth', help='read or write at most MAX_BANDWIDTH megabytes of data per second')
     if help == DUMP:
         parser.add_option('-d', '--db', help='dump DATABASE (0-N, default 0)')
-        parser.add_option('-k', '--keys', help='dump only keys matching specified glob-style pattern')
+        parser.add_option('-k', '--keys', help='dump only keys matching specified glob-style pattern (may be given multiple times)', action='append')
+        parser.add_option('-x', '--exclude-keys', help='do not dump keys matching specified glob-style pattern (may be given multiple times)', action='append')
+        parser.add_option('-t', '--type', dest='types', help='dump only keys of specified TYPE (may be given multiple times or comma-separated)', action='append')
         parser.add_option('-o', '--output', help='write to OUTPUT instead of stdout')
         parser.add_option('-y', '--pretty', help='split output on multiple lines and indent it', action='store_true')
         parser.add_option('-E', '--encoding', help='set encoding to use while decoding data from redis', default='utf-8')
+        parser.add_option('--fingerprints', help='write fingerprint index of dumped keys to FINGERPRINTS')
+        parser.add_option('--delta-from', help='dump only keys changed since the dump whose fingerprint index is DELTA_FROM')
+        parser.add_option('--fingerprint-method', help='fingerprint values client-side (value, default) or using DEBUG DIGEST-VALUE (digest)')
+        parser.add_option('--all-dbs', help='dump all non-empty databases into one document', action='store_true')
+        parser.add_option('--index', help='write offset index of dumped keys to INDEX')
+        parser.add_option('--index-mode', help='index every key (keys, default) or blocks of key hashes (hashes)')
+        parser.add_option('--format', help='write a JSON dump (json, default) or redis protocol commands (resp)')
+        parser.add_option('--resp-target-version', help='write redis protocol commands for servers of version VERSION or newer (2.6 by default)', metavar='VERSION')
+        parser.add_option('--on-contention', help='when a key keeps being modified while it is read, fail (default), skip it (skip) or read it without watching it (best-effort)', metavar='POLICY')
+        parser.add_option('--rdb', help='dump the keys of RDB file RDB instead of reading them from redis', metavar='RDB')
+        parser.add_option('--profile', help='write a profile of the memory usage, cardinality and expiration times of dumped keys to PROFILE')
+        parser.add_option('--estimate', help='estimate size and duration of the dump instead of dumping', action='store_true')
+        parser.add_option('--sample-size', help='number of keys to sample when estimating (default 1000)')
     elif help == LOAD:
         parser.add_option('-d', '--db', help='load into DATABASE (0-N, default 0)')
         parser.add_option('-e', '--empty', help='delete all keys in destination db prior to loading', action='store_true')
+        parser.add_option('--sync', help='write only keys which are missing from redis or differ from FILE', action='store_true')
+        parser.add_option('--delete-extra', help='with --sync, delete keys which are not in FILE', action='store_true')
         parser.add_option('-E', '--encoding', help='set encoding to use while encoding data to redis', default='utf-8')
         parser.add_option('-B', '--backend', help='use specified streaming backend')
+        parser.add_option('--writer-backend', help='write to redis using redis-py pipelines (pipeline, default) or raw protocol buffers (raw)')
+        parser.add_option('-M', '--mmap', help='memory-map FILE and load it without a streaming backend', action='store_true')
+        parser.add_option('-k', '--keys', help='load only keys matching specified glob-style pattern (may be given multiple times)', action='append')
+        parser.add_option('-x', '--exclude-keys', help='do not load keys matching specified glob-style pattern (may be given multiple times)', action='append')
+        parser.add_option('-t', '--type', dest='types', help='load only keys of specified TYPE (may be given multiple times or comma-separated)', action='append')
+        parser.add_option('--index', help='seek to keys in FILE using its offset index INDEX')
+        parser.add_option('--format', help='load a JSON dump (json, default) or replay redis protocol commands (resp)')
+        parser.add_option('--key-prefix', help='prepend PREFIX to names of loaded keys', metavar='PREFIX')
+        parser.add_option('--strip-prefix', help='remove PREFIX from names of loaded keys starting with it', metavar='PREFIX')
+        parser.add_option('--rename-regex', help='replace matches of regular expression PATTERN in names of loaded keys with REPLACEMENT', nargs=2, metavar='PATTERN REPLACEMENT')
+        parser.add_option('--rename-map', help='rename loaded keys using the JSON object in FILE mapping old names to new ones', metavar='FILE')
+        parser.add_option('--db-map', help='load database SOURCE of a multiple database dump into database TARGET (may be given multiple times or comma-separated)', action='append', metavar='SOURCE:TARGET')
+        parser.add_option('--rdb', help='write the keys of FILE to RDB file RDB instead of loading them into redis', metavar='RDB')
+        parser.add_option('--verify', help='compare redis with FILE instead of loading it, reporting differences as JSON', action='store_true')
+        parser.add_option('--ttl-tolerance', help='report TTLs differing from the dump by more than TTL_TOLERANCE seconds when verifying (default 60)')
         parser.add_option('-A', '--use-expireat', help='use EXPIREAT rather than TTL/EXPIRE', action='store_true')
     else:
         parser.add_option('-l', '--load', help='load data into redis (default is to dump data from redis)', action='store_true')
         parser.add_option('-d', '--db', help='dump or load into DATABASE (0-N, default 0)')
-        parser.add_option('-k', '--keys', help='dump only keys matching specified glob-style pattern')
+        parser.add_option('-k', '--keys', help='dump, load or copy only keys matching specified glob-style pattern (may be given multiple times)', action='append')
+        parser.add_option('-x', '--exclude-keys', help='do not dump, load or copy keys matching specified glob-style pattern (may be given multiple times)', action='append')
+        parser.add_option('-t', '--type', dest='types', help='dump, load or copy only keys of specified TYPE (may be given multiple times or comma-separated)', action='append')
         parser.add_option('-o', '--output', help='write to OUTPUT instead of stdout (dump mode only)')
         parser.add_option('-y', '--pretty', help='split output on multiple lines and indent it (dump mode only)', action='store_true')
         parser.add_option('-e', '--empty', help='delete all keys in destination db prior to loading (load mode only)', action='store_true')
+        parser.add_option('--sync', help='write only keys which are missing from redis or differ from FILE (load mode only)', action='store_true')
+        parser.add_option('--delete-extra', help='with --sync, delete keys which are not in FILE (load mode only)', action='store_true')
         parser.add_option('-E', '--encoding', help='set encoding to use while decoding data from redis', default='utf-8')
         parser.add_option('-A', '--use-expireat', help='use EXPIREAT rather than TTL/EXPIRE', action='store_true')
         parser.add_option('-B', '--backend', help='use specified streaming backend (load mode only)')
+        parser.add_option('--writer-backend', help='write to redis using redis-py pipelines (pipeline, default) or raw protocol buffers (raw) (load mode only)')
+        parser.add_option('-M', '--mmap', help='memory-map FILE and load it without a streaming backend (load mode only)', action='store_true')
+        parser.add_option('--key-prefix', help='prepend PREFIX to names of loaded keys (load mode only)', metavar='PREFIX')
+        parser.add_option('--strip-prefix', help='remove PREFIX from names of loaded keys starting with it (load mode only)', metavar='PREFIX')
+        parser.add_option('--rename-regex', help='replace matches of regular expression PATTERN in names of loaded keys with REPLACEMENT (load mode only)', nargs=2, metavar='PATTERN REPLACEMENT')
+        parser.add_option('--rename-map', help='rename loaded keys using the JSON object in FILE mapping old names to new ones (load mode only)', metavar='FILE')
+        parser.add_option('--db-map', help='load database SOURCE of a multiple database dump into database TARGET (load mode only, may be given multiple times or comma-separated)', action='append', metavar='SOURCE:TARGET')
+        parser.add_option('--fingerprints', help='write fingerprint index of dumped keys to FINGERPRINTS (dump mode only)')
+        parser.add_option('--delta-from', help='dump only keys changed since the dump whose fingerprint index is DELTA_FROM (dump mode only)')
+        parser.add_option('--fingerprint-method', help='fingerprint values client-side (value, default) or using DEBUG DIGEST-VALUE (digest) (dump mode only)')
+        parser.add_option('--all-dbs', help='dump all non-empty databases into one document (dump mode only)', action='store_true')
+        parser.add_option('--index', help='write offset index of dumped keys to INDEX in dump mode, seek to keys in FILE using INDEX in load mode')
+        parser.add_option('--index-mode', help='index every key (keys, default) or blocks of key hashes (hashes) (dump mode only)')
+        parser.add_option('--format', help='dump or load JSON (json, default) or redis protocol commands (resp)')
+        parser.add_option('--resp-target-version', help='write redis protocol commands for servers of version VERSION or newer (2.6 by default) (dump mode only)', metavar='VERSION')
+        parser.add_option('--on-contention', help='when a key keeps being modified while it is read, fail (default), skip it (skip) or read it without watching it (best-effort) (dump and copy modes only)', metavar='POLICY')
+        parser.add_option('--rdb', help='dump the keys of RDB file RDB instead of reading them from redis in dump mode, write the keys of FILE to RDB file RDB instead of loading them into redis in load mode', metavar='RDB')
+        parser.add_option('--profile', help='write a profile of the memory usage, cardinality and expiration times of dumped keys to PROFILE (dump mode only)')
+        parser.add_option('--estimate', help='estimate size and duration of a dump instead of dumping', action='store_true')
+        parser.add_option('--sample-size', help='number of keys to sample when estimating (estimate mode only, default 1000)')
+        parser.add_option('--verify', help='compare redis with FILE, reporting differences as JSON', action='store_true')
+        parser.add_option('--ttl-tolerance', help='report TTLs differing from the dump by more than TTL_TOLERANCE seconds (verify mode only, default 60)')
+        parser.add_option('-c', '--copy', help='copy data to another redis database without an intermediate file', action='store_true')
+        parser.add_option('--target-host', help='copy to redis on TARGET_HOST (copy mode only, default same as source)')
+        parser.add_option('--target-port', help='copy to redis on TARGET_PORT (copy mode only, default same as source)')
+        parser.add_option('--target-socket', help='copy to redis on TARGET_SOCKET (copy mode only)')
+        parser.add_option('--target-password', help='connect to target redis with TARGET_PASSWORD (copy mode only)')
+        parser.add_option('--target-db', help='copy into TARGET_DB (copy mode only, default same as source)')
     options, args = parser.parse_args()
 
     if hasattr(options, 'load') and options.load:
         action = LOAD
+    if hasattr(options, 'copy') and options.copy:
+        action = COPY
+    if hasattr(options, 'estimate') and options.estimate:
+        action = ESTIMATE
+    if hasattr(options, 'verify') and options.verify:
+        action = VERIFY
 
     if action == DUMP:
         if len(args) > 0:
             parser.print_help()
             exit(4)
         do_dump(options)
+    elif action == COPY:
+        if len(args) > 0:
+            parser.print_help()
+            exit(4)
+        do_copy(options)
+    elif action == ESTIMATE:
+        if len(args) > 0:
+            parser.print_help()
+            exit(4)
+        do_estimate(options)
+    elif action == VERIFY:
+        if len(args) > 1:
+            parser.print_help()
+            exit(4)
+        do_verify(options, args)
     else:
         if len(args) > 1:
             parser.print_help()
@@ -0,0 +1,80 @@
+import redis
+import redisdl
+import unittest
+import json
+from . import util
+if redisdl.py3:
+    from io import StringIO, BytesIO
+else:
+    from StringIO import StringIO
+    from io import BytesIO
+
+class AllDbsTest(unittest.TestCase):
+    dbs = (0, 2, 5)
+
+    def setUp(self):
+        self.clients = dict((db, redis.Redis(db=db)) for db in range(8))
+        self.flush()
+
+    def flush(self):
+        for r in self.clients.values():
+            for key in r.keys('*'):
+                r.delete(key)
+
+    def populate(self):
+        for db in self.dbs:
+            r = self.clients[db]
+            r.set('key', 'value-%d' % db)
+            r.rpush('list-%d' % db, 'a', 'b')
+
+    def expected(self):
+        return {'databases': dict((str(db), {
+            'key': {'type': 'string', 'value': 'value-%d' % db},
+            'list-%d' % db: {'type': 'list', 'value': ['a', 'b']},
+        }) for db in self.dbs)}
+
+    def test_dumps(self):
+        self.populate()
+        self.assertEqual(self.expected(), json.loads(redisdl.dumps(all_dbs=True)))
+
+    def test_dump(self):
+        self.populate()
+        fp = StringIO()
+        redisdl.dump(fp, all_dbs=True)
+        self.assertEqual(self.expected(), json.loads(fp.getvalue()))
+
+    def test_dump_pretty(self):
+        self.populate()
+        fp = StringIO()
+        redisdl.dump(fp, all_dbs=True, pretty=True)
+        self.assertEqual(self.expected(), json.loads(fp.getvalue()))
+
+    def test_dump_no_databases(self):
+        self.assertEqual({'databases': {}}, json.loads(redisdl.dumps(all_dbs=True)))
+
+    def check_load(self, load):
+        self.populate()
+        dump = redisdl.dumps(all_dbs=True, pretty=True)
+        self.flush()
+        self.clients[2].set('stale', 'value')
+        load(dump)
+        self.assertEqual(self.expected(), json.loads(redisdl.dumps(all_dbs=True)))
+
+    def test_loads(self):
+        self.check_load(lambda dump: redisdl.loads(dump, empty=True))
+
+    def test_load_lump(self):
+        self.check_load(lambda dump: redisdl.load_lump(StringIO(dump), empty=True))
+
+    @util.requires_ijson
+    def test_load_streaming(self):
+        self.check_load(lambda dump: redisdl.load(
+            BytesIO(dump.encode('utf-8')), empty=True))
+
+    def test_load_single_key_named_databases(self):
+        redisdl.loads('{"databases":{"type":"string","value":"value"}}')
+        self.assertEqual(util.b('value'), self.clients[0].get('databases'))
+
+    def test_dump_rejects_delta(self):
+        self.assertRaises(TypeError, redisdl.dumps, all_dbs=True,
+            fingerprint_output=StringIO())
@@ -0,0 +1,58 @@
+import io
+import time as _time
+import redisdl
+from . import generate_data
+
+# compares the speed of parsing a dump with ijson's parse events, which
+# is how streaming loads were done before ijson's kvitems was used, with
+# the current streaming loader. parsing dominates the time of streaming
+# loads, hence redis is only needed when --load is given.
+
+def make_dump(count, **kwargs):
+    generator = generate_data.DataGenerator(None, **kwargs)
+    fp = io.StringIO()
+    encoder = redisdl.json.JSONEncoder(separators=(',', ':'))
+    redisdl._write_table(fp, encoder, generator.records(count))
+    return fp.getvalue().encode('utf-8')
+
+def timed(function, *args):
+    start = _time.time()
+    function(*args)
+    return _time.time() - start
+
+def parse_events(data, backend):
+    ijson = redisdl.get_ijson(backend)
+    for item in redisdl._ijson_event_items(ijson, io.BytesIO(data)):
+        pass
+
+def parse_items(data, backend):
+    for item in redisdl.ijson_top_level_items(io.BytesIO(data), backend):
+        pass
+
+def main():
+    import optparse
+
+    parser = optparse.OptionParser(usage="Usage: %prog [options]\n\n"
+        "Benchmark streaming load of a synthetic dump.")
+    parser.add_option('-n', '--count', default=100000, type='int', help='number of keys in the dump (default 100000)')
+    parser.add_option('-c', '--cardinality', default='uniform:1:16', help='collection cardinality distribution (default uniform:1:16)')
+    parser.add_option('-B', '--backend', action='append', help='ijson backend to benchmark (default the fastest available)')
+    parser.add_option('-l', '--load', action='store_true', help='also load the dump into redis, replacing its data')
+    options, args = parser.parse_args()
+
+    data = make_dump(options.count, cardinality=options.cardinality)
+    print('Dump of %d keys, %d bytes' % (options.count, len(data)))
+    for backend in options.backend or [None]:
+        fastest = redisdl._fastest_ijson_backend()
+        name = backend or 'fastest (%s)' % getattr(fastest, 'backend', fastest.__name__)
+        events = timed(parse_events, data, backend)
+        items = timed(parse_items, data, backend)
+        print('%s: parse events %.2fs, items %.2fs, %.1fx' % (
+            name, events, items, events / items))
+        if options.load:
+            elapsed = timed(lambda: redisdl.load(io.BytesIO(data), empty=True,
+                streaming_backend=backend and 'ijson-' + backend))
+            print('%s: load %.2fs' % (name, elapsed))
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 import redis
+from generate_data import DataGenerator
 
 client = redis.Redis()
 
-for i in range(100000):
-    client.set('testkey%d' % i, 'testvalue%d' % i)
+DataGenerator(client, types=['string'], prefix='testkey').insert(100000)
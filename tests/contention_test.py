@@ -0,0 +1,120 @@
+import redis
+import redisdl
+import unittest
+import json
+
+class ContentionTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+        for key in ('a', 'b', 'hot', 'c'):
+            self.r.set(key, key)
+        self.backoff = redisdl.contention_backoff
+        redisdl.contention_backoff = 0.001
+        self.read_key = redisdl._read_key
+
+    def tearDown(self):
+        redisdl.contention_backoff = self.backoff
+        redisdl._read_key = self.read_key
+
+    def contend(self, times):
+        # reading hot fails as if it was modified, times times
+        read_key = self.read_key
+        attempts = []
+        def contended_read_key(key, r, pretty, encoding, types=None, watch=True):
+            if key == b'hot' and watch:
+                attempts.append(key)
+                if times is None or len(attempts) <= times:
+                    raise redis.WatchError
+            return read_key(key, r, pretty, encoding, types, watch)
+        redisdl._read_key = contended_read_key
+        return attempts
+
+    def test_deferred(self):
+        attempts = self.contend(3)
+        stats = {}
+        records = list(redisdl.iter_dump(contention_stats=stats))
+        # other keys are dumped while hot waits
+        self.assertEqual('hot', records[-1].key)
+        self.assertEqual(['a', 'b', 'c', 'hot'],
+            sorted(record.key for record in records))
+        self.assertEqual(4, len(attempts))
+        self.assertEqual({'deferred': 1, 'retries': 3, 'skipped': [],
+            'best_effort': []}, stats)
+
+    def test_fail(self):
+        attempts = self.contend(None)
+        self.assertRaises(redisdl.ConcurrentModificationError, redisdl.dumps)
+        self.assertEqual(redisdl.contention_attempts, len(attempts))
+
+    def test_skip(self):
+        self.contend(None)
+        stats = {}
+        table = json.loads(redisdl.dumps(on_contention='skip',
+            contention_stats=stats))
+        self.assertEqual(['a', 'b', 'c'], sorted(table.keys()))
+        self.assertEqual(['hot'], stats['skipped'])
+        self.assertEqual(1, stats['deferred'])
+        self.assertEqual(redisdl.contention_attempts - 1, stats['retries'])
+
+    def test_delta_skip(self):
+        import io
+        for method in redisdl.fingerprint_methods:
+            self.r.set('a', 'a')
+            self.r.set('hot', 'hot')
+            index = io.BytesIO()
+            redisdl.dumps(fingerprint_output=index, fingerprint_method=method)
+            self.r.set('a', 'changed')
+            self.r.set('hot', 'changed')
+            self.contend(None)
+            stats = {}
+            delta_index = io.BytesIO()
+            table = json.loads(redisdl.dumps(delta_from=io.BytesIO(index.getvalue()),
+                fingerprint_output=delta_index, fingerprint_method=method,
+                on_contention='skip', contention_stats=stats))
+            # hot is neither dumped nor deleted
+            self.assertEqual(['a'], list(table.keys()))
+            self.assertEqual(['hot'], stats['skipped'])
+            def entry(index):
+                return [entry for entry in redisdl.load_fingerprints(
+                    io.BytesIO(index.getvalue())) if entry[0] == b'hot']
+            self.assertEqual(1, len(entry(index)))
+            self.assertEqual(entry(index), entry(delta_index))
+            # the next delta dumps it
+            redisdl._read_key = self.read_key
+            table = json.loads(redisdl.dumps(
+                delta_from=io.BytesIO(delta_index.getvalue()),
+                fingerprint_method=method))
+            self.assertEqual({'hot': {'type': 'string', 'value': 'changed'}}, table)
+
+    def test_best_effort(self):
+        self.contend(None)
+        stats = {}
+        table = json.loads(redisdl.dumps(on_contention='best-effort',
+            contention_stats=stats))
+        self.assertEqual('hot', table['hot']['value'])
+        self.assertEqual(['hot'], stats['best_effort'])
+        self.assertEqual([], stats['skipped'])
+
+    def test_copy(self):
+        self.contend(None)
+        stats = {}
+        redisdl.copy(target_db=1, use_dump_restore=False, empty=True,
+            on_contention='skip', contention_stats=stats)
+        self.assertEqual([b'a', b'b', b'c'], sorted(redis.Redis(db=1).keys('*')))
+        self.assertEqual(['hot'], stats['skipped'])
+
+    def test_deleted_while_deferred(self):
+        read_key = self.read_key
+        def contended_read_key(key, r, pretty, encoding, types=None, watch=True):
+            if key == b'hot' and self.r.exists('hot'):
+                # deleted by the time it is retried
+                self.r.delete('hot')
+                raise redis.WatchError
+            return read_key(key, r, pretty, encoding, types, watch)
+        redisdl._read_key = contended_read_key
+        self.assertEqual(['a', 'b', 'c'], sorted(json.loads(redisdl.dumps()).keys()))
+
+    def test_invalid(self):
+        self.assertRaises(TypeError, redisdl.dumps, on_contention='retry')
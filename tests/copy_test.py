@@ -0,0 +1,111 @@
+import redis
+import redisdl
+import unittest
+import json
+import os.path
+from . import util
+
+class CopyTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        self.target = redis.Redis(db=1)
+        for r in (self.r, self.target):
+            for key in r.keys('*'):
+                r.delete(key)
+
+    def load_fixture(self):
+        path = os.path.join(os.path.dirname(__file__), 'fixtures', 'dump.json')
+        with open(path) as f:
+            dump = f.read()
+        redisdl.loads(dump)
+        return json.loads(dump)
+
+    def check_copy(self, **kwargs):
+        expected = self.load_fixture()
+        self.r.set('expiring', 'value')
+        self.r.expire('expiring', 3600)
+
+        redisdl.copy(target_db=1, batch_size=2, queue_size=1, **kwargs)
+
+        actual = json.loads(redisdl.dumps(db=1))
+        self.assertGreater(actual['expiring']['ttl'], 3500)
+        del actual['expiring']
+        self.assertEqual(expected, actual)
+
+    @util.min_redis(2, 6)
+    def test_copy_dump_restore(self):
+        self.check_copy(use_dump_restore=True)
+
+    def test_copy_records(self):
+        self.check_copy(use_dump_restore=False)
+
+    def test_copy_default_method(self):
+        self.check_copy()
+
+    def test_copy_empty(self):
+        self.target.set('stale', 'value')
+        self.r.set('key', 'value')
+        redisdl.copy(target_db=1, empty=True)
+        self.assertEqual([util.b('key')], self.target.keys('*'))
+
+    def test_copy_onto_itself(self):
+        self.r.set('key', 'value')
+        self.assertRaises(TypeError, redisdl.copy, empty=True)
+        self.assertRaises(TypeError, redisdl.copy, empty=True,
+            target_host='127.0.0.1')
+        self.assertEqual(util.b('value'), self.r.get('key'))
+
+    def test_copy_keys(self):
+        self.r.set('key', 'value')
+        self.r.set('ignore_key', 'value')
+        redisdl.copy(target_db=1, keys='k*')
+        self.assertEqual([util.b('key')], self.target.keys('*'))
+
+    @util.min_redis(2, 6)
+    def test_payload_batches(self):
+        self.r.set('a', 'value')
+        self.r.set('b', 'value')
+        self.r.expire('b', 3600)
+        self.r.rpush('c', 'value')
+        matching_keys = redisdl._matching_keys
+        # the deleted key is listed but has no payload
+        redisdl._matching_keys = lambda r, key_filter: iter(
+            [util.b('a'), util.b('deleted'), util.b('b'), util.b('c')])
+        try:
+            r = redisdl.client()
+            batches = list(redisdl._dump_payload_batches(r,
+                redisdl._KeyFilter('*', None, None, 'utf-8'), 3))
+            filtered = list(redisdl._dump_payload_batches(r,
+                redisdl._KeyFilter('*', None, 'string', 'utf-8'), 10))
+        finally:
+            redisdl._matching_keys = matching_keys
+        payloads = batches[0] + batches[1]
+        self.assertEqual([util.b('a'), util.b('b'), util.b('c')],
+            [key for key, pttl, payload in payloads])
+        self.assertEqual(0, payloads[0][1])
+        self.assertTrue(3500000 < payloads[1][1] <= 3600000)
+        self.assertEqual(self.r.dump('a'), payloads[0][2])
+        self.assertEqual([util.b('a'), util.b('b')],
+            [key for key, pttl, payload in filtered[0]])
+
+    @util.min_redis(2, 6)
+    def test_copy_binary_key(self):
+        key = util.b('\xff\xfe')
+        self.r.set(key, util.b('\x00\xff'))
+        redisdl.copy(target_db=1, use_dump_restore=True)
+        self.assertEqual(util.b('\x00\xff'), self.target.get(key))
+
+    def test_copy_command_line(self):
+        import subprocess
+        self.r.set('key', 'value')
+        program = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        subprocess.check_call([program, '-c', '--target-db', '1'])
+        self.assertEqual(util.b('value'), self.target.get('key'))
+
+    def test_copy_command_line_ignored_options(self):
+        import subprocess
+        self.r.set('key', 'value')
+        program = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        subprocess.check_call([program, '-c', '--target-db', '1', '-y',
+            '-B', 'ijson'])
+        self.assertEqual(util.b('value'), self.target.get('key'))
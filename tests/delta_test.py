@@ -0,0 +1,141 @@
+import redis
+import redisdl
+import unittest
+import json
+from . import util
+from io import BytesIO
+if redisdl.py3:
+    from io import StringIO
+else:
+    from StringIO import StringIO
+
+class DeltaTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+
+    def check_delta(self, method):
+        self.r.set('changed', 'old')
+        self.r.set('deleted', 'value')
+        self.r.sadd('unchanged', 'a', 'b', 'c')
+        self.r.set('expiring', 'value')
+        self.r.expire('expiring', 3600)
+
+        base = StringIO()
+        index = BytesIO()
+        redisdl.dump(base, fingerprint_output=index, fingerprint_method=method)
+
+        self.r.set('changed', 'new')
+        self.r.delete('deleted')
+        self.r.rpush('added', 'x')
+        self.r.expire('expiring', 7200)
+
+        delta = StringIO()
+        new_index = BytesIO()
+        redisdl.dump(delta, delta_from=BytesIO(index.getvalue()),
+            fingerprint_output=new_index, fingerprint_method=method)
+
+        actual = json.loads(delta.getvalue())
+        self.assertEqual(['added', 'changed', 'deleted', 'expiring'], sorted(actual.keys()))
+        self.assertEqual({'type': 'none'}, actual['deleted'])
+        self.assertEqual('new', actual['changed']['value'])
+
+        # pretty dumps sort set members
+        expected = json.loads(redisdl.dumps(pretty=True))
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+        redisdl.loads(base.getvalue())
+        redisdl.loads(delta.getvalue())
+        restored = json.loads(redisdl.dumps(pretty=True))
+        for item in list(expected.values()) + list(restored.values()):
+            item.pop('ttl', None)
+            item.pop('expireat', None)
+        self.assertEqual(expected, restored)
+        self.assertGreater(self.r.ttl('expiring'), 3600)
+
+        # nothing changed since the second dump
+        empty_delta = redisdl.dumps(delta_from=BytesIO(new_index.getvalue()),
+            fingerprint_method=method)
+        self.assertEqual({}, json.loads(empty_delta))
+
+    def test_value_delta(self):
+        self.check_delta('value')
+
+    @util.min_redis(4, 0)
+    def test_digest_delta(self):
+        self.check_delta('digest')
+
+    def test_method_mismatch(self):
+        self.r.set('key', 'value')
+        index = BytesIO()
+        redisdl.dumps(fingerprint_output=index)
+        self.assertRaises(ValueError, redisdl.dumps,
+            delta_from=BytesIO(index.getvalue()), fingerprint_method='digest')
+
+    def check_index(self, method):
+        for i in range(100):
+            self.r.set('key:%d' % i, i)
+        self.r.expire('key:7', 3600)
+        index = BytesIO()
+        buffer_size = redisdl.fingerprint_sort_buffer_size
+        # entries are sorted in runs spilled to disk
+        redisdl.fingerprint_sort_buffer_size = 7
+        try:
+            redisdl.dumps(fingerprint_output=index, fingerprint_method=method)
+        finally:
+            redisdl.fingerprint_sort_buffer_size = buffer_size
+        self.assertTrue(index.getvalue().startswith(
+            ('{"version":2,"method":"%s"}\n' % method).encode('ascii')))
+        entries = list(redisdl.load_fingerprints(BytesIO(index.getvalue())))
+        self.assertEqual(sorted(('key:%d' % i).encode('ascii') for i in range(100)),
+            [entry[0] for entry in entries])
+        # truncated binary fingerprints
+        self.assertEqual(set([8]), set(len(entry[1]) for entry in entries))
+        expiring = [entry for entry in entries if entry[2]]
+        self.assertEqual([b'key:7'], [entry[0] for entry in expiring])
+
+        self.r.set('key:5', 'changed')
+        self.r.delete('key:50')
+        buffer_size = redisdl.fingerprint_sort_buffer_size
+        redisdl.fingerprint_sort_buffer_size = 7
+        try:
+            delta = json.loads(redisdl.dumps(delta_from=BytesIO(index.getvalue()),
+                fingerprint_method=method))
+        finally:
+            redisdl.fingerprint_sort_buffer_size = buffer_size
+        self.assertEqual({'key:5': {'type': 'string', 'value': 'changed'},
+            'key:50': {'type': 'none'}}, delta)
+
+    def test_value_index(self):
+        self.check_index('value')
+
+    @util.min_redis(4, 0)
+    def test_digest_index(self):
+        self.check_index('digest')
+
+    def test_digest_unavailable(self):
+        # as on redis 7, which disables DEBUG by default
+        pool = redis.ConnectionPool()
+        redisdl.client(connection_pool=pool).capabilities.have_digest_value = False
+        output = BytesIO()
+        self.assertRaises(TypeError, redisdl.dumps, connection_pool=pool,
+            fingerprint_output=output, fingerprint_method='digest')
+        self.assertEqual(b'', output.getvalue())
+
+    def test_invalid_index(self):
+        if redisdl.py3:
+            self.assertRaises(TypeError, redisdl.dumps,
+                fingerprint_output=StringIO())
+        self.assertRaises(ValueError, redisdl.dumps,
+            delta_from=BytesIO(b'{"method":"value","keys":{}}'))
+        self.r.set('key', 'value')
+        index = BytesIO()
+        redisdl.dumps(fingerprint_output=index)
+        self.assertRaises(ValueError, list, redisdl.load_fingerprints(
+            BytesIO(index.getvalue()[:-3])))
+
+    def test_load_tombstone(self):
+        self.r.set('key', 'value')
+        redisdl.loads('{"key":{"type":"none"}}')
+        self.assertEqual(0, self.r.exists('key'))
@@ -0,0 +1,80 @@
+import redis
+import redisdl
+import unittest
+import json
+import os.path
+import subprocess
+import sys
+from . import generate_data
+
+class EstimateTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+
+    def test_empty(self):
+        result = redisdl.estimate()
+        self.assertEqual(0, result['keys'])
+        self.assertEqual({}, result['types'])
+        self.assertEqual(0.0, result['duration'])
+
+    def test_small_data_set_is_exact(self):
+        self.r.set('a', 'xxxx')
+        self.r.set('b', 'yy')
+        self.r.rpush('c', '1', '2', '3')
+        result = redisdl.estimate()
+        self.assertEqual(3, result['keys'])
+        self.assertEqual(2, result['types']['string']['keys'])
+        self.assertEqual(3.0, result['types']['string']['cardinality'])
+        self.assertEqual(1, result['types']['list']['keys'])
+        self.assertEqual(3.0, result['types']['list']['cardinality'])
+        self.assertEqual(len(redisdl.dumps()), result['size'])
+
+    def test_filters(self):
+        self.r.set('a:1', 'x')
+        self.r.set('a:2', 'x')
+        self.r.set('b:1', 'x')
+        self.r.sadd('a:3', 'x')
+        result = redisdl.estimate(keys='a:*', exclude_keys='*:2', types='string')
+        self.assertEqual(1, result['keys'])
+        self.assertEqual(['string'], list(result['types'].keys()))
+
+    def test_sampled(self):
+        generate_data.DataGenerator(self.r, types=('string', 'hash')).insert(4000)
+        result = redisdl.estimate(sample_size=500, read_sample_size=50)
+        self.assertEqual(4000, result['keys'])
+        self.assertEqual(500, result['sampled_keys'])
+        self.assertEqual(50, result['read_keys'])
+        # types alternate, sampling error is well within these bounds
+        for type in ('string', 'hash'):
+            self.assertTrue(1400 < result['types'][type]['keys'] < 2600)
+        size = len(redisdl.dumps())
+        self.assertTrue(size / 2 < result['size'] < size * 2)
+        self.assertTrue(result['duration'] > 0)
+
+    def test_program(self):
+        self.r.set('a', 'x')
+        script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        output = subprocess.check_output([sys.executable, script, '--estimate'])
+        result = json.loads(output.decode('utf-8'))
+        self.assertEqual(1, result['keys'])
+
+    def test_program_ignored_options(self):
+        self.r.set('a', 'x')
+        script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        output = subprocess.check_output([sys.executable, script, '--estimate',
+            '-A', '-y'])
+        result = json.loads(output.decode('utf-8'))
+        self.assertEqual(1, result['keys'])
+
+    def test_round_trips(self):
+        for i in range(10):
+            self.r.set('key:%d' % i, 'x')
+        result = redisdl.estimate()
+        # TYPE, then WATCH, MULTI/EXEC and UNWATCH of the transaction
+        # reading each key
+        self.assertEqual(10, result['read_keys'])
+        self.assertTrue(result['read_round_trips'] >= 3 * result['read_keys'])
+        self.assertTrue(result['duration'] >=
+            result['round_trip'] * result['read_round_trips'])
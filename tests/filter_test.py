@@ -0,0 +1,206 @@
+import redis
+import redisdl
+import unittest
+import json
+import os.path
+import subprocess
+import sys
+
+class FilterTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+        self.r.set('user:1', 'a')
+        self.r.hmset('user:2', {'name': 'b'})
+        self.r.rpush('session:1', 'x')
+        self.r.set('session:tmp:1', 'y')
+        self.r.sadd('other', 'z')
+
+    def dump_keys(self, **kwargs):
+        return sorted(json.loads(redisdl.dumps(**kwargs)).keys())
+
+    def capped_pool(self, **capabilities):
+        # a pool whose server is presumed to lack some capabilities
+        pool = redis.ConnectionPool()
+        detected = redisdl.client(connection_pool=pool).capabilities
+        for name in capabilities:
+            setattr(detected, name, capabilities[name])
+        return pool
+
+    def test_multiple_patterns(self):
+        self.assertEqual(['session:1', 'session:tmp:1', 'user:1', 'user:2'],
+            self.dump_keys(keys=['user:*', 'session:*']))
+
+    def test_overlapping_patterns(self):
+        self.assertEqual(['session:1', 'user:1', 'user:2'],
+            self.dump_keys(keys=['user:*', 'user:?', 'se*n:1', 'nothing']))
+
+    def test_single_scan(self):
+        def scans():
+            stats = self.r.info('commandstats').get('cmdstat_scan')
+            return stats and stats['calls'] or 0
+        before = scans()
+        self.assertEqual(['session:1', 'user:2'], self.dump_keys(
+            keys=['user:*', 'session:*', 'x*'], types=['list', 'hash']))
+        # the keyspace fits in a single batch
+        self.assertEqual(before + 1, scans())
+
+    def test_exclude_keys(self):
+        self.assertEqual(['other', 'session:1', 'user:1', 'user:2'],
+            self.dump_keys(exclude_keys='session:tmp:*'))
+
+    def test_exclude_multiple_patterns(self):
+        self.assertEqual(['session:1'],
+            self.dump_keys(keys='session:*', exclude_keys=['*tmp*', 'user:*']))
+
+    def test_types(self):
+        self.assertEqual(['session:tmp:1', 'user:1'],
+            self.dump_keys(types='string'))
+        self.assertEqual(['other', 'session:1', 'user:2'],
+            self.dump_keys(types=['list', 'set', 'hash']))
+
+    def test_types_without_scan_type(self):
+        pool = self.capped_pool(have_scan_type=False)
+        self.assertEqual(['session:tmp:1', 'user:1'],
+            self.dump_keys(connection_pool=pool, types='string'))
+
+    def test_without_scan(self):
+        pool = self.capped_pool(have_scan=False, have_scan_type=False)
+        self.assertEqual(['session:1', 'user:1'],
+            self.dump_keys(connection_pool=pool, keys=['user:*', 'session:*'],
+                exclude_keys='session:tmp:*', types=['string', 'list']))
+
+    def test_streaming_dump(self):
+        import io
+        fp = io.StringIO()
+        redisdl.dump(fp, keys=['user:*', 'other'], types=['hash', 'set'])
+        self.assertEqual(['other', 'user:2'], sorted(json.loads(fp.getvalue())))
+
+    def test_invalid_type(self):
+        self.assertRaises(TypeError, redisdl.dumps, types='strings')
+
+    def test_copy(self):
+        target = redis.Redis(db=1)
+        for key in target.keys('*'):
+            target.delete(key)
+        for use_dump_restore in (True, False):
+            redisdl.copy(target_db=1, keys=['user:*', 'session:*'],
+                exclude_keys='user:1', types=['hash', 'string'],
+                use_dump_restore=use_dump_restore, empty=True)
+            self.assertEqual([b'session:tmp:1', b'user:2'], sorted(target.keys('*')))
+
+    def test_program(self):
+        script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        output = subprocess.check_output([sys.executable, script,
+            '-k', 'user:*', '-k', 'session:*', '-x', '*tmp*', '-t', 'list,hash'])
+        self.assertEqual(['session:1', 'user:2'],
+            sorted(json.loads(output.decode('utf-8'))))
+
+class GlobTest(unittest.TestCase):
+    def check(self, pattern, matching, not_matching):
+        regex = redisdl._compile_patterns([pattern])
+        for key in matching:
+            self.assertTrue(regex.match(key), '%r should match %r' % (pattern, key))
+        for key in not_matching:
+            self.assertFalse(regex.match(key), '%r should not match %r' % (pattern, key))
+
+    def test_wildcards(self):
+        self.check(b'a*b', [b'ab', b'axxb', b'a\nb'], [b'abc', b'xab'])
+        self.check(b'a?b', [b'axb'], [b'ab', b'axxb'])
+
+    def test_classes(self):
+        self.check(b'h[ae]llo', [b'hallo', b'hello'], [b'hillo', b'hllo'])
+        self.check(b'h[^e]llo', [b'hallo'], [b'hello'])
+        self.check(b'h[a-c]llo', [b'hbllo'], [b'hdllo'])
+        self.check(b'h[c-a]llo', [b'hbllo'], [b'hdllo'])
+
+    def test_escapes(self):
+        self.check(b'a\\*b', [b'a*b'], [b'axb'])
+        self.check(b'a.b+(c)', [b'a.b+(c)'], [b'axb+(c)'])
+
+    def test_bytes(self):
+        # ? matches a single byte, as in redis
+        self.check(u'é?'.encode('utf-8'), [u'éx'.encode('utf-8')],
+            [u'éé'.encode('utf-8')])
+
+class LoadFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        self.dump = json.dumps({
+            'user:1': {'type': 'string', 'value': 'a'},
+            'user:2': {'type': 'hash', 'value': {'name': 'b', 'nested': 'c'}},
+            'session:1': {'type': 'list', 'value': ['x', 'y']},
+            'session:tmp:1': {'type': 'string', 'value': 'y'},
+            # type given after the value
+            'other': {'value': ['z'], 'type': 'set'},
+        })
+
+    def loaded_keys(self, function, data=None, **kwargs):
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+        function(data or self.dump, **kwargs)
+        return sorted(key.decode('utf-8') for key in self.r.keys('*'))
+
+    def check(self, function, data=None):
+        self.assertEqual(['session:1', 'session:tmp:1', 'user:1', 'user:2'],
+            self.loaded_keys(function, data, keys=['user:*', 'session:*']))
+        self.assertEqual(['other', 'session:1', 'user:1', 'user:2'],
+            self.loaded_keys(function, data, exclude_keys='session:tmp:*'))
+        self.assertEqual(['other', 'user:2'],
+            self.loaded_keys(function, data, types=['hash', 'set']))
+        self.assertEqual(['session:1'], self.loaded_keys(function, data,
+            keys='session:*', exclude_keys='*tmp*', types='list'))
+        self.assertEqual([b'x', b'y'], self.r.lrange('session:1', 0, -1))
+
+    def test_loads(self):
+        self.check(redisdl.loads)
+
+    def test_load_streaming(self):
+        import io
+        self.check(lambda data, **kwargs: redisdl.load_streaming(
+            io.BytesIO(data.encode('utf-8')), **kwargs))
+
+    def test_load_streaming_events(self):
+        import io
+        self.check(lambda data, **kwargs: redisdl.load_streaming(
+            io.BytesIO(data.encode('utf-8')), streaming_backend='ijson-python',
+            **kwargs))
+
+    def test_load_mmap(self):
+        import tempfile
+        def load(data, **kwargs):
+            with tempfile.TemporaryFile() as f:
+                f.write(data.encode('utf-8'))
+                f.seek(0)
+                redisdl.load_mmap(f, **kwargs)
+        self.check(load)
+
+    def test_multiple_databases(self):
+        import io
+        data = json.dumps({'databases': {'0': json.loads(self.dump)}})
+        for backend in ('ijson', 'ijson-python'):
+            self.check(lambda data, **kwargs: redisdl.load_streaming(
+                io.BytesIO(data.encode('utf-8')), streaming_backend=backend,
+                **kwargs), data)
+
+    def test_skipped_events(self):
+        import io
+        ijson = redisdl.get_ijson('python')
+        key_filter = redisdl._KeyFilter('user:*', types='hash')
+        items = list(redisdl._ijson_event_items(ijson,
+            io.BytesIO(self.dump.encode('utf-8')), key_filter))
+        self.assertEqual([('user:2', {'type': 'hash',
+            'value': {'name': 'b', 'nested': 'c'}})], items)
+
+    def test_program(self):
+        import tempfile
+        script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+        with tempfile.NamedTemporaryFile(suffix='.json') as f:
+            f.write(self.dump.encode('utf-8'))
+            f.flush()
+            subprocess.check_call([sys.executable, script, '-l', f.name,
+                '-k', 'user:*', '-k', 'session:*', '-x', '*tmp*', '-t', 'list,hash'])
+        self.assertEqual([b'session:1', b'user:2'], sorted(self.r.keys('*')))
@@ -0,0 +1,208 @@
+import random
+import time as _time
+
+# a synthetic data set generator for large scale testing.
+#
+# unlike BigData, which issues one command per round trip on purpose
+# (race tests rely on it being slow), this module pipelines its inserts
+# and uses variadic commands so that multi-gigabyte fixtures can be built
+# in seconds. given the same seed and parameters the generated data set
+# is identical across runs; every key is generated by its own seeded
+# random number generator, so that it does not depend on which keys were
+# generated before.
+
+TYPES = ('string', 'list', 'set', 'zset', 'hash')
+
+# maximum number of elements sent in a single variadic command
+ELEMENTS_PER_COMMAND = 1000
+
+def parse_distribution(spec):
+    '''Parses a distribution specification into a function of a random
+    number generator returning a positive integer.
+
+    Supported specifications:
+
+    - ``N`` or ``fixed:N``: always N;
+    - ``uniform:LOW:HIGH``: uniformly distributed between LOW and HIGH
+      inclusive;
+    - ``exponential:MEAN``: exponentially distributed with the given mean.
+    '''
+
+    parts = str(spec).split(':')
+    try:
+        if len(parts) == 1:
+            value = int(parts[0])
+            return lambda rng: value
+        kind, args = parts[0], [int(part) for part in parts[1:]]
+    except ValueError:
+        raise ValueError('Invalid distribution: %s' % spec)
+    if kind == 'fixed' and len(args) == 1:
+        value = args[0]
+        return lambda rng: value
+    elif kind == 'uniform' and len(args) == 2:
+        low, high = args
+        return lambda rng: rng.randint(low, high)
+    elif kind == 'exponential' and len(args) == 1:
+        rate = 1.0 / args[0]
+        return lambda rng: max(1, int(rng.expovariate(rate)))
+    raise ValueError('Invalid distribution: %s' % spec)
+
+class DataGenerator(object):
+    def __init__(self, r, seed=0, types=TYPES, value_size='16',
+        cardinality='uniform:1:16', ttl_fraction=0, prefix='key:',
+        batch_size=1000,
+    ):
+        self.r = r
+        self.seed = seed
+        self.types = tuple(types)
+        self.value_size = parse_distribution(value_size)
+        self.cardinality = parse_distribution(cardinality)
+        self.ttl_fraction = ttl_fraction
+        self.prefix = prefix
+        self.batch_size = batch_size
+
+        # values are slices of a seeded pool of printable characters,
+        # which is much faster than generating each value separately.
+        # the pool is never modified
+        pool_rng = random.Random(seed)
+        alphabet = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789'
+        self.pool = ''.join(pool_rng.choice(alphabet) for i in range(1 << 16))
+
+    def key_rng(self, i):
+        return random.Random(self.seed * (1 << 32) + i)
+
+    def value(self, rng):
+        return self.values(rng, 1)[0]
+
+    def values(self, rng, count):
+        # one size and one offset per collection; elements are consecutive
+        # slices of the pool
+        size = self.value_size(rng)
+        offset = rng.randrange(len(self.pool))
+        return [self.slice(start % len(self.pool), size) for start in
+            range(offset, offset + count * 7, 7)]
+
+    def slice(self, start, size):
+        pool = self.pool
+        if start + size > len(pool):
+            # wraps around, as many times as the size requires
+            pool = pool * -(-(start + size) // len(pool))
+        return pool[start:start + size]
+
+    def records(self, count):
+        '''Generates (key, type, ttl, value) tuples, like redisdl's reader.
+
+        Values are in the shape used by redisdl dumps.
+        '''
+
+        for i in range(count):
+            rng = self.key_rng(i)
+            key = '%s%d' % (self.prefix, i)
+            type = self.types[i % len(self.types)]
+            if type == 'string':
+                value = self.value(rng)
+            else:
+                cardinality = self.cardinality(rng)
+                values = self.values(rng, cardinality)
+                if type == 'list':
+                    value = values
+                elif type == 'set':
+                    # member index guarantees requested cardinality
+                    value = ['%d-%s' % item for item in enumerate(values)]
+                elif type == 'zset':
+                    value = [('%d-%s' % (j, element), float(j))
+                        for j, element in enumerate(values)]
+                else:
+                    value = dict(('f%d' % j, element)
+                        for j, element in enumerate(values))
+            if self.ttl_fraction and rng.random() < self.ttl_fraction:
+                ttl = rng.randint(3600, 86400)
+            else:
+                ttl = None
+            yield key, type, ttl, value
+
+    def commands(self, count):
+        for key, type, ttl, value in self.records(count):
+            if type == 'string':
+                yield ('SET', key, value)
+            elif type == 'list':
+                for chunk in chunks(value):
+                    yield ('RPUSH', key) + tuple(chunk)
+            elif type == 'set':
+                for chunk in chunks(value):
+                    yield ('SADD', key) + tuple(chunk)
+            elif type == 'zset':
+                for chunk in chunks(value):
+                    args = ['ZADD', key]
+                    for member, score in chunk:
+                        args.extend((repr(score), member))
+                    yield args
+            else:
+                items = list(value.items())
+                for chunk in chunks(items):
+                    args = ['HMSET', key]
+                    for item in chunk:
+                        args.extend(item)
+                    yield args
+            if ttl is not None:
+                yield ('EXPIRE', key, str(ttl))
+
+    def insert(self, count=100000):
+        # commands are packed here rather than by redis-py, whose
+        # per-command packing dominates the insertion time otherwise
+        connection = self.r.connection_pool.get_connection('generate')
+        try:
+            batch = []
+            for command in self.commands(count):
+                batch.append(pack_command(command))
+                if len(batch) == self.batch_size:
+                    self.send(connection, batch)
+                    batch = []
+            if batch:
+                self.send(connection, batch)
+        finally:
+            self.r.connection_pool.release(connection)
+
+    def send(self, connection, batch):
+        connection.send_packed_command([b''.join(batch)])
+        for i in range(len(batch)):
+            connection.read_response()
+
+def pack_command(args):
+    # generated data is ascii, so character and byte lengths are the same
+    return ('*%d\r\n%s' % (len(args), ''.join(['$%d\r\n%s\r\n' % (len(arg), arg)
+        for arg in args]))).encode('ascii')
+
+def chunks(values, size=ELEMENTS_PER_COMMAND):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+def main():
+    import optparse
+    import redis
+
+    parser = optparse.OptionParser(usage="Usage: %prog [options]\n\n"
+        "Fill redis with a deterministic synthetic data set.")
+    parser.add_option('-H', '--host', default='localhost', help='connect to HOST (default localhost)')
+    parser.add_option('-p', '--port', default=6379, type='int', help='connect to PORT (default 6379)')
+    parser.add_option('-d', '--db', default=0, type='int', help='fill DATABASE (0-N, default 0)')
+    parser.add_option('-n', '--count', default=100000, type='int', help='number of keys to create (default 100000)')
+    parser.add_option('-S', '--seed', default=0, type='int', help='random seed (default 0)')
+    parser.add_option('-t', '--types', default=','.join(TYPES), help='comma-separated key types to create (default all)')
+    parser.add_option('-v', '--value-size', default='16', help='value size distribution (default 16)')
+    parser.add_option('-c', '--cardinality', default='uniform:1:16', help='collection cardinality distribution (default uniform:1:16)')
+    parser.add_option('-T', '--ttl-fraction', default=0, type='float', help='fraction of keys to set a TTL on (default 0)')
+    parser.add_option('-P', '--prefix', default='key:', help='key name prefix (default key:)')
+    options, args = parser.parse_args()
+
+    r = redis.Redis(host=options.host, port=options.port, db=options.db)
+    generator = DataGenerator(r, seed=options.seed,
+        types=options.types.split(','), value_size=options.value_size,
+        cardinality=options.cardinality, ttl_fraction=options.ttl_fraction,
+        prefix=options.prefix)
+    start = _time.time()
+    generator.insert(options.count)
+    print('Inserted %d keys in %.2f seconds' % (options.count, _time.time() - start))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+import redis
+import redisdl
+import unittest
+import json
+from . import generate_data
+
+class GenerateDataTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+
+    def test_parse_distribution(self):
+        import random
+        rng = random.Random(0)
+        self.assertEqual(5, generate_data.parse_distribution('5')(rng))
+        self.assertEqual(5, generate_data.parse_distribution('fixed:5')(rng))
+        for i in range(100):
+            value = generate_data.parse_distribution('uniform:2:4')(rng)
+            self.assertTrue(2 <= value <= 4)
+            value = generate_data.parse_distribution('exponential:10')(rng)
+            self.assertTrue(value >= 1)
+        self.assertRaises(ValueError, generate_data.parse_distribution, 'normal:1')
+
+    def test_insert_all_types(self):
+        generator = generate_data.DataGenerator(self.r, seed=1,
+            cardinality='fixed:3', ttl_fraction=0.5)
+        generator.insert(100)
+        self.assertEqual(100, len(self.r.keys('*')))
+        for i, type in enumerate(generate_data.TYPES):
+            self.assertEqual(type, self.r.type('key:%d' % i).decode('ascii'))
+        self.assertEqual(3, self.r.llen('key:1'))
+        self.assertEqual(3, self.r.scard('key:2'))
+        self.assertEqual(3, self.r.zcard('key:3'))
+        self.assertEqual(3, self.r.hlen('key:4'))
+
+    def test_deterministic(self):
+        generate_data.DataGenerator(self.r, seed=7).insert(50)
+        first = json.loads(redisdl.dumps())
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+        generate_data.DataGenerator(self.r, seed=7).insert(50)
+        second = json.loads(redisdl.dumps())
+        self.assertEqual(first, second)
+
+    def test_records_match_inserted_data(self):
+        generator = generate_data.DataGenerator(self.r, seed=3)
+        generator.insert(20)
+        actual = json.loads(redisdl.dumps())
+        for key, type, ttl, value in generator.records(20):
+            self.assertEqual(type, actual[key]['type'])
+            if type in ('list', 'string', 'hash'):
+                self.assertEqual(value, actual[key]['value'])
+            elif type == 'set':
+                self.assertEqual(sorted(value), sorted(actual[key]['value']))
+            else:
+                self.assertEqual(sorted([list(item) for item in value]),
+                    sorted(actual[key]['value']))
+
+    def test_records_do_not_depend_on_order(self):
+        generator = generate_data.DataGenerator(self.r, seed=5,
+            value_size='uniform:1:100000')
+        expected = list(generate_data.DataGenerator(None, seed=5,
+            value_size='uniform:1:100000').records(20))
+        generator.insert(20)
+        self.assertEqual(expected, list(generator.records(20)))
+        self.assertEqual(expected[:10], list(generator.records(10)))
+
+    def test_zset_value_size(self):
+        generator = generate_data.DataGenerator(None, types=('zset',),
+            value_size='fixed:20', cardinality='fixed:3')
+        for key, type, ttl, value in generator.records(2):
+            for member, score in value:
+                self.assertEqual(20, len(member.split('-', 1)[1]))
+
+    def test_large_values(self):
+        generator = generate_data.DataGenerator(None, types=('string', 'list'),
+            value_size='fixed:%d' % (3 << 20), cardinality='fixed:2')
+        for key, type, ttl, value in generator.records(2):
+            if type == 'string':
+                value = [value]
+            self.assertEqual([3 << 20] * len(value), [len(v) for v in value])
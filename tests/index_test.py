@@ -0,0 +1,192 @@
+import redis
+import redisdl
+import unittest
+import json
+import io
+import os.path
+import shutil
+import subprocess
+import sys
+import tempfile
+
+class IndexTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for db in (0, 1):
+            r = redis.Redis(db=db)
+            for key in r.keys('*'):
+                r.delete(key)
+        self.r.set('user:1', 'a')
+        self.r.hmset('user:2', {'name': 'b'})
+        self.r.rpush('session:1', 'x', 'y')
+        self.r.set('session:2', u'é')
+        self.r.expire('session:2', 3600)
+        self.r.sadd('other', 'z')
+
+    def indexed_dump(self, **kwargs):
+        fp = io.BytesIO()
+        index = io.BytesIO()
+        redisdl.dump(fp, index_output=index, **kwargs)
+        fp.seek(0)
+        index.seek(0)
+        return fp, index
+
+    def reload(self, fp, index, **kwargs):
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+        fp.seek(0)
+        index.seek(0)
+        redisdl.load_indexed(fp, index, **kwargs)
+        return sorted(key.decode('utf-8') for key in self.r.keys('*'))
+
+    def test_offsets(self):
+        fp, index = self.indexed_dump()
+        data = fp.getvalue()
+        index = redisdl.load_index(index)
+        self.assertEqual('keys', index.mode)
+        entries = list(index.scan())
+        # entries are sorted by key
+        self.assertEqual(['other', 'session:1', 'session:2', 'user:1', 'user:2'],
+            [entry[0] for entry in entries])
+        table = json.loads(data.decode('utf-8'))
+        for key, db, offset, length in entries:
+            self.assertEqual(None, db)
+            member = json.loads('{' + data[offset:offset + length].decode('utf-8') + '}')
+            self.assertEqual([key], list(member.keys()))
+            self.assertEqual(table[key]['value'], member[key]['value'])
+
+    def test_load_keys(self):
+        fp, index = self.indexed_dump()
+        self.assertEqual(['session:1', 'session:2', 'user:1'],
+            self.reload(fp, index, keys=['session:*', 'user:1']))
+        self.assertEqual([b'x', b'y'], self.r.lrange('session:1', 0, -1))
+        self.assertEqual(u'é'.encode('utf-8'), self.r.get('session:2'))
+        self.assertTrue(self.r.ttl('session:2') > 0)
+
+    def test_load_exclude_keys_and_types(self):
+        fp, index = self.indexed_dump()
+        self.assertEqual(['other', 'user:2'],
+            self.reload(fp, index, exclude_keys='session:*', types=['hash', 'set']))
+
+    def test_hashes(self):
+        fp, index = self.indexed_dump(index_mode='hashes', index_block_size=40)
+        reader = redisdl.load_index(index)
+        # small blocks hold a key or two each
+        self.assertTrue(len(reader.blocks) > 1)
+        hashes = [entry[0] for entry in reader.scan()]
+        self.assertEqual(5, len(hashes))
+        self.assertEqual(sorted(hashes), hashes)
+        self.assertEqual(['user:1', 'user:2'],
+            self.reload(fp, index, keys=['user:1', 'user:2', 'missing']))
+        self.assertEqual(['session:1', 'session:2'],
+            self.reload(fp, index, keys='session:*'))
+
+    def test_hashes_escaped_pattern(self):
+        self.r.set('a*', '1')
+        fp, index = self.indexed_dump(index_mode='hashes')
+        self.assertEqual(['a*'], self.reload(fp, index, keys='a\\*'))
+
+    def test_all_dbs(self):
+        redis.Redis(db=1).set('one', '1')
+        fp, index = self.indexed_dump(all_dbs=True, index_mode='hashes')
+        blocks = redisdl.load_index(index).blocks
+        # other databases may hold keys of other tests
+        self.assertEqual([0, 1], [block[0] for block in blocks if block[0] < 2])
+        redis.Redis(db=1).delete('one')
+        self.assertEqual(['user:1'], self.reload(fp, index, keys=['user:1', 'one']))
+        self.assertEqual(b'1', redis.Redis(db=1).get('one'))
+
+    def test_pages(self):
+        page_size = redisdl.index_page_size
+        buffer_size = redisdl.index_sort_buffer_size
+        redisdl.index_page_size = 100
+        redisdl.index_sort_buffer_size = 50
+        try:
+            for mode in redisdl.index_modes:
+                # keys of several databases share names, and spread over pages
+                for db in (0, 1):
+                    r = redis.Redis(db=db)
+                    for i in range(200):
+                        r.set('key:%03d' % i, '%d:%d' % (db, i))
+                fp, index = self.indexed_dump(all_dbs=True, index_mode=mode,
+                    keys='key:*', index_block_size=100)
+                reader = redisdl.load_index(index)
+                self.assertTrue(len(reader.pages) > 10)
+                entries = list(reader.scan())
+                self.assertEqual(400, len(entries))
+                keys = [entry[0] for entry in entries]
+                self.assertEqual(sorted(keys), keys)
+                index.seek(0)
+                for db in (0, 1):
+                    redis.Redis(db=db).flushdb()
+                redisdl.load_indexed(fp, index, keys=['key:007', 'key:19*'])
+                for db in (0, 1):
+                    r = redis.Redis(db=db)
+                    self.assertEqual(['key:007'] + ['key:19%d' % i for i in range(10)],
+                        sorted(key.decode('ascii') for key in r.keys('*')))
+                    self.assertEqual(('%d:7' % db).encode('ascii'), r.get('key:007'))
+        finally:
+            redisdl.index_page_size = page_size
+            redisdl.index_sort_buffer_size = buffer_size
+
+    def test_lookup(self):
+        for i in range(1000):
+            self.r.set('key:%d' % i, 'x')
+        page_size = redisdl.index_page_size
+        redisdl.index_page_size = 100
+        try:
+            fp, index = self.indexed_dump()
+            reader = redisdl.load_index(index)
+            pages = []
+            page_entries = reader.page_entries
+            def counted_page_entries(page):
+                pages.append(page)
+                return page_entries(page)
+            reader.page_entries = counted_page_entries
+            # a literal key reads a page or two of entries
+            self.assertEqual(['key:500'],
+                [entry[0] for entry in reader.lookup('key:500')])
+            self.assertTrue(len(pages) <= 2)
+            self.assertEqual([], list(reader.lookup('key:5000')))
+            del pages[:]
+            self.assertEqual(111, len(list(reader.scan('key:5'))))
+            self.assertTrue(len(pages) < len(reader.pages) / 5)
+        finally:
+            redisdl.index_page_size = page_size
+
+    def test_offset_from_start(self):
+        fp = io.BytesIO()
+        fp.write(b'header')
+        index = io.BytesIO()
+        redisdl.dump(fp, index_output=index, keys='user:1')
+        fp.seek(len(b'header'))
+        index.seek(0)
+        self.r.delete('user:1')
+        redisdl.load_indexed(fp, index)
+        self.assertEqual(b'a', self.r.get('user:1'))
+
+    def test_invalid(self):
+        self.assertRaises(TypeError, redisdl.dump, io.StringIO(),
+            pretty=True, index_output=io.StringIO())
+        self.assertRaises(TypeError, redisdl.dump, io.StringIO(),
+            index_output=io.StringIO(), index_mode='offsets')
+        self.assertRaises(ValueError, redisdl.load_indexed, io.BytesIO(b'{}'),
+            io.BytesIO(b'{"method":"value","keys":{}}'))
+        self.assertRaises(ValueError, redisdl.load_indexed, io.BytesIO(b'{}'),
+            io.BytesIO(b'{"version":1,"mode":"keys","entries":[]}'))
+
+    def test_program(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'dump.json')
+            index_path = os.path.join(directory, 'dump.idx')
+            script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+            subprocess.check_call([sys.executable, script, '-o', path,
+                '--index', index_path, '--index-mode', 'hashes'])
+            for key in self.r.keys('*'):
+                self.r.delete(key)
+            subprocess.check_call([sys.executable, script, '-l', path,
+                '--index', index_path, '-k', 'user:2', '-k', 'other'])
+            self.assertEqual([b'other', b'user:2'], sorted(self.r.keys('*')))
+        finally:
+            shutil.rmtree(directory)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+import redis
+import redisdl
+import unittest
+import json
+import io
+
+class LongStringTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for db in (0, 1):
+            r = redis.Redis(db=db)
+            for key in r.keys('*'):
+                r.delete(key)
+        self.chunk_size = redisdl.string_chunk_size
+        redisdl.string_chunk_size = 10
+        # two byte characters straddle chunks
+        self.value = u'aé"\\\n' * 7 + u'фист'
+        self.r.set('long', self.value)
+        self.r.expire('long', 3600)
+        self.r.set('short', u'é')
+
+    def tearDown(self):
+        redisdl.string_chunk_size = self.chunk_size
+
+    def calls(self, command):
+        stats = self.r.info(b'commandstats')
+        return stats.get('cmdstat_' + command, {}).get('calls', 0)
+
+    def test_dump(self):
+        self.r.execute_command('CONFIG RESETSTAT')
+        fp = io.StringIO()
+        redisdl.dump(fp)
+        table = json.loads(fp.getvalue())
+        self.assertEqual(self.value, table['long']['value'])
+        self.assertTrue(table['long']['ttl'] > 3500)
+        self.assertEqual(u'é', table['short']['value'])
+        length = len(self.value.encode('utf-8'))
+        # a first range of each string tells whether it is long
+        self.assertEqual(2 + (length + 9) // 10, self.calls('getrange'))
+
+    def test_dumps(self):
+        table = json.loads(redisdl.dumps(pretty=True))
+        self.assertEqual(self.value, table['long']['value'])
+
+    def test_iter_dump(self):
+        records = dict((record.key, record) for record in redisdl.iter_dump())
+        self.assertEqual(self.value, records['long'].value)
+
+    def test_load(self):
+        dump = redisdl.dumps()
+        self.r.delete('long')
+        self.r.execute_command('CONFIG RESETSTAT')
+        redisdl.loads(dump)
+        self.assertEqual(self.value.encode('utf-8'), self.r.get('long'))
+        self.assertTrue(self.r.ttl('long') > 3500)
+        # the value is written in chunks of characters
+        self.assertEqual((len(self.value) + 9) // 10 - 1, self.calls('append'))
+
+    def test_load_raw(self):
+        dump = redisdl.dumps()
+        redisdl.loads(dump, db=1, writer_backend='raw')
+        self.assertEqual(self.value.encode('utf-8'), redis.Redis(db=1).get('long'))
+
+    def test_copy(self):
+        redisdl.copy(target_db=1, use_dump_restore=False)
+        self.assertEqual(self.value.encode('utf-8'), redis.Redis(db=1).get('long'))
+        self.assertTrue(redis.Redis(db=1).ttl('long') > 3500)
+
+    def test_resp(self):
+        fp = io.BytesIO()
+        redisdl.dump(fp, format='resp')
+        self.assertTrue(b'APPEND' in fp.getvalue())
+        fp.seek(0)
+        redisdl.load_resp(fp, db=1)
+        self.assertEqual(self.value.encode('utf-8'), redis.Redis(db=1).get('long'))
+
+    def round_trips(self):
+        r = redisdl.client(connection_pool=redis.ConnectionPool())
+        round_trips = redisdl._count_round_trips(r)
+        records = dict((record.key, record)
+            for record in redisdl.iter_dump(client=r, keys='long'))
+        self.assertEqual(self.value, records['long'].value)
+        return round_trips[0]
+
+    def test_batches(self):
+        chunks = (len(self.value.encode('utf-8')) + 9) // 10
+        batch_chunks = redisdl.string_batch_chunks
+        try:
+            redisdl.string_batch_chunks = 1
+            unbatched = self.round_trips()
+            redisdl.string_batch_chunks = 2
+            self.assertEqual(unbatched - chunks // 2, self.round_trips())
+            redisdl.loads(redisdl.dumps(), db=1)
+        finally:
+            redisdl.string_batch_chunks = batch_chunks
+        self.assertEqual(self.value.encode('utf-8'), redis.Redis(db=1).get('long'))
+
+    def test_modified_while_read(self):
+        r = redisdl.client()
+        getrange = r.pipeline().__class__.getrange
+        modified = []
+        def modify(p, key, start, end):
+            if not modified:
+                # another client appends to the string, the read is retried
+                self.r.append('long', 'x')
+                modified.append(True)
+            return getrange(p, key, start, end)
+        r.pipeline().__class__.getrange = modify
+        try:
+            records = dict((record.key, record)
+                for record in redisdl.iter_dump(client=r))
+        finally:
+            r.pipeline().__class__.getrange = getrange
+        self.assertEqual(self.value + 'x', records['long'].value)
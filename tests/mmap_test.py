@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+import redis
+import redisdl
+import unittest
+import json
+import os
+import tempfile
+
+class MmapTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+        self.window_size = redisdl.mmap_window_size
+
+    def tearDown(self):
+        redisdl.mmap_window_size = self.window_size
+
+    def write(self, text, encoding='utf-8'):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(text.encode(encoding))
+        self.addCleanup(os.unlink, path)
+        return path
+
+    def load(self, text, function=redisdl.load_mmap, **kwargs):
+        with open(self.write(text, kwargs.get('encoding', 'utf-8')), 'rb') as f:
+            function(f, **kwargs)
+
+    def table(self):
+        return {
+            'string': {'type': 'string', 'value': u'фист' * 50},
+            'list': {'type': 'list', 'value': ['%d' % i for i in range(300)]},
+            'hash': {'type': 'hash', 'value': {'a': u'é', 'b': '2'}},
+            'number': {'type': 'zset', 'value': [['m', 1.5]]},
+        }
+
+    def test_load(self):
+        table = self.table()
+        self.load(json.dumps(table, indent=2))
+        self.assertEqual(table, json.loads(redisdl.dumps()))
+
+    def test_small_window(self):
+        # values span many windows, and characters are split between them
+        redisdl.mmap_window_size = 7
+        table = self.table()
+        self.load(json.dumps(table, ensure_ascii=False))
+        self.assertEqual(table, json.loads(redisdl.dumps()))
+
+    def test_multiple_databases(self):
+        redisdl.mmap_window_size = 16
+        self.load(json.dumps({'databases': {
+            '0': {'a': {'type': 'string', 'value': 'x'}},
+            '1': {'b': {'type': 'string', 'value': 'y'}},
+        }}))
+        self.assertEqual(b'x', self.r.get('a'))
+        self.assertEqual(b'y', redis.Redis(db=1).get('b'))
+
+    def test_empty_dump(self):
+        self.r.set('stale', 'value')
+        self.load(' { } ', empty=True)
+        self.assertEqual([], self.r.keys('*'))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, self.load, '{"a": {"type": "string", "value": "x"} "b"')
+        self.assertRaises(ValueError, self.load, '[]')
+
+    def test_load_lump_maps_files(self):
+        table = self.table()
+        loaded = []
+        original = redisdl.load_mmap
+        def load_mmap(*args, **kwargs):
+            loaded.append(True)
+            return original(*args, **kwargs)
+        redisdl.load_mmap = load_mmap
+        try:
+            self.load(json.dumps(table), function=redisdl.load_lump)
+        finally:
+            redisdl.load_mmap = original
+        self.assertEqual([True], loaded)
+        self.assertEqual(table, json.loads(redisdl.dumps()))
+
+    def test_encoding(self):
+        # characters of the file are in the given encoding
+        redisdl.mmap_window_size = 7
+        table = {'é': {'type': 'string', 'value': u'aéb' * 10}}
+        self.load(json.dumps(table, ensure_ascii=False), encoding='latin-1')
+        self.assertEqual(u'aéb'.encode('latin-1') * 10, self.r.get(u'é'.encode('latin-1')))
+
+    def test_unmappable_encoding(self):
+        table = {'key': {'type': 'string', 'value': u'é'}}
+        self.assertRaises(TypeError, self.load, json.dumps(table),
+            encoding='utf-16')
+        # loaded as a whole instead
+        self.load(json.dumps(table), function=redisdl.load_lump,
+            encoding='utf-16')
+        self.assertEqual(u'é'.encode('utf-16'), self.r.get(u'key'.encode('utf-16')))
@@ -297,3 +297,54 @@ class ModuleTest(unittest.TestCase):
         actual = json.loads(fp.getvalue().decode())
 
         self.assertEqual(actual['a']['value'], 'aaa')
+
+    def test_dumps_with_client(self):
+        import redis
+        self.r.set('key', 'value')
+        dump = redisdl.dumps(client=redis.Redis())
+        actual = json.loads(dump)
+        expected = {'key': {'type': 'string', 'value': 'value'}}
+        self.assertEqual(expected, actual)
+
+    def test_loads_with_connection_pool(self):
+        import redis
+        pool = redis.ConnectionPool()
+        dump = '{"key":{"type":"list","value":["a","b"]}}'
+        redisdl.loads(dump, connection_pool=pool)
+        self.assertEqual([util.b('a'), util.b('b')], self.r.lrange('key', 0, -1))
+
+    def test_capabilities_cached_per_pool(self):
+        import redis
+        pool = redis.ConnectionPool()
+        first = redisdl.client(connection_pool=pool)
+        second = redisdl.client(connection_pool=pool)
+        self.assertTrue(first.capabilities is second.capabilities)
+        other = redisdl.client()
+        self.assertFalse(first.capabilities is other.capabilities)
+        self.assertTrue(first.have_pttl in (True, False))
+
+    def test_load_large_collections(self):
+        values = ['value-%d' % i for i in range(2500)]
+        dump = json.dumps({
+            'l': {'type': 'list', 'value': values},
+            's': {'type': 'set', 'value': values},
+            'z': {'type': 'zset', 'value': [[v, i] for i, v in enumerate(values)]},
+        })
+        redisdl.loads(dump)
+        self.assertEqual(2500, self.r.llen('l'))
+        self.assertEqual(util.b('value-2499'), self.r.lindex('l', -1))
+        self.assertEqual(2500, self.r.scard('s'))
+        self.assertEqual(2500, self.r.zcard('z'))
+        self.assertEqual(2499, self.r.zscore('z', 'value-2499'))
+
+    if redisdl.have_ijson:
+        def test_ijson_items_match_events(self):
+            path = os.path.join(os.path.dirname(__file__), 'fixtures', 'dump.json')
+            with open(path, 'rb') as f:
+                data = f.read()
+            ijson = redisdl.get_ijson(None)
+            expected = list(redisdl._ijson_event_items(ijson, BytesIO(data)))
+            actual = list(redisdl.ijson_top_level_items(BytesIO(data), None))
+            self.assertEqual(expected, actual)
+            self.assertEqual(sorted(json.loads(data.decode('utf-8'))),
+                sorted(key for key, item in actual))
@@ -0,0 +1,112 @@
+import redis
+import redisdl
+import unittest
+import json
+import io
+import os.path
+import subprocess
+import sys
+import tempfile
+
+class ProfileTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for db in (0, 1):
+            r = redis.Redis(db=db)
+            for key in r.keys('*'):
+                r.delete(key)
+        self.r.set('user:1', 'x' * 100)
+        self.r.set('user:2', 'y')
+        self.r.rpush('queue:jobs', *range(100))
+        self.r.hmset('config', {'a': 'b'})
+        self.r.sadd('session:1:tags', 'a', 'b', 'c')
+        self.r.expire('session:1:tags', 30)
+        self.r.set('cache:1', 'c')
+        self.r.expire('cache:1', 7200)
+
+    def profile(self, function=redisdl.dumps, *args, **kwargs):
+        output = io.StringIO()
+        function(*args, profile_output=output, **kwargs)
+        return json.loads(output.getvalue())
+
+    def test_profile(self):
+        profile = self.profile()
+        self.assertEqual(6, profile['keys'])
+        self.assertTrue(profile['memory'] > 0)
+        self.assertEqual(3, profile['types']['string']['keys'])
+        self.assertEqual(102, profile['types']['string']['elements'])
+        self.assertEqual({'1': 2, '128': 1}, profile['types']['string']['cardinality'])
+        self.assertEqual({'4': 1}, profile['types']['set']['cardinality'])
+        self.assertEqual(['', 'cache', 'queue', 'session', 'user'],
+            sorted(profile['prefixes'].keys()))
+        self.assertEqual(2, profile['prefixes']['user']['keys'])
+        self.assertEqual({'none': 4, '1m': 1, '1h': 0, '1d': 1, '1w': 0, 'longer': 0},
+            profile['ttl'])
+        biggest = profile['biggest']
+        self.assertEqual(6, len(biggest))
+        self.assertEqual(sorted(biggest, key=lambda entry: -entry['memory']), biggest)
+        self.assertEqual({'db': None, 'key': 'queue:jobs', 'type': 'list',
+            'memory': biggest[0]['memory'], 'cardinality': 100},
+            [entry for entry in biggest if entry['key'] == 'queue:jobs'][0])
+        self.assertEqual(profile['memory'],
+            sum(stats['memory'] for stats in profile['types'].values()))
+
+    def test_batches(self):
+        expected = self.profile()
+        size = redisdl.profile_batch_size
+        redisdl.profile_batch_size = 2
+        try:
+            self.assertEqual(expected, self.profile())
+        finally:
+            redisdl.profile_batch_size = size
+
+    def test_options(self):
+        depth = redisdl.profile_prefix_depth
+        top = redisdl.profile_top_keys
+        redisdl.profile_prefix_depth = 2
+        redisdl.profile_top_keys = 2
+        try:
+            profile = self.profile()
+        finally:
+            redisdl.profile_prefix_depth = depth
+            redisdl.profile_top_keys = top
+        self.assertTrue('session:1' in profile['prefixes'])
+        self.assertEqual(2, len(profile['biggest']))
+
+    def test_without_memory_usage(self):
+        r = redisdl.client()
+        r.capabilities.have_memory_usage = False
+        profile = self.profile(client=r)
+        self.assertEqual(None, profile['memory'])
+        self.assertEqual(None, profile['types']['list']['memory'])
+        # both have 100 elements
+        self.assertEqual(['queue:jobs', 'user:1'],
+            sorted(entry['key'] for entry in profile['biggest'][:2]))
+
+    def test_dump(self):
+        expected = self.profile()
+        self.assertEqual(expected, self.profile(redisdl.dump, io.StringIO()))
+        self.assertEqual(expected, self.profile(redisdl.dump, io.BytesIO(),
+            format='resp'))
+
+    def test_all_dbs(self):
+        redis.Redis(db=1).set('one', '1')
+        # other databases might hold keys of other tests
+        profile = self.profile(all_dbs=True, keys=['one', 'user:*'])
+        self.assertEqual([(0, 'user:1'), (0, 'user:2'), (1, 'one')],
+            sorted((entry['db'], entry['key']) for entry in profile['biggest']))
+
+    def test_program(self):
+        script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        f = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        f.close()
+        try:
+            subprocess.check_call([sys.executable, script, '-o', os.devnull,
+                '--profile', f.name, '-k', 'user:*'])
+            output = open(f.name)
+            profile = json.load(output)
+            output.close()
+            self.assertEqual({'user': 2}, dict((prefix, stats['keys'])
+                for prefix, stats in profile['prefixes'].items()))
+        finally:
+            os.unlink(f.name)
@@ -0,0 +1,267 @@
+import redis
+import redisdl
+import unittest
+import json
+import io
+import os.path
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+class RdbTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for db in (0, 1):
+            r = redis.Redis(db=db)
+            for key in r.keys('*'):
+                r.delete(key)
+        # small values get compact encodings, large ones regular encodings
+        self.r.set('string', 'a')
+        self.r.set('int', '12345')
+        self.r.set('negative', '-5')
+        self.r.set('compressed', 'x' * 1000)
+        self.r.set('unicode', u'фист')
+        self.r.rpush('list', 'a', 7, 1000, 100000, 10000000, 10 ** 12, -5, 'b' * 100)
+        self.r.rpush('long-list', *range(1000))
+        self.r.sadd('intset', 1, 2, -300000)
+        self.r.sadd('set', 'a', 'b')
+        self.r.sadd('large-set', *['m%d' % i for i in range(600)])
+        self.r.zadd('zset', 'a', 1.5, 'b', 2, 'c', -0.25)
+        self.r.zadd('large-zset', **dict(('m%d' % i, i / 3.0) for i in range(300)))
+        self.r.hmset('hash', {'f': 'v', 'g': '1'})
+        self.r.hmset('large-hash', dict(('f%d' % i, 'v' * (i % 70)) for i in range(300)))
+        self.r.set('expiring', 'e')
+        self.r.expire('expiring', 3600)
+
+    def save(self):
+        self.r.save()
+        config = self.r.config_get('dir')
+        config.update(self.r.config_get('dbfilename'))
+        return open(os.path.join(config['dir'], config['dbfilename']), 'rb')
+
+    def table(self, dump):
+        # expiration times jitter
+        table = json.loads(dump)
+        for item in table.values():
+            item['expiring'] = item.pop('ttl', None) is not None
+            item.pop('expireat', None)
+        return table
+
+    def test_dump(self):
+        expected = self.table(redisdl.dumps(pretty=True))
+        rdb = self.save()
+        output = io.StringIO()
+        redisdl.dump_rdb(rdb, output)
+        rdb.close()
+        table = self.table(output.getvalue())
+        for item in table.values():
+            if item['type'] == 'set':
+                item['value'].sort()
+        self.assertEqual(expected, table)
+
+    def test_pretty(self):
+        expected = self.table(redisdl.dumps(pretty=True))
+        rdb = self.save()
+        output = io.StringIO()
+        redisdl.dump_rdb(rdb, output, pretty=True)
+        rdb.close()
+        self.assertEqual(expected, self.table(output.getvalue()))
+
+    def test_iter_rdb(self):
+        rdb = self.save()
+        records = dict((record.key, record)
+            for record in redisdl.iter_rdb(rdb) if record.db == 0)
+        rdb.close()
+        self.assertEqual(('string', None, 'a', 0), records['string'][1:])
+        self.assertEqual(['a', '7', '1000', '100000', '10000000', '1000000000000',
+            '-5', 'b' * 100], records['list'].value)
+        self.assertEqual(['-300000', '1', '2'], sorted(records['intset'].value))
+        self.assertEqual([('c', -0.25), ('a', 1.5), ('b', 2.0)], records['zset'].value)
+        self.assertTrue(3590 < records['expiring'].ttl <= 3600)
+
+    def test_filters(self):
+        rdb = self.save()
+        records = redisdl.iter_rdb(rdb, keys=['l*', 'h*'], exclude_keys='list',
+            types='list')
+        self.assertEqual(['long-list'],
+            [record.key for record in records if record.db == 0])
+        rdb.close()
+
+    def test_expired(self):
+        rdb = self.save()
+        real_time = redisdl._time
+        class later(object):
+            @staticmethod
+            def time():
+                return real_time.time() + 7200
+        redisdl._time = later
+        try:
+            keys = [record.key for record in redisdl.iter_rdb(rdb)
+                if record.db == 0]
+        finally:
+            redisdl._time = real_time
+            rdb.close()
+        self.assertTrue('string' in keys)
+        self.assertFalse('expiring' in keys)
+
+    def test_all_dbs(self):
+        redis.Redis(db=1).set('one', '1')
+        rdb = self.save()
+        output = io.StringIO()
+        redisdl.dump_rdb(rdb, output, all_dbs=True)
+        rdb.close()
+        databases = json.loads(output.getvalue())['databases']
+        self.assertEqual({'one': {'type': 'string', 'value': '1'}}, databases['1'])
+        self.assertEqual(15, len(databases['0']))
+        rdb = self.save()
+        output = io.StringIO()
+        redisdl.dump_rdb(rdb, output, db=1)
+        rdb.close()
+        self.assertEqual(databases['1'], json.loads(output.getvalue()))
+
+    def test_load_records(self):
+        expected = self.table(redisdl.dumps(pretty=True))
+        rdb = self.save()
+        records = [record for record in redisdl.iter_rdb(rdb) if record.db == 0]
+        rdb.close()
+        redisdl.load_records(records, empty=True, db_map={0: 1})
+        self.assertEqual(expected, self.table(redisdl.dumps(db=1, pretty=True)))
+
+    def test_listpack(self):
+        # redis 7 encodings, which the server under test might not write
+        entries = [b'\x05', b'\x83abc', b'\xc1\x02', b'\xdf\xff', b'\xf1\x00\x80',
+            b'\xf2\xff\xff\x7f', b'\xf3\x00\x00\x00\x80',
+            b'\xf4' + struct.pack('<q', -10 ** 15), b'\xe0\x80' + b'x' * 128]
+        blob = b''
+        for entry in entries:
+            blob += entry + bytes(bytearray([len(entry)]))
+            if len(entry) >= 128:
+                blob += b'\x01'
+        blob = struct.pack('<IH', len(blob) + 7, len(entries)) + blob + b'\xff'
+        self.assertEqual([b'5', b'abc', b'258', b'-1', b'-32768', b'8388607',
+            b'-2147483648', b'-1000000000000000', b'x' * 128],
+            redisdl._listpack_entries(blob))
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, list, redisdl.iter_rdb(io.BytesIO(b'{}')))
+        rdb = self.save()
+        data = rdb.read()
+        rdb.close()
+        self.assertRaises(ValueError, list,
+            redisdl.iter_rdb(io.BytesIO(data[:len(data) // 2])))
+
+    def test_program(self):
+        script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        rdb = self.save()
+        output = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        output.close()
+        try:
+            subprocess.check_call([sys.executable, script, '--rdb', rdb.name,
+                '-k', 'large-*', '-o', output.name])
+            f = open(output.name)
+            keys = sorted(json.load(f).keys())
+            f.close()
+            self.assertEqual(['large-hash', 'large-set', 'large-zset'], keys)
+        finally:
+            rdb.close()
+            os.unlink(output.name)
+
+    def write(self, dump, **kwargs):
+        rdb = io.BytesIO()
+        redisdl.write_rdb(io.StringIO(dump), rdb, **kwargs)
+        return rdb.getvalue()
+
+    def test_write_rdb(self):
+        expected = self.table(redisdl.dumps(pretty=True))
+        data = self.write(redisdl.dumps())
+        output = io.StringIO()
+        redisdl.dump_rdb(io.BytesIO(data), output, pretty=True)
+        self.assertEqual(expected, self.table(output.getvalue()))
+
+    def test_write_rdb_databases(self):
+        redis.Redis(db=1).set('one', '1')
+        dump = json.dumps({'databases': {
+            '0': {'a': {'type': 'string', 'value': 'x'}},
+            '1': {'b': {'type': 'set', 'value': ['y']},
+                  'gone': {'type': 'none'},
+                  'expired': {'type': 'string', 'value': 'z', 'ttl': -1}},
+        }})
+        records = list(redisdl.iter_rdb(io.BytesIO(self.write(dump,
+            db_map={1: 4}, key_prefix='p:'))))
+        self.assertEqual([(0, 'p:a', 'x'), (4, 'p:b', ['y'])],
+            [(record.db, record.key, record.value) for record in records])
+        records = list(redisdl.iter_rdb(io.BytesIO(self.write(
+            redisdl.dumps(), db=3, keys='s*'))))
+        self.assertEqual([(3, 'set'), (3, 'string')],
+            sorted((record.db, record.key) for record in records))
+
+    def test_write_rdb_merged_databases(self):
+        dump = json.dumps({'databases': {
+            '0': {'a': {'type': 'string', 'value': 'x'}},
+            '1': {'a': {'type': 'string', 'value': 'y'}},
+        }})
+        self.assertRaises(TypeError, self.write, dump, db_map={1: 0})
+        self.assertRaises(TypeError, self.write, dump, db_map={0: 2, 1: 2})
+        records = list(redisdl.iter_rdb(io.BytesIO(self.write(dump,
+            db_map={0: 1, 1: 0}))))
+        self.assertEqual([(1, 'a', 'x'), (0, 'a', 'y')],
+            [(record.db, record.key, record.value) for record in records])
+
+    def test_checksum(self):
+        self.assertEqual(0xe9c6d914c4b8d9ca, redisdl._crc64(0, b'123456789'))
+        dump = redisdl.dumps()
+        data = self.write(dump)
+        self.assertEqual(redisdl._crc64(0, data[:-8]),
+            struct.unpack('<Q', data[-8:])[0])
+        data = self.write(dump, checksum=False)
+        self.assertEqual(b'\0' * 8, data[-8:])
+
+    def test_restart(self):
+        # redis loads the file as it starts
+        directory = tempfile.mkdtemp()
+        rdb = open(os.path.join(directory, 'dump.rdb'), 'wb')
+        redisdl.write_rdb(io.StringIO(redisdl.dumps()), rdb)
+        rdb.close()
+        try:
+            server = subprocess.Popen(['redis-server', '--port', '6391',
+                '--dir', directory, '--dbfilename', 'dump.rdb', '--save', ''],
+                stdout=subprocess.PIPE)
+        except OSError:
+            # redis-server is not installed
+            return
+        try:
+            r = redis.Redis(port=6391)
+            for attempt in range(50):
+                try:
+                    r.ping()
+                    break
+                except redis.ConnectionError:
+                    time.sleep(0.1)
+            self.assertEqual(self.table(redisdl.dumps(pretty=True)),
+                self.table(redisdl.dumps(port=6391, pretty=True)))
+            self.assertEqual(b'intset', r.object('encoding', 'intset'))
+        finally:
+            server.terminate()
+            server.communicate()
+            os.unlink(os.path.join(directory, 'dump.rdb'))
+            os.rmdir(directory)
+
+    def test_program_write(self):
+        script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        dump = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        dump.write(redisdl.dumps().encode('utf-8'))
+        dump.close()
+        rdb = tempfile.NamedTemporaryFile(suffix='.rdb', delete=False)
+        rdb.close()
+        try:
+            subprocess.check_call([sys.executable, script, '-l', dump.name,
+                '--rdb', rdb.name, '-t', 'hash'])
+            f = open(rdb.name, 'rb')
+            keys = sorted(record.key for record in redisdl.iter_rdb(f))
+            f.close()
+            self.assertEqual(['hash', 'large-hash'], keys)
+        finally:
+            os.unlink(dump.name)
+            os.unlink(rdb.name)
@@ -0,0 +1,86 @@
+import redis
+import redisdl
+import unittest
+import json
+
+class RecordsTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for db in (0, 1):
+            r = redis.Redis(db=db)
+            for key in r.keys('*'):
+                r.delete(key)
+        self.r.set('string', 'a')
+        self.r.rpush('list', 'a', 'b')
+        self.r.sadd('set', 'x', 'y')
+        self.r.zadd('zset', 'm', 1.5, 'n', 2)
+        self.r.hmset('hash', {'f': 'v'})
+        self.r.set('expiring', 'e')
+        self.r.expire('expiring', 3600)
+
+    def table(self):
+        # pretty dumps sort set members; expiration times jitter
+        table = json.loads(redisdl.dumps(pretty=True))
+        for item in table.values():
+            item['expiring'] = item.pop('ttl', None) is not None
+            item.pop('expireat', None)
+        return table
+
+    def test_iter_dump(self):
+        records = dict((record.key, record) for record in redisdl.iter_dump())
+        self.assertEqual(['expiring', 'hash', 'list', 'set', 'string', 'zset'],
+            sorted(records.keys()))
+        self.assertEqual(('string', None, 'a'), records['string'][1:4])
+        self.assertEqual(['a', 'b'], records['list'].value)
+        self.assertEqual(['x', 'y'], sorted(records['set'].value))
+        self.assertEqual({'f': 'v'}, records['hash'].value)
+        self.assertTrue(records['expiring'].ttl > 0)
+
+    def test_iter_dump_is_lazy(self):
+        records = redisdl.iter_dump(keys='string')
+        self.r.set('string', 'b')
+        self.assertEqual('b', next(records).value)
+
+    def test_iter_dump_filters(self):
+        records = redisdl.iter_dump(keys=['s*', 'l*'], exclude_keys='set')
+        self.assertEqual(['list', 'string'],
+            sorted(record.key for record in records))
+
+    def test_iter_dump_all_dbs(self):
+        redis.Redis(db=1).set('one', '1')
+        records = [record for record in redisdl.iter_dump(all_dbs=True)
+            if record.db < 2]
+        self.assertEqual([(1, 'one')],
+            [(record.db, record.key) for record in records if record.db == 1])
+        self.assertEqual(6, len([record for record in records if record.db == 0]))
+
+    def test_round_trip(self):
+        expected = self.table()
+        records = list(redisdl.iter_dump())
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+        redisdl.load_records(records)
+        self.assertEqual(expected, self.table())
+
+    def test_load_generator(self):
+        # any iterable of plain tuples is accepted
+        def records():
+            yield 'string', 'string', None, 'b'
+            yield 'set', 'set', None, set(['z'])
+            yield 'expiring', 'string', 100, 'f'
+        redisdl.load_records(records(), empty=True)
+        self.assertEqual([b'expiring', b'set', b'string'], sorted(self.r.keys('*')))
+        self.assertEqual(b'b', self.r.get('string'))
+        self.assertEqual([b'z'], list(self.r.smembers('set')))
+        self.assertTrue(0 < self.r.ttl('expiring') <= 100)
+
+    def test_load_options(self):
+        records = list(redisdl.iter_dump())
+        redisdl.load_records(records, keys='s*', key_prefix='copy:')
+        self.assertEqual([b'copy:set', b'copy:string'],
+            sorted(self.r.keys('copy:*')))
+
+    def test_copy_between_databases(self):
+        redisdl.load_records(redisdl.iter_dump(), db=1)
+        self.assertEqual(sorted(self.r.keys('*')),
+            sorted(redis.Redis(db=1).keys('*')))
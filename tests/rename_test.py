@@ -0,0 +1,108 @@
+import redis
+import redisdl
+import unittest
+import json
+import io
+import os.path
+import subprocess
+import sys
+import tempfile
+
+class RenameTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for db in (0, 1, 2):
+            r = redis.Redis(db=db)
+            for key in r.keys('*'):
+                r.delete(key)
+        self.dump = json.dumps({
+            'prod:user:1': {'type': 'string', 'value': 'a'},
+            'prod:session:2': {'type': 'list', 'value': ['x', 'y']},
+            'config': {'type': 'hash', 'value': {'k': 'v'}},
+        })
+
+    def loaded_keys(self, function=redisdl.loads, **kwargs):
+        function(self.dump, **kwargs)
+        return sorted(key.decode('utf-8') for key in self.r.keys('*'))
+
+    def test_prefix(self):
+        self.assertEqual(['staging:config', 'staging:prod:session:2',
+            'staging:prod:user:1'], self.loaded_keys(key_prefix='staging:'))
+        self.assertEqual([b'x', b'y'], self.r.lrange('staging:prod:session:2', 0, -1))
+
+    def test_strip_prefix(self):
+        self.assertEqual(['config', 'session:2', 'user:1'],
+            self.loaded_keys(strip_prefix='prod:'))
+
+    def test_strip_and_add_prefix(self):
+        self.assertEqual(['staging:config', 'staging:session:2', 'staging:user:1'],
+            self.loaded_keys(strip_prefix='prod:', key_prefix='staging:'))
+
+    def test_regex(self):
+        self.assertEqual(['config', 'prod:session:old:2', 'prod:user:1'],
+            self.loaded_keys(rename=(r'session:(\d+)$', r'session:old:\1')))
+
+    def test_map(self):
+        self.assertEqual(['config:old', 'prod:session:2', 'prod:user:1'],
+            self.loaded_keys(rename={'config': 'config:old'}))
+
+    def test_callable(self):
+        self.assertEqual(['CONFIG', 'PROD:SESSION:2', 'PROD:USER:1'],
+            self.loaded_keys(rename=lambda key: key.upper()))
+
+    def test_filter_uses_dump_names(self):
+        self.assertEqual(['user:1'], self.loaded_keys(keys='prod:user:*',
+            strip_prefix='prod:'))
+
+    def test_load_streaming(self):
+        def load(data, **kwargs):
+            redisdl.load_streaming(io.BytesIO(data.encode('utf-8')), **kwargs)
+        self.assertEqual(['s:config', 's:session:2', 's:user:1'],
+            self.loaded_keys(load, strip_prefix='prod:', key_prefix='s:'))
+
+    def test_load_mmap(self):
+        def load(data, **kwargs):
+            f = tempfile.TemporaryFile()
+            f.write(data.encode('utf-8'))
+            f.seek(0)
+            redisdl.load_mmap(f, **kwargs)
+            f.close()
+        self.assertEqual(['s:config', 's:session:2', 's:user:1'],
+            self.loaded_keys(load, strip_prefix='prod:', key_prefix='s:'))
+
+    def test_db_map(self):
+        self.dump = json.dumps({'databases': {
+            '0': {'a': {'type': 'string', 'value': 'x'}},
+            '1': {'b': {'type': 'string', 'value': 'y'}},
+        }})
+        redis.Redis(db=2).set('stale', '1')
+        # both databases are loaded into database 2, which is emptied once
+        redisdl.loads(self.dump, db_map={'0': 2, 1: 2}, empty=True)
+        self.assertEqual([b'a', b'b'], sorted(redis.Redis(db=2).keys('*')))
+
+    def test_invalid_rename(self):
+        self.assertRaises(TypeError, redisdl.loads, self.dump, rename='x')
+
+    def test_program(self):
+        script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        f = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        f.write(self.dump.encode('utf-8'))
+        f.close()
+        map = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        map.write(b'{"user:1": "user:one"}')
+        map.close()
+        try:
+            subprocess.check_call([sys.executable, script, '-l', f.name,
+                '--strip-prefix', 'prod:', '--rename-map', map.name,
+                '--key-prefix', 's:'])
+            self.assertEqual([b's:config', b's:session:2', b's:user:one'],
+                sorted(self.r.keys('*')))
+            for key in self.r.keys('*'):
+                self.r.delete(key)
+            subprocess.check_call([sys.executable, script, '-l', f.name,
+                '--rename-regex', '^prod:', 'p:'])
+            self.assertEqual([b'config', b'p:session:2', b'p:user:1'],
+                sorted(self.r.keys('*')))
+        finally:
+            os.unlink(f.name)
+            os.unlink(map.name)
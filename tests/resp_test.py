@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+
+import redis
+import redisdl
+import unittest
+import json
+import io
+import os.path
+import subprocess
+import sys
+import tempfile
+
+class RespTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for db in (0, 1, 2):
+            r = redis.Redis(db=db)
+            for key in r.keys('*'):
+                r.delete(key)
+        self.r.set('string', u'фист')
+        self.r.rpush('list', 'a', 'b', 'a')
+        self.r.sadd('set', 'x', 'y')
+        self.r.zadd('zset', 'm', 1.5, 'n', 0.1)
+        self.r.hmset('hash', {'f': 'v', 'g': ''})
+        self.r.set('expiring', 'e')
+        self.r.expire('expiring', 3600)
+
+    def table(self, db=0):
+        # pretty dumps sort set members; expiration times jitter
+        table = json.loads(redisdl.dumps(db=db, pretty=True))
+        for item in table.values():
+            item['expiring'] = item.pop('ttl', None) is not None
+            item.pop('expireat', None)
+        return table
+
+    def resp_dump(self, **kwargs):
+        fp = io.BytesIO()
+        redisdl.dump(fp, format='resp', **kwargs)
+        fp.seek(0)
+        return fp
+
+    def test_commands(self):
+        fp = self.resp_dump(keys='list')
+        self.assertEqual(b'*2\r\n$3\r\nDEL\r\n$4\r\nlist\r\n'
+            b'*5\r\n$5\r\nRPUSH\r\n$4\r\nlist\r\n$1\r\na\r\n$1\r\nb\r\n$1\r\na\r\n',
+            fp.getvalue())
+
+    def test_target_version(self):
+        # commands do not depend on the server the dump is made from
+        fp = self.resp_dump(keys='list', resp_target_version='2.0')
+        self.assertEqual(b'*2\r\n$3\r\nDEL\r\n$4\r\nlist\r\n'
+            b'*3\r\n$5\r\nRPUSH\r\n$4\r\nlist\r\n$1\r\na\r\n'
+            b'*3\r\n$5\r\nRPUSH\r\n$4\r\nlist\r\n$1\r\nb\r\n'
+            b'*3\r\n$5\r\nRPUSH\r\n$4\r\nlist\r\n$1\r\na\r\n',
+            fp.getvalue())
+        fp = self.resp_dump(keys='expiring', resp_target_version='2.0')
+        self.assertTrue(b'$6\r\nEXPIRE\r\n' in fp.getvalue())
+        fp = self.resp_dump(keys='expiring')
+        self.assertTrue(b'$7\r\nPEXPIRE\r\n' in fp.getvalue())
+        fp = self.resp_dump(keys='list', resp_target_version='4.0')
+        self.assertTrue(fp.getvalue().startswith(b'*2\r\n$6\r\nUNLINK\r\n'))
+        expected = self.table()
+        fp = self.resp_dump(resp_target_version='2.0')
+        redisdl.load_resp(fp, db=1)
+        self.assertEqual(expected, self.table(db=1))
+
+    def test_round_trip(self):
+        expected = self.table()
+        fp = self.resp_dump()
+        self.r.set('string', 'changed')
+        self.r.set('other', 'o')
+        redisdl.load_resp(fp, empty=True)
+        self.assertEqual(expected, self.table())
+        self.assertTrue(3500 < self.r.ttl('expiring') <= 3600)
+
+    def test_load_into_db(self):
+        fp = self.resp_dump()
+        redisdl.load_resp(fp, db=1)
+        self.assertEqual(self.table(), self.table(db=1))
+
+    def test_chunked(self):
+        self.r.rpush('long', *[str(i) for i in range(25)])
+        size = redisdl.variadic_chunk_size
+        redisdl.variadic_chunk_size = 10
+        try:
+            fp = self.resp_dump(keys='long')
+        finally:
+            redisdl.variadic_chunk_size = size
+        self.assertEqual(3, fp.getvalue().count(b'RPUSH'))
+        self.r.delete('long')
+        redisdl.load_resp(fp)
+        self.assertEqual([str(i).encode('ascii') for i in range(25)],
+            self.r.lrange('long', 0, -1))
+
+    def test_all_dbs(self):
+        redis.Redis(db=1).set('one', '1')
+        fp = self.resp_dump(all_dbs=True)
+        self.assertTrue(fp.getvalue().startswith(b'*2\r\n$6\r\nSELECT\r\n$1\r\n0\r\n'))
+        redis.Redis(db=1).set('one', '2')
+        redis.Redis(db=1).set('stale', '2')
+        redisdl.load_resp(fp, empty=True)
+        self.assertEqual([b'one'], redis.Redis(db=1).keys('*'))
+        self.assertEqual(b'1', redis.Redis(db=1).get('one'))
+
+    def test_stream(self):
+        if not redisdl.client().capabilities.have_streams:
+            return
+        self.r.execute_command('XADD', 'stream', '1-1', 'f', 'v')
+        self.r.execute_command('XGROUP', 'CREATE', 'stream', 'group', '0')
+        expected = self.table()
+        fp = self.resp_dump()
+        self.r.delete('stream')
+        redisdl.load_resp(fp)
+        self.assertEqual(expected, self.table())
+
+    def test_invalid(self):
+        self.assertRaises(TypeError, redisdl.dump, io.BytesIO(), format='xml')
+        self.assertRaises(TypeError, redisdl.dump, io.BytesIO(), format='resp',
+            pretty=True)
+        self.assertRaises(TypeError, redisdl.dump, io.StringIO(), format='resp')
+        self.assertRaises(TypeError, redisdl.dump, io.BytesIO(), format='resp',
+            resp_target_version='latest')
+        self.assertRaises(TypeError, redisdl.dump, io.StringIO(),
+            resp_target_version='4.0')
+        self.assertRaises(ValueError, redisdl.load_resp, io.BytesIO(b'{}'))
+        self.assertRaises(ValueError, redisdl.load_resp,
+            io.BytesIO(b'*2\r\n$3\r\nDEL\r\n$4\r\nli'))
+
+    def test_program(self):
+        expected = self.table()
+        f = tempfile.NamedTemporaryFile(suffix='.resp', delete=False)
+        f.close()
+        script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        try:
+            subprocess.check_call([sys.executable, script, '--format', 'resp',
+                '-o', f.name])
+            self.r.set('string', 'changed')
+            subprocess.check_call([sys.executable, script, '-l', '--format',
+                'resp', f.name])
+            self.assertEqual(expected, self.table())
+        finally:
+            os.unlink(f.name)
@@ -0,0 +1,42 @@
+import os.path
+import sys
+import unittest
+from . import util
+
+check_output = util.get_subprocess_check_output()
+
+# importing redisdl may take at most this many seconds on top of importing
+# redis-py, which every dump and load needs anyway
+IMPORT_TIME_BUDGET = 0.05
+
+measure_script = '''
+import sys
+import time
+import redis
+start = time.time()
+import redisdl
+elapsed = time.time() - start
+print('%f %s' % (elapsed, ' '.join(sorted(
+    name for name in ('ijson', 'jsaone', 'simplejson') if name in sys.modules))))
+'''
+
+class StartupTest(unittest.TestCase):
+    def measure(self):
+        root = os.path.join(os.path.dirname(__file__), '..')
+        # measure the import of cached bytecode, as installed modules are
+        env = dict(os.environ)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        output = check_output([sys.executable, '-c', measure_script],
+            cwd=root, env=env).decode('ascii').split()
+        return float(output[0]), output[1:]
+
+    def test_optional_modules_not_imported(self):
+        elapsed, modules = self.measure()
+        self.assertEqual([], modules)
+
+    def test_import_time_budget(self):
+        # the first run compiles redisdl; take the best of several runs
+        # afterwards to discount noise from the test machine
+        self.measure()
+        elapsed = min(self.measure()[0] for i in range(3))
+        self.assertLess(elapsed, IMPORT_TIME_BUDGET)
@@ -0,0 +1,110 @@
+import redis
+import redisdl
+import unittest
+import json
+if redisdl.py3:
+    from io import StringIO
+else:
+    from StringIO import StringIO
+
+class StreamTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+        if not redisdl.client().capabilities.have_streams:
+            raise unittest.SkipTest('streams require redis 5.0')
+        self.page_size = redisdl.stream_page_size
+        redisdl.stream_page_size = 7
+
+    def tearDown(self):
+        redisdl.stream_page_size = self.page_size
+
+    def populate(self):
+        for i in range(1, 31):
+            self.r.execute_command('XADD', 'stream', '%d-1' % i, 'a', 'x%d' % i, 'b', 'y')
+        self.r.execute_command('XDEL', 'stream', '30-1')
+        self.r.execute_command('XGROUP', 'CREATE', 'stream', 'group', '0')
+        self.r.execute_command('XREADGROUP', 'GROUP', 'group', 'alice',
+            'COUNT', '10', 'STREAMS', 'stream', '>')
+
+    def state(self, key):
+        info = self.r.execute_command('XINFO', 'STREAM', key)
+        info = dict(zip(info[::2], info[1::2]))
+        return {
+            'length': info[b'length'],
+            'last_id': info[b'last-generated-id'],
+            'entries': self.r.execute_command('XRANGE', key, '-', '+'),
+            'groups': self.r.execute_command('XINFO', 'GROUPS', key),
+            'pending': [entry[:2] + entry[3:] for entry in
+                self.r.execute_command('XPENDING', 'stream', 'group', '-', '+', 100)],
+        }
+
+    def test_dump(self):
+        self.populate()
+        fp = StringIO()
+        redisdl.dump(fp)
+        value = json.loads(fp.getvalue())['stream']['value']
+        self.assertEqual('30-1', value['last_id'])
+        self.assertEqual(29, len(value['entries']))
+        self.assertEqual(['1-1', ['a', 'x1', 'b', 'y']], value['entries'][0])
+        group, = value['groups']
+        self.assertEqual('group', group['name'])
+        self.assertEqual('10-1', group['last_delivered_id'])
+        self.assertEqual(['alice'], group['consumers'])
+        self.assertEqual(10, len(group['pending']))
+        self.assertEqual(['1-1', 'alice'], group['pending'][0][:2])
+        pretty = json.loads(redisdl.dumps(pretty=True))['stream']['value']
+        # idle times differ
+        self.assertEqual(value['entries'], pretty['entries'])
+        self.assertEqual(group['pending'][0][:2], pretty['groups'][0]['pending'][0][:2])
+
+    def test_pending_pages(self):
+        self.populate()
+        self.r.execute_command('XGROUP', 'CREATE', 'stream', 'idle', '0')
+        self.r.execute_command('XGROUP', 'CREATE', 'stream', 'busy', '0')
+        self.r.execute_command('XREADGROUP', 'GROUP', 'busy', 'bob',
+            'COUNT', '21', 'STREAMS', 'stream', '>')
+        value = redisdl.StreamValue(redisdl.client(), b'stream', '30-1', 'utf-8')
+        for group in value.groups():
+            # read as it is iterated
+            self.assertFalse(isinstance(group['pending'], list))
+        fp = StringIO()
+        redisdl.dump(fp)
+        def pending(groups):
+            # idle times differ
+            return sorted((group['name'], group['consumers'],
+                [entry[:2] for entry in group['pending']]) for group in groups)
+        groups = pending(json.loads(fp.getvalue())['stream']['value']['groups'])
+        self.assertEqual([('busy', 21), ('group', 10), ('idle', 0)],
+            [(name, len(entries)) for name, consumers, entries in groups])
+        self.assertEqual(pending(
+            json.loads(redisdl.dumps())['stream']['value']['groups']), groups)
+
+    def test_round_trip(self):
+        self.populate()
+        expected = self.state('stream')
+        dump = redisdl.dumps()
+        redisdl.loads(dump, empty=True)
+        self.assertEqual(expected, self.state('stream'))
+
+    def test_empty_stream(self):
+        self.r.execute_command('XADD', 'stream', '5-5', 'a', 'b')
+        self.r.execute_command('XDEL', 'stream', '5-5')
+        dump = redisdl.dumps()
+        redisdl.loads(dump, empty=True)
+        self.assertEqual(0, self.r.execute_command('XLEN', 'stream'))
+        self.assertEqual(json.loads(dump), json.loads(redisdl.dumps()))
+
+    def test_copy(self):
+        self.populate()
+        target = redis.Redis(db=1)
+        target.delete('stream')
+        redisdl.copy(target_db=1, use_dump_restore=False)
+        self.assertEqual(self.r.execute_command('XRANGE', 'stream', '-', '+'),
+            target.execute_command('XRANGE', 'stream', '-', '+'))
+
+    def test_type_filter(self):
+        self.populate()
+        self.r.set('string', 'value')
+        self.assertEqual(['stream'], list(json.loads(redisdl.dumps(types='stream'))))
@@ -0,0 +1,126 @@
+import redis
+import redisdl
+import unittest
+import json
+import io
+import os.path
+import subprocess
+import sys
+import tempfile
+
+class SyncTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for db in (0, 1, 2):
+            r = redis.Redis(db=db)
+            for key in r.keys('*'):
+                r.delete(key)
+        self.r.set('string', 'a')
+        self.r.rpush('list', 'a', 'b')
+        self.r.sadd('set', 'x', 'y')
+        self.r.hmset('hash', {'f': 'v'})
+        self.r.set('expiring', 'e')
+        self.r.expire('expiring', 3600)
+        self.dump = redisdl.dumps()
+
+    def table(self, dump=None):
+        # pretty dumps sort set members; expiration times jitter
+        table = json.loads(dump or redisdl.dumps(pretty=True))
+        for item in table.values():
+            item['expiring'] = item.pop('ttl', None) is not None
+            item.pop('expireat', None)
+            if item['type'] == 'set':
+                item['value'].sort()
+        return table
+
+    def writes(self, function, *args, **kwargs):
+        # every written key is deleted first
+        self.r.execute_command('CONFIG RESETSTAT')
+        function(*args, **kwargs)
+        stats = self.r.info(b'commandstats')
+        return sum(stats.get(command, {}).get('calls', 0)
+            for command in ('cmdstat_del', 'cmdstat_unlink'))
+
+    def test_unchanged(self):
+        self.assertEqual(0, self.writes(redisdl.loads, self.dump, sync=True))
+        self.assertEqual(self.table(self.dump), self.table())
+
+    def test_changed(self):
+        self.r.delete('string')
+        self.r.sadd('set', 'z')
+        self.r.delete('list')
+        self.r.set('list', 'x')
+        self.r.persist('expiring')
+        self.r.set('other', 'o')
+        self.assertEqual(4, self.writes(redisdl.loads, self.dump, sync=True))
+        table = self.table()
+        self.assertEqual('o', table.pop('other')['value'])
+        self.assertEqual(self.table(self.dump), table)
+
+    def test_delete_extra(self):
+        self.r.set('other', 'o')
+        self.r.set('kept', 'k')
+        redisdl.loads(self.dump, sync=True, delete_extra=True, exclude_keys='kept')
+        self.assertEqual([b'expiring', b'hash', b'kept', b'list', b'set', b'string'],
+            sorted(self.r.keys('*')))
+
+    def test_delete_extra_types(self):
+        self.r.set('other', 'o')
+        self.r.sadd('other-set', 'o')
+        redisdl.loads(self.dump, sync=True, delete_extra=True, types='set')
+        self.assertEqual(b'o', self.r.get('other'))
+        self.assertFalse(self.r.exists('other-set'))
+
+    def test_empty_dump(self):
+        redisdl.loads('{}', sync=True, delete_extra=True)
+        self.assertEqual([], self.r.keys('*'))
+
+    def test_tombstone(self):
+        self.assertEqual(1, self.writes(redisdl.loads,
+            json.dumps({'string': {'type': 'none'}, 'gone': {'type': 'none'}}),
+            sync=True))
+        self.assertFalse(self.r.exists('string'))
+
+    def test_streaming(self):
+        self.r.rpush('list', 'c')
+        self.assertEqual(1, self.writes(redisdl.load_streaming,
+            io.BytesIO(self.dump.encode('utf-8')), sync=True))
+        self.assertEqual([b'a', b'b'], self.r.lrange('list', 0, -1))
+
+    def test_key_prefix(self):
+        redisdl.loads(self.dump, key_prefix='copy:')
+        self.r.set('copy:string', 'b')
+        self.assertEqual(1, self.writes(redisdl.loads, self.dump,
+            key_prefix='copy:', sync=True))
+        self.assertEqual(b'a', self.r.get('copy:string'))
+
+    def test_multiple_databases(self):
+        redis.Redis(db=1).set('one', '1')
+        dump = redisdl.dumps(all_dbs=True)
+        redis.Redis(db=1).set('one', '2')
+        redis.Redis(db=2).set('stale', '2')
+        self.assertEqual(2, self.writes(redisdl.loads, dump, sync=True,
+            delete_extra=True, db_map={1: 2}))
+        self.assertEqual([b'one'], redis.Redis(db=2).keys('*'))
+        self.assertEqual(b'2', redis.Redis(db=1).get('one'))
+
+    def test_invalid(self):
+        self.assertRaises(TypeError, redisdl.loads, self.dump, delete_extra=True)
+        self.assertRaises(TypeError, redisdl.loads, self.dump, sync=True,
+            empty=True)
+        self.assertRaises(TypeError, redisdl.loads, self.dump, sync=True,
+            delete_extra=True, key_prefix='x:')
+
+    def test_program(self):
+        script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        f = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        f.write(self.dump.encode('utf-8'))
+        f.close()
+        try:
+            self.r.set('other', 'o')
+            self.r.set('string', 'b')
+            subprocess.check_call([sys.executable, script, '-l', '--sync',
+                '--delete-extra', f.name])
+            self.assertEqual(self.table(self.dump), self.table())
+        finally:
+            os.unlink(f.name)
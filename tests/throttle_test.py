@@ -0,0 +1,67 @@
+import redis
+import redisdl
+import unittest
+import json
+import time as _time
+import os.path
+import subprocess
+import sys
+
+class ThrottleTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for key in self.r.keys('*'):
+            self.r.delete(key)
+        for i in range(200):
+            self.r.set('key:%d' % i, 'x' * 100)
+
+    def timed(self, function, *args, **kwargs):
+        start = _time.time()
+        result = function(*args, **kwargs)
+        return _time.time() - start, result
+
+    def test_dump_max_ops(self):
+        elapsed, dump = self.timed(redisdl.dumps,
+            throttle=redisdl.Throttle(max_ops=1000))
+        self.assertEqual(200, len(json.loads(dump)))
+        self.assertTrue(elapsed > 0.15, elapsed)
+
+    def test_load_max_bytes(self):
+        dump = redisdl.dumps()
+        elapsed, result = self.timed(redisdl.loads, dump,
+            throttle=redisdl.Throttle(max_bytes=100000))
+        # 200 values of 102 bytes
+        self.assertTrue(elapsed > 0.15, elapsed)
+        self.assertEqual(json.loads(dump), json.loads(redisdl.dumps()))
+
+    def test_batch_size_follows_max_ops(self):
+        self.assertEqual(10000, redisdl.Throttle().batch_size)
+        self.assertEqual(50, redisdl.Throttle(max_ops=500).batch_size)
+
+    def test_latency_adaptation(self):
+        throttle = redisdl.Throttle(max_latency=0, batch_size=1000)
+        r = redisdl.client()
+        throttle.sample(r)
+        throttle.sample(r)
+        self.assertEqual(0.002, throttle.pause)
+        self.assertEqual(250, throttle.current_batch_size)
+        throttle.max_latency = 10
+        throttle.sample(r)
+        self.assertEqual(0.001, throttle.pause)
+        self.assertEqual(350, throttle.current_batch_size)
+        throttle.sample(r)
+        self.assertEqual(0, throttle.pause)
+        self.assertTrue(throttle.latency < 10)
+
+    def test_copy(self):
+        target = redis.Redis(db=1)
+        elapsed, result = self.timed(redisdl.copy, target_db=1, empty=True,
+            throttle=redisdl.Throttle(max_ops=1000), batch_size=50)
+        self.assertEqual(200, len(target.keys('*')))
+        self.assertTrue(elapsed > 0.15, elapsed)
+
+    def test_program(self):
+        script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        output = subprocess.check_output([sys.executable, script,
+            '--max-ops', '100000', '--max-latency', '100', '--max-bandwidth', '10'])
+        self.assertEqual(200, len(json.loads(output.decode('utf-8'))))
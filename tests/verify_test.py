@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+
+import redis
+import redisdl
+import unittest
+import json
+import io
+import os.path
+import subprocess
+import sys
+import tempfile
+
+class VerifyTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for db in (0, 1):
+            r = redis.Redis(db=db)
+            for key in r.keys('*'):
+                r.delete(key)
+        self.r.set('string', u'фист')
+        self.r.rpush('list', 'a', 'b', 'a')
+        self.r.sadd('set', 'x', 'y', u'é')
+        self.r.zadd('zset', 'm', 1.5, 'n', 0.1, 'o', -2e20)
+        self.r.hmset('hash', {'f': 'v', 'g': ''})
+        self.r.set('expiring', 'e')
+        self.r.expire('expiring', 3600)
+        self.dump = redisdl.dumps()
+
+    def verify(self, dump=None, **kwargs):
+        return redisdl.verify(io.StringIO(dump or self.dump), **kwargs)
+
+    def assertMatches(self, report, keys):
+        self.assertEqual(keys, report['keys'])
+        self.assertEqual(keys, report['matched'])
+        for kind in ('missing', 'extra', 'type_mismatch', 'value_mismatch', 'ttl_mismatch'):
+            self.assertEqual([], report[kind])
+
+    def test_match(self):
+        self.assertMatches(self.verify(), 6)
+
+    def test_client_side_digests(self):
+        # every collection is read and hashed on the client
+        limit = redisdl.verify_digest_limit
+        redisdl.verify_digest_limit = 1
+        try:
+            self.assertMatches(self.verify(), 6)
+            self.r.hset('hash', 'f', 'changed')
+            self.assertEqual(['hash'], self.verify()['value_mismatch'])
+        finally:
+            redisdl.verify_digest_limit = limit
+
+    def test_long_strings(self):
+        # strings are read and hashed on the client a chunk at a time
+        self.r.set('long', u'ф' * 1000)
+        self.dump = redisdl.dumps()
+        limit = redisdl.verify_digest_limit
+        chunk_size = redisdl.string_chunk_size
+        redisdl.verify_digest_limit = 100
+        redisdl.string_chunk_size = 333
+        try:
+            self.assertMatches(self.verify(), 7)
+            self.r.setrange('long', 1000, 'x')
+            self.assertEqual(['long'], self.verify()['value_mismatch'])
+        finally:
+            redisdl.verify_digest_limit = limit
+            redisdl.string_chunk_size = chunk_size
+
+    def test_differences(self):
+        self.r.delete('string')
+        self.r.delete('list')
+        self.r.set('list', 'now a string')
+        self.r.sadd('set', 'z')
+        self.r.rpush('list2', 'a')
+        self.r.persist('expiring')
+        report = self.verify()
+        self.assertEqual(6, report['keys'])
+        self.assertEqual(2, report['matched'])
+        self.assertEqual(['string'], report['missing'])
+        self.assertEqual(['list2'], report['extra'])
+        self.assertEqual(['list'], report['type_mismatch'])
+        self.assertEqual(['set'], report['value_mismatch'])
+        self.assertEqual(['expiring'], report['ttl_mismatch'])
+
+    def test_value_changes(self):
+        self.r.lset('list', 0, 'c')
+        self.r.zadd('zset', 'm', 2)
+        self.r.hset('hash', 'g', 'x')
+        self.r.set('string', u'фист!')
+        self.assertEqual(['hash', 'list', 'string', 'zset'],
+            sorted(self.verify()['value_mismatch']))
+
+    def test_ttl_drift(self):
+        self.r.expire('expiring', 3000)
+        self.assertEqual(['expiring'], self.verify()['ttl_mismatch'])
+        self.assertMatches(self.verify(ttl_tolerance=1000), 6)
+
+    def test_filters(self):
+        self.r.set('other', 'x')
+        report = self.verify(keys=['s*', 'l*'], exclude_keys='set',
+            check_extra=True)
+        self.assertMatches(report, 2)
+
+    def test_without_extra_check(self):
+        self.r.set('other', 'x')
+        self.assertMatches(self.verify(check_extra=False), 6)
+
+    def test_tombstones(self):
+        dump = json.dumps({'gone': {'type': 'none'}, 'string': {'type': 'none'}})
+        report = self.verify(dump, check_extra=False)
+        self.assertEqual(1, report['matched'])
+        self.assertEqual(['string'], report['extra'])
+
+    def test_multiple_databases(self):
+        redis.Redis(db=1).set('one', '1')
+        dump = redisdl.dumps(all_dbs=True)
+        redis.Redis(db=1).set('one', '2')
+        redis.Redis(db=1).set('two', '2')
+        report = self.verify(dump)
+        self.assertEqual([[1, 'one']], report['value_mismatch'])
+        self.assertEqual([[1, 'two']], report['extra'])
+
+    def test_stream(self):
+        if not redisdl.client().capabilities.have_streams:
+            return
+        self.r.execute_command('XADD', 'stream', '1-1', 'f', 'v')
+        self.r.execute_command('XADD', 'stream', '2-1', 'f', u'é')
+        dump = redisdl.dumps()
+        self.assertMatches(self.verify(dump), 7)
+        self.r.execute_command('XADD', 'stream', '3-1', 'f', 'v')
+        self.assertEqual(['stream'], self.verify(dump)['value_mismatch'])
+
+    def test_program(self):
+        script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        f = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        f.write(self.dump.encode('utf-8'))
+        f.close()
+        try:
+            output = subprocess.check_output([sys.executable, script,
+                '--verify', f.name])
+            self.assertEqual(6, json.loads(output.decode('utf-8'))['matched'])
+            self.r.delete('string')
+            process = subprocess.Popen([sys.executable, script, '--verify',
+                f.name], stdout=subprocess.PIPE)
+            output = process.communicate()[0]
+            self.assertEqual(1, process.returncode)
+            self.assertEqual(['string'], json.loads(output.decode('utf-8'))['missing'])
+        finally:
+            os.unlink(f.name)
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+import redis
+import redisdl
+import unittest
+import json
+import io
+import os.path
+import subprocess
+import sys
+import tempfile
+
+class RawWriterTest(unittest.TestCase):
+    def setUp(self):
+        self.r = redis.Redis()
+        for db in (0, 1):
+            r = redis.Redis(db=db)
+            for key in r.keys('*'):
+                r.delete(key)
+        self.r.set('string', u'фист')
+        self.r.rpush('list', 'a', 'b', 'a')
+        self.r.sadd('set', 'x', 'y', u'é')
+        self.r.zadd('zset', 'm', 1.5, 'n', 0.1, 'o', -2e20)
+        self.r.hmset('hash', {'f': 'v', 'g': ''})
+        self.r.set('expiring', 'e')
+        self.r.expire('expiring', 3600)
+        self.dump = redisdl.dumps()
+
+    def table(self, db=0):
+        # pretty dumps sort set members; expiration times jitter
+        table = json.loads(redisdl.dumps(db=db, pretty=True))
+        for item in table.values():
+            item['expiring'] = item.pop('ttl', None) is not None
+            item.pop('expireat', None)
+        return table
+
+    def test_loads(self):
+        expected = self.table()
+        redisdl.loads(self.dump, db=1, writer_backend='raw')
+        self.assertEqual(expected, self.table(db=1))
+        self.assertTrue(3500 < redis.Redis(db=1).ttl('expiring') <= 3600)
+
+    def test_load_streaming(self):
+        expected = self.table()
+        redisdl.load_streaming(io.BytesIO(self.dump.encode('utf-8')), db=1,
+            writer_backend='raw')
+        self.assertEqual(expected, self.table(db=1))
+
+    def test_batches(self):
+        self.r.rpush('long', *[str(i) for i in range(25)])
+        expected = self.table()
+        dump = redisdl.dumps()
+        redisdl.loads(dump, db=1, writer_backend='raw',
+            throttle=redisdl.Throttle(max_ops=1000000, batch_size=2))
+        self.assertEqual(expected, self.table(db=1))
+
+    def test_multiple_databases(self):
+        redis.Redis(db=1).set('one', '1')
+        dump = redisdl.dumps(all_dbs=True)
+        redis.Redis(db=1).set('one', '2')
+        redisdl.loads(dump, writer_backend='raw')
+        self.assertEqual(b'1', redis.Redis(db=1).get('one'))
+
+    def test_stream(self):
+        if not redisdl.client().capabilities.have_streams:
+            return
+        self.r.execute_command('XADD', 'stream', '1-1', 'f', u'é')
+        self.r.execute_command('XGROUP', 'CREATE', 'stream', 'group', '0')
+        expected = self.table()
+        redisdl.loads(redisdl.dumps(), db=1, writer_backend='raw')
+        self.assertEqual(expected, self.table(db=1))
+
+    def test_load_resp(self):
+        expected = self.table()
+        fp = io.BytesIO()
+        redisdl.dump(fp, format='resp')
+        fp.seek(0)
+        redisdl.load_resp(fp, db=1, writer_backend='raw')
+        self.assertEqual(expected, self.table(db=1))
+
+    def test_error_reply(self):
+        fp = io.BytesIO(b'*3\r\n$3\r\nSET\r\n$1\r\na\r\n$1\r\n1\r\n'
+            b'*2\r\n$4\r\nINCR\r\n$4\r\nlist\r\n'
+            b'*3\r\n$3\r\nSET\r\n$1\r\nb\r\n$1\r\n2\r\n')
+        self.assertRaises(redis.ResponseError, redisdl.load_resp, fp,
+            writer_backend='raw')
+        # the whole batch was written, and the connection remains usable
+        self.assertEqual(b'2', self.r.get('b'))
+        redisdl.loads(self.dump, db=1, writer_backend='raw')
+
+    def test_read_replies(self):
+        pool = self.r.connection_pool
+        connection = pool.get_connection('PIPELINE')
+        try:
+            connection.send_packed_command([b'SET a 1\r\nGET a\r\n'
+                b'GET missing\r\nINCR list\r\nINCR set\r\nPING\r\n'])
+            error = redisdl._read_raw_replies(connection, 6)
+            self.assertTrue(isinstance(error, redis.ResponseError))
+            self.assertTrue('WRONGTYPE' in str(error))
+            # every reply was read, the next one is that of this command
+            connection.send_packed_command([b'PING\r\n'])
+            self.assertEqual(None, redisdl._read_raw_replies(connection, 1))
+        finally:
+            pool.release(connection)
+
+    def test_invalid(self):
+        self.assertRaises(TypeError, redisdl.loads, self.dump,
+            writer_backend='hiredis')
+
+    def test_program(self):
+        expected = self.table()
+        script = os.path.join(os.path.dirname(__file__), '..', 'redisdl.py')
+        f = tempfile.NamedTemporaryFile(suffix='.json', delete=False)
+        f.write(self.dump.encode('utf-8'))
+        f.close()
+        try:
+            subprocess.check_call([sys.executable, script, '-l', '-d', '1',
+                '--writer-backend', 'raw', f.name])
+            self.assertEqual(expected, self.table(db=1))
+        finally:
+            os.unlink(f.name)